@@ -0,0 +1,147 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from core.geometry import Point, Segment, intersecting_segments
+from core.mapcompiler import compile_map
+from core.mapgen import generate_map
+from raycasting import Camera
+from typing import Callable, Dict, List
+
+DefaultBaseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+# Each repeat calls a benchmark enough times to run for at least this long, in seconds
+MinimumTime = 0.05
+
+def random_walls(count: int, seed: int = 0) -> List[Segment]:
+    generator = random.Random(seed)
+    walls = []
+    for _ in range(count):
+        start = Point(generator.uniform(-20, 20), generator.uniform(-20, 20))
+        walls.append(Segment(start, start + Point(generator.uniform(-4, 4), generator.uniform(-4, 4))))
+    return walls
+
+def make_benchmarks() -> Dict[str, tuple[Callable[[], None], int]]:
+    """
+    Returns each benchmark by name, as a function to time and the number of operations it performs.
+    """
+    benchmarks = {}
+    first, second = Point(1.5, 2.5), Point(3.0, -1.0)
+
+    def point_add():
+        for _ in range(1000):
+            first + second
+    benchmarks["Point.__add__"] = (point_add, 1000)
+
+    def point_sub():
+        for _ in range(1000):
+            first - second
+    benchmarks["Point.__sub__"] = (point_sub, 1000)
+
+    def point_mul():
+        for _ in range(1000):
+            first * 2.0
+    benchmarks["Point.__mul__"] = (point_mul, 1000)
+
+    def point_length():
+        for _ in range(1000):
+            first.length()
+    benchmarks["Point.length"] = (point_length, 1000)
+
+    crossing = Segment(Point(0.0, 0.0), Point(10.0, 10.0))
+    crossed = Segment(Point(0.0, 10.0), Point(10.0, 0.0))
+    missed = Segment(Point(20.0, 0.0), Point(30.0, 10.0))
+    parallel = Segment(Point(0.0, 1.0), Point(10.0, 11.0))
+    for name, other in (("hit", crossed), ("miss bounds", missed), ("parallel", parallel)):
+        def intersection(other=other):
+            for _ in range(1000):
+                crossing.intersection(other)
+        benchmarks[f"Segment.intersection[{name}]"] = (intersection, 1000)
+
+    ray = Segment(Point(0.0, 0.0), Point(100.0, 37.0))
+    for count in (10, 100, 1000):
+        walls = random_walls(count)
+        benchmarks[f"intersecting_segments[{count}]"] = (lambda walls=walls: intersecting_segments(ray, walls), count)
+
+    camera = Camera(Point(0.5, 0.5), 0.3, math.pi / 2)
+    for planar_projection in (True, False):
+        for count in (320, 1280):
+            def rays(count=count, planar_projection=planar_projection):
+                camera.planar_projection = planar_projection
+                for _ in camera.rays(count):
+                    pass
+            benchmarks[f"Camera.rays[{count}{'' if planar_projection else ' angular'}]"] = (rays, count)
+
+    for size in (10, 32, 100):
+        map_string = generate_map("cave", size, size, seed=0)
+        benchmarks[f"make_map[{size * size} cells]"] = (lambda map_string=map_string: compile_map(map_string, 1), size * size)
+
+    return benchmarks
+
+def measure(function: Callable[[], None], operations: int, repeat: int) -> float:
+    """
+    Returns the best throughput of several repeats, in operations per second.
+    """
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MinimumTime:
+            break
+        calls *= 2
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return operations * calls / best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the throughput of the geometry hot paths, and compares it to a saved baseline.")
+    parser.add_argument("--baseline", default=DefaultBaseline, help="the baseline file to compare to or save")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="the fraction of baseline throughput that may be lost before failing")
+    parser.add_argument("--repeat", type=int, default=5, help="take the best of this many runs of each benchmark")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    arguments = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(arguments.baseline) and not arguments.save:
+        with open(arguments.baseline, 'r') as file:
+            baseline = json.load(file)
+
+    results, regressions = {}, []
+    for name, (function, operations) in make_benchmarks().items():
+        if arguments.filter not in name:
+            continue
+
+        results[name] = measure(function, operations, arguments.repeat)
+        line = f"{name:<40} {results[name]:>14,.0f} ops/s"
+        if name in baseline:
+            change = results[name] / baseline[name] - 1.0
+            line += f" {change:>+8.1%}"
+            if change < -arguments.threshold:
+                regressions.append(name)
+                line += " REGRESSED"
+        print(line)
+
+    if arguments.save:
+        # Keep the baselines of benchmarks that were filtered out
+        if os.path.exists(arguments.baseline):
+            with open(arguments.baseline, 'r') as file:
+                results = json.load(file) | results
+        with open(arguments.baseline, 'w') as file:
+            json.dump(results, file, indent=4, sort_keys=True)
+        print(f"Saved baseline to {arguments.baseline}")
+    elif len(baseline) == 0:
+        print(f"No baseline at {arguments.baseline}, run with --save to record one")
+
+    if len(regressions) > 0:
+        print(f"{len(regressions)} benchmarks regressed by more than {arguments.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
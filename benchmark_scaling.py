@@ -0,0 +1,90 @@
+import argparse
+import math
+import os
+import tempfile
+import time
+
+# Editor drawing is measured off screen
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+from core.geometry import Point, intersect_ray
+from core.mapcompiler import compile_map
+from core.mapfile import load_world, save_world
+from core.mapgen import MapStyles, generate_map
+from core.world import World
+from editor.camera import EditorCamera
+from editor.renderer import EditorRenderer
+from editor.tools.draw_walls import DrawWalls
+from raycasting import Camera
+
+def open_cell(map_string: str) -> Point:
+    # The empty cell nearest the middle of the map, to cast from
+    lines = map_string.split("\n")
+    cells = [(x, y) for y, line in enumerate(lines) for x, char in enumerate(line) if char == " "]
+    middle_x, middle_y = len(lines[0]) / 2, len(lines) / 2
+    x, y = min(cells, key=lambda cell: (cell[0] - middle_x) ** 2 + (cell[1] - middle_y) ** 2)
+    return Point(x + 0.5, len(lines) - y - 0.5)
+
+def measure(stages: set, size: int, style: str, seed: int, rays: int) -> dict:
+    results = {}
+    directory = tempfile.mkdtemp()
+
+    def timed(name, function):
+        # Generating and compiling are always measured, as every other stage needs the map
+        if name not in stages and name not in ("generate", "compile"):
+            return None
+        start = time.perf_counter()
+        value = function()
+        results[name] = time.perf_counter() - start
+        return value
+
+    map_string = timed("generate", lambda: generate_map(style, size, size, seed))
+    walls = timed("compile", lambda: compile_map(map_string))
+    world = World(walls)
+    results["walls"] = len(walls)
+
+    json_filepath, binary_filepath = os.path.join(directory, "world.map"), os.path.join(directory, "binary.map")
+    timed("save json", lambda: save_world(world, json_filepath))
+    timed("load json", lambda: load_world(json_filepath))
+    timed("save binary", lambda: save_world(world, binary_filepath, binary=True))
+    timed("load binary", lambda: load_world(binary_filepath))
+
+    # Casting is reported per ray, as the reference caster tests every wall for each one
+    camera = Camera(open_cell(map_string), 0.0, math.pi / 2)
+    if timed("cast", lambda: [intersect_ray(ray, walls) for ray, _ in camera.rays(rays)]) is not None:
+        results["cast"] /= rays
+
+    editor_camera = EditorCamera(1280, 720)
+    renderer = EditorRenderer(editor_camera, pygame.Surface((1280, 720)))
+    timed("draw", lambda: DrawWalls.update(world=world, camera=editor_camera, renderer=renderer))
+
+    for filepath in (json_filepath, binary_filepath):
+        if os.path.exists(filepath):
+            os.remove(filepath)
+    os.rmdir(directory)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures how generating, compiling, loading, casting and drawing maps scale with size.")
+    parser.add_argument("--style", choices=list(MapStyles), default="cave", help="the kind of map to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-cells", type=int, default=10 ** 6, help="the largest map to measure, in cells")
+    parser.add_argument("--rays", type=int, default=16, help="rays cast to measure casting")
+    parser.add_argument("--budget", type=float, default=10.0, help="stop measuring a stage once it takes this many seconds")
+    arguments = parser.parse_args()
+
+    pygame.init()
+    stages = ["generate", "compile", "save json", "load json", "save binary", "load binary", "cast", "draw"]
+    remaining = set(stages)
+    print(f"{'cells':>9} {'walls':>9} " + " ".join(f"{stage:>11}" for stage in stages))
+
+    cells = 100
+    while cells <= arguments.max_cells:
+        results = measure(remaining, round(math.sqrt(cells)), arguments.style, arguments.seed, arguments.rays)
+        print(f"{cells:>9} {results['walls']:>9} " + " ".join(
+            f"{results[stage] * 1000.0:>9.2f}ms" if stage in results else f"{'-':>11}" for stage in stages
+        ))
+        # Larger maps would take longer still
+        remaining -= {stage for stage in stages if results.get(stage, 0.0) > arguments.budget}
+        cells *= 10
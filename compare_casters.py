@@ -0,0 +1,51 @@
+import argparse
+import math
+import sys
+from core.casting import Casters, Pose, compare_casts, random_poses
+from core.geometry import Point
+from core.mapcompiler import compile_map
+from core.mapgen import MapStyles, generate_map
+from raycasting import Camera
+
+# The field of view raycasting.main uses at its width of 1280 columns
+ViewingAngle = 2 * math.atan((1280 / 800) * math.tan((math.pi / 2) / 2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks a caster hits the same walls as the reference caster, from random poses on generated maps.")
+    parser.add_argument("--mode", choices=[mode for mode in Casters if mode != "reference"], default="grid", help="the caster to check")
+    parser.add_argument("--style", choices=list(MapStyles), action="append", help="the kinds of map to check on, defaulting to all")
+    parser.add_argument("--size", type=int, default=40, help="the width and height of the maps in cells")
+    parser.add_argument("--seed", type=int, default=0, help="the seed for the maps and poses")
+    parser.add_argument("--poses", type=int, default=1000, help="poses to check on each map")
+    parser.add_argument("--columns", type=int, default=320, help="rays to cast for each pose")
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="how far distances and points may differ")
+    parser.add_argument("--pose", type=float, nargs=3, metavar=("X", "Y", "DIRECTION"), help="check only this pose, to reproduce a divergence")
+    arguments = parser.parse_args()
+
+    divergences = 0
+    for style in arguments.style or list(MapStyles):
+        map_string = generate_map(style, arguments.size, arguments.size, arguments.seed)
+        walls = compile_map(map_string)
+        reference, candidate = Casters["reference"](walls), Casters[arguments.mode](walls)
+
+        if arguments.pose:
+            poses = [Pose(Point(arguments.pose[0], arguments.pose[1]), arguments.pose[2])]
+        else:
+            poses = random_poses(map_string, arguments.poses, arguments.seed)
+
+        for pose in poses:
+            camera = Camera(pose.location, pose.direction, ViewingAngle)
+            rays = [ray for ray, _ in camera.rays(arguments.columns)]
+            for divergence in compare_casts(pose, rays, reference, candidate, arguments.tolerance):
+                divergences += 1
+                print(f"{style} column {divergence.column}: {divergence.kind} differs")
+                print(f"    reference {divergence.reference}")
+                print(f"    {arguments.mode} {divergence.candidate}")
+                print(
+                    f"    reproduce with: --mode {arguments.mode} --style {style} --size {arguments.size} --seed {arguments.seed} "
+                    f"--columns {arguments.columns} --pose {pose.location.x!r} {pose.location.y!r} {pose.direction!r}"
+                )
+        print(f"Checked {len(poses)} poses of {arguments.columns} columns on a {arguments.size} by {arguments.size} {style}")
+
+    print(f"{divergences} divergences")
+    sys.exit(1 if divergences > 0 else 0)
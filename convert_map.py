@@ -0,0 +1,23 @@
+import argparse
+from core.chunks import write_chunks
+from core.journal import load_journaled_world
+from core.mapfile import is_binary_map, save_world
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converts a .map file between the JSON and binary formats.")
+    parser.add_argument("map", help="the .map file to convert")
+    parser.add_argument("output", help="where to write the converted map")
+    parser.add_argument("--json", action="store_true", help="write JSON, instead of the opposite of the input format")
+    parser.add_argument("--binary", action="store_true", help="write binary, instead of the opposite of the input format")
+    parser.add_argument("--chunks", type=float, metavar="SIZE", help="write a directory of chunks this size, for raycasting.py")
+    arguments = parser.parse_args()
+
+    # Edits still in the map's journal are included, as the editor would show them
+    world = load_journaled_world(arguments.map)
+    if arguments.chunks:
+        count = write_chunks(world.walls, arguments.output, arguments.chunks)
+        print(f"Wrote {len(world.walls)} walls to {count} chunks in {arguments.output}")
+    else:
+        binary = arguments.binary or (not arguments.json and not is_binary_map(arguments.map))
+        save_world(world, arguments.output, binary)
+        print(f"Wrote {len(world.walls)} walls to {arguments.output} as {'binary' if binary else 'JSON'}")
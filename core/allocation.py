@@ -0,0 +1,17 @@
+from contextlib import contextmanager
+from typing import Iterator
+import gc
+
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """
+    Pauses the garbage collector while making millions of small objects, which would otherwise repeatedly set it
+    off though none of them are garbage. It is only enabled again afterwards if it was enabled before.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
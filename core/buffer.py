@@ -0,0 +1,124 @@
+import numpy as np
+from .geometry import Segment
+from typing import Dict, List
+
+def clip_segments(coordinates: np.ndarray, minimum: tuple[float, float], maximum: tuple[float, float]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Clips rows of (start.x, start.y, end.x, end.y) to a rectangle.
+    Returns the clipped rows, and the indices of the input rows that touch the rectangle.
+    """
+    minimum, maximum = np.asarray(minimum, dtype=np.float64), np.asarray(maximum, dtype=np.float64)
+
+    # Cheaply reject anything with bounds outside the rectangle, before doing exact clipping on the rest
+    start_x, start_y, end_x, end_y = coordinates.T
+    candidates = np.flatnonzero(
+        (np.minimum(start_x, end_x) <= maximum[0]) & (np.maximum(start_x, end_x) >= minimum[0])
+        & (np.minimum(start_y, end_y) <= maximum[1]) & (np.maximum(start_y, end_y) >= minimum[1])
+    )
+
+    # Liang-Barsky, with the four rectangle edges as columns
+    start = coordinates[candidates, 0:2]
+    delta = coordinates[candidates, 2:4] - start
+    p = np.concatenate((-delta, delta), axis=1)
+    q = np.concatenate((start - minimum, maximum - start), axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = q / p
+    entering = np.where(p < 0.0, t, -np.inf).max(axis=1, initial=0.0)
+    leaving = np.where(p > 0.0, t, np.inf).min(axis=1, initial=1.0)
+    clip = np.flatnonzero(
+        (entering <= leaving) & ~((p == 0.0) & (q < 0.0)).any(axis=1)
+    )
+
+    start, delta = start[clip], delta[clip]
+    clipped = np.concatenate((
+        start + delta * entering[clip, np.newaxis],
+        start + delta * leaving[clip, np.newaxis]
+    ), axis=1)
+    return clipped, candidates[clip]
+
+def points_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """
+    Tests rows of (x, y) against a closed polygon given as rows of (x, y) corners, using the even-odd rule.
+    """
+    inside = np.zeros(len(points), dtype=bool)
+    x, y = points[:, 0], points[:, 1]
+    for (start_x, start_y), (end_x, end_y) in zip(polygon.tolist(), np.roll(polygon, -1, axis=0).tolist()):
+        if start_y == end_y:
+            continue
+
+        # Flip for every edge crossed by a ray from each point towards positive x
+        crosses = (start_y > y) != (end_y > y)
+        crossing_x = start_x + (y - start_y) * (end_x - start_x) / (end_y - start_y)
+        inside ^= crosses & (x < crossing_x)
+    return inside
+
+class WallBuffer():
+    """
+    Packs walls into rows of (start.x, start.y, end.x, end.y) so they can be processed with array operations.
+    Rows are not kept in wall order; removing a wall moves the last row into its place.
+    """
+    def __init__(self, walls: List[Segment]) -> None:
+        self.__walls: List[Segment] = list(walls)
+        self.__rows: Dict[int, int] = {id(wall): row for row, wall in enumerate(self.__walls)}
+        self.__data: np.ndarray = np.empty((max(16, len(self.__walls)), 4), dtype=np.float64)
+        if len(self.__walls) > 0:
+            self.__data[:len(self.__walls)] = [
+                (wall.start.x, wall.start.y, wall.end.x, wall.end.y) for wall in self.__walls
+            ]
+
+    @classmethod
+    def from_coordinates(cls, walls: List[Segment], coordinates: np.ndarray) -> 'WallBuffer':
+        """
+        Makes a buffer using rows of coordinates that already match the walls, without copying them.
+        The array must be writable, as edits are made to it in place until it needs to grow.
+        """
+        assert coordinates.shape == (len(walls), 4) and coordinates.dtype == np.float64
+        buffer = cls([])
+        buffer.__walls = list(walls)
+        buffer.__rows = {id(wall): row for row, wall in enumerate(buffer.__walls)}
+        buffer.__data = coordinates
+        return buffer
+
+    def __len__(self) -> int:
+        return len(self.__walls)
+
+    def __contains__(self, wall: Segment) -> bool:
+        return id(wall) in self.__rows
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        return self.__data[:len(self.__walls)]
+
+    @property
+    def walls(self) -> List[Segment]:
+        """
+        The walls in row order.
+        """
+        return self.__walls
+
+    def row(self, wall: Segment) -> int:
+        return self.__rows[id(wall)]
+
+    def rows(self, walls: List[Segment]) -> np.ndarray:
+        return np.fromiter((self.__rows[id(wall)] for wall in walls), dtype=np.int64, count=len(walls))
+
+    def insert(self, wall: Segment) -> None:
+        row = len(self.__walls)
+        if row == len(self.__data):
+            # Buffers loaded from a file may start out empty, so doubling alone never grows them
+            data = np.empty((max(16, 2 * len(self.__data)), 4), dtype=np.float64)
+            data[:row] = self.__data
+            self.__data = data
+
+        self.__walls.append(wall)
+        self.__rows[id(wall)] = row
+        self.__data[row] = (wall.start.x, wall.start.y, wall.end.x, wall.end.y)
+
+    def remove(self, wall: Segment) -> None:
+        row = self.__rows.pop(id(wall))
+        last = self.__walls.pop()
+        if last is not wall:
+            self.__walls[row] = last
+            self.__rows[id(last)] = row
+            self.__data[row] = self.__data[len(self.__walls)]
@@ -0,0 +1,83 @@
+import dataclasses
+import math
+import random
+from .geometry import IntersectResult, Point, Ray, Segment
+from .spatial import SegmentGrid
+from typing import Callable, Dict, List
+
+# Casts a ray, returning the closest wall it hits
+Caster = Callable[[Ray], IntersectResult]
+
+def reference_caster(walls: List[Segment]) -> Caster:
+    """
+    Tests every wall for every ray, as raycasting.main always has. Every other caster is checked against this.
+    """
+    return lambda ray: ray.to_segment().intersect_list(walls)
+
+def grid_caster(walls: List[Segment], cell_size: float = 1.0) -> Caster:
+    """
+    Only tests the walls in the cells of a SegmentGrid that each ray passes through, nearest first.
+    """
+    grid = SegmentGrid(walls, cell_size)
+    return lambda ray: grid.intersect(ray.to_segment())
+
+Casters: Dict[str, Callable[[List[Segment]], Caster]] = {
+    "reference": reference_caster,
+    "grid": grid_caster,
+}
+
+@dataclasses.dataclass
+class Pose():
+    location: Point
+    direction: float
+
+@dataclasses.dataclass
+class CastDivergence():
+    pose: Pose
+    column: int
+    # What differs: the hit, distance, point or wall
+    kind: str
+    reference: IntersectResult
+    candidate: IntersectResult
+
+def random_poses(map_string: str, count: int, seed: int = 0) -> List[Pose]:
+    """
+    Returns poses standing anywhere in the empty cells of an ASCII map, looking in any direction.
+    """
+    generator = random.Random(seed)
+    lines = map_string.split("\n")
+    cells = [(x, len(lines) - y) for y, line in enumerate(lines) for x, char in enumerate(line) if char == " "]
+    poses = []
+    for _ in range(count):
+        x, y = generator.choice(cells)
+        poses.append(Pose(
+            Point(x + generator.random(), y - generator.random()), generator.uniform(0.0, 2.0 * math.pi)
+        ))
+    return poses
+
+def compare_casts(pose: Pose, rays: List[Ray], reference: Caster, candidate: Caster, tolerance: float = 1e-6) -> List[CastDivergence]:
+    """
+    Casts every ray of a pose with both casters, returning the columns where they differ by more than tolerance.
+    Where walls meet, either may be hit at the same point, so the wall only differs if the candidate's wall does
+    not pass through the reference's hit.
+    """
+    divergences = []
+    for column, ray in enumerate(rays):
+        expected, actual = reference(ray), candidate(ray)
+
+        kind = None
+        if expected.hit != actual.hit:
+            kind = "hit"
+        elif not expected.hit:
+            continue
+        elif abs(expected.distance - actual.distance) > tolerance:
+            kind = "distance"
+        elif math.dist(expected.point, actual.point) > tolerance:
+            kind = "point"
+        elif expected.segment is not actual.segment and \
+            math.dist(actual.segment.closest_point(expected.point), expected.point) > tolerance:
+            kind = "wall"
+
+        if kind is not None:
+            divergences.append(CastDivergence(pose, column, kind, expected, actual))
+    return divergences
@@ -0,0 +1,211 @@
+from .geometry import Point, Segment
+from .mapfile import world_from_coordinates
+from collections import OrderedDict
+from typing import Dict, List, Set
+import json
+import math
+import numpy as np
+import os
+import queue
+import threading
+
+ChunkIndexName = "chunks.json"
+
+def write_chunks(walls: List[Segment], directory: str, chunk_size: float = 16.0) -> int:
+    """
+    Splits walls into square chunks of chunk_size, written to directory for a ChunkedWorld to load, and returns
+    the number of chunks. A wall is written to every chunk its bounds overlap, along with a number identifying it,
+    so a wall crossing chunks is still only one wall once they are loaded.
+    """
+    coordinates = np.array(
+        [(wall.start.x, wall.start.y, wall.end.x, wall.end.y) for wall in walls], dtype=np.float64
+    ).reshape(-1, 4)
+    low = np.floor(np.minimum(coordinates[:, 0:2], coordinates[:, 2:4]) / chunk_size).astype(np.int64)
+    high = np.floor(np.maximum(coordinates[:, 0:2], coordinates[:, 2:4]) / chunk_size).astype(np.int64)
+
+    chunks: Dict[tuple[int, int], List[int]] = {}
+    for wall_id, (low_x, low_y, high_x, high_y) in enumerate(np.hstack((low, high)).tolist()):
+        for x in range(low_x, high_x + 1):
+            for y in range(low_y, high_y + 1):
+                chunks.setdefault((x, y), []).append(wall_id)
+
+    os.makedirs(directory, exist_ok=True)
+    for (x, y), wall_ids in chunks.items():
+        ids = np.array(wall_ids, dtype=np.int64)
+        np.savez(os.path.join(directory, _chunk_filename(x, y)), ids=ids, coordinates=coordinates[ids])
+
+    with open(os.path.join(directory, ChunkIndexName), 'w') as file:
+        json.dump({
+            "chunk_size": chunk_size,
+            "chunks": [[x, y, len(wall_ids)] for (x, y), wall_ids in chunks.items()]
+        }, file)
+    return len(chunks)
+
+class ChunkedWorld():
+    """
+    The walls of a map written by write_chunks, with only the chunks around a location held in memory.
+
+    Calling update with the camera's location each frame requests the chunks within radius of it, and of where
+    it is heading, from a background thread. The least recently needed chunks outside that radius are dropped
+    once the walls held take more than budget bytes. walls and query only ever see resident chunks.
+    """
+    # A rough size for each resident wall: its Segment, Points and coordinates, and the lookups holding it
+    WallBytes: int = 400
+    # Chunks are also requested around where the location will be, moving as it did, this many updates ahead
+    LookaheadUpdates: int = 30
+
+    def __init__(self, directory: str, radius: float, budget: int = 64 << 20) -> None:
+        with open(os.path.join(directory, ChunkIndexName), 'r') as file:
+            index = json.load(file)
+
+        self.__directory: str = directory
+        self.__chunk_size: float = index["chunk_size"]
+        self.__counts: Dict[tuple[int, int], int] = {(x, y): count for x, y, count in index["chunks"]}
+        self.__radius: float = radius
+        self.__budget: int = budget
+        self.__location: Point = None
+
+        # Chunks in the order they were last needed, holding the ids of their walls
+        self.__resident: OrderedDict[tuple[int, int], List[int]] = OrderedDict()
+        self.__resident_walls: int = 0
+        self.__walls: Dict[int, Segment] = {}
+        self.__references: Dict[int, int] = {}
+        self.__wall_list: List[Segment] = None
+
+        self.__pending: Set[tuple[int, int]] = set()
+        self.__requests: queue.SimpleQueue = queue.SimpleQueue()
+        self.__loaded: queue.SimpleQueue = queue.SimpleQueue()
+        self.__thread: threading.Thread = threading.Thread(target=self.__run__, daemon=True)
+        self.__thread.start()
+
+    @property
+    def chunk_size(self) -> float:
+        return self.__chunk_size
+
+    @property
+    def resident_chunks(self) -> List[tuple[int, int]]:
+        return list(self.__resident)
+
+    @property
+    def resident_bytes(self) -> int:
+        return self.__resident_walls * self.WallBytes
+
+    @property
+    def walls(self) -> List[Segment]:
+        """
+        Every resident wall, once each. The list is only rebuilt when chunks are loaded or dropped.
+        """
+        if self.__wall_list is None:
+            self.__wall_list = list(self.__walls.values())
+        return self.__wall_list
+
+    def update(self, location: Point, wait: bool = False) -> None:
+        """
+        Adds the chunks loaded since the last update, and requests those needed around location.
+        With wait, returns only once every chunk needed has been loaded.
+        """
+        self.__take_loaded__()
+
+        ahead = location
+        if self.__location is not None:
+            ahead = location + (location - self.__location) * self.LookaheadUpdates
+        self.__location = location
+
+        needed = self.__chunks_near__(location)
+        for chunk in self.__chunks_near__(ahead):
+            if chunk not in needed:
+                needed.append(chunk)
+
+        for chunk in needed:
+            if chunk in self.__resident:
+                self.__resident.move_to_end(chunk)
+            elif chunk not in self.__pending and chunk in self.__counts:
+                self.__pending.add(chunk)
+                self.__requests.put(chunk)
+
+        if wait:
+            while any(chunk in self.__pending for chunk in needed):
+                self.__add_chunk__(*self.__loaded.get())
+
+        self.__evict__(set(needed))
+
+    def query(self, minimum: Point, maximum: Point) -> List[Segment]:
+        """
+        Returns the resident walls in chunks overlapping the area from minimum to maximum, once each.
+        """
+        walls: Dict[int, Segment] = {}
+        for chunk in self.__chunks_between__(minimum, maximum):
+            for wall_id in self.__resident.get(chunk, ()):
+                walls[wall_id] = self.__walls[wall_id]
+        return list(walls.values())
+
+    def close(self) -> None:
+        self.__requests.put(None)
+
+    def __chunks_between__(self, minimum: Point, maximum: Point) -> List[tuple[int, int]]:
+        size = self.__chunk_size
+        return [
+            (x, y)
+            for x in range(math.floor(minimum.x / size), math.floor(maximum.x / size) + 1)
+            for y in range(math.floor(minimum.y / size), math.floor(maximum.y / size) + 1)
+        ]
+
+    def __chunks_near__(self, location: Point) -> List[tuple[int, int]]:
+        # Chunks touching the circle around location, nearest first so they are loaded first
+        size = self.__chunk_size
+        offset = Point(self.__radius, self.__radius)
+        distances = []
+        for x, y in self.__chunks_between__(location - offset, location + offset):
+            dx = max(x * size - location.x, 0.0, location.x - (x + 1) * size)
+            dy = max(y * size - location.y, 0.0, location.y - (y + 1) * size)
+            if dx * dx + dy * dy <= self.__radius * self.__radius:
+                distances.append((dx * dx + dy * dy, (x, y)))
+        distances.sort()
+        return [chunk for _, chunk in distances]
+
+    def __take_loaded__(self) -> None:
+        while not self.__loaded.empty():
+            self.__add_chunk__(*self.__loaded.get())
+
+    def __add_chunk__(self, chunk: tuple[int, int], ids: List[int], walls: List[Segment]) -> None:
+        self.__pending.discard(chunk)
+        # Walls crossing chunks are shared with any resident chunk that already has them
+        for wall_id, wall in zip(ids, walls):
+            self.__walls.setdefault(wall_id, wall)
+            self.__references[wall_id] = self.__references.get(wall_id, 0) + 1
+        self.__resident[chunk] = ids
+        self.__resident_walls += len(ids)
+        self.__wall_list = None
+
+    def __evict__(self, needed: Set[tuple[int, int]]) -> None:
+        for chunk in list(self.__resident):
+            if self.resident_bytes <= self.__budget:
+                return
+            if chunk in needed:
+                continue
+
+            ids = self.__resident.pop(chunk)
+            for wall_id in ids:
+                self.__references[wall_id] -= 1
+                if self.__references[wall_id] == 0:
+                    del self.__references[wall_id]
+                    del self.__walls[wall_id]
+            self.__resident_walls -= len(ids)
+            self.__wall_list = None
+
+    def __run__(self) -> None:
+        while True:
+            chunk = self.__requests.get()
+            if chunk is None:
+                return
+            try:
+                with np.load(os.path.join(self.__directory, _chunk_filename(*chunk))) as data:
+                    ids, coordinates = data["ids"], data["coordinates"]
+                self.__loaded.put((chunk, ids.tolist(), world_from_coordinates(coordinates).walls))
+            except Exception as error:
+                # Leave the chunk empty rather than waiting on it forever
+                print(f"Failed to load chunk {chunk} from {self.__directory}: {error}")
+                self.__loaded.put((chunk, [], []))
+
+def _chunk_filename(x: int, y: int) -> str:
+    return f"chunk_{x}_{y}.npz"
@@ -0,0 +1,90 @@
+from .geometry import Point, Segment
+from typing import Dict, List
+
+# Supporting lines are compared after rounding to this precision, so float noise doesn't split them
+LINE_PRECISION = 1e-7
+
+def line_key(segment: Segment) -> tuple[int, int, int]:
+    """
+    Returns a hashable key for the infinite line a segment lies on, which is the same for every segment on
+    that line whichever way it faces. Zero length segments have no line, and raise a RuntimeError.
+    """
+    if segment.start == segment.end:
+        raise RuntimeError("Cannot find the line of a zero length segment")
+
+    direction = line_direction(segment)
+    normal = Point(-direction.y, direction.x)
+    distance = normal.x * segment.start.x + normal.y * segment.start.y
+
+    return (
+        round(normal.x / LINE_PRECISION),
+        round(normal.y / LINE_PRECISION),
+        round(distance / LINE_PRECISION),
+    )
+
+def line_interval(segment: Segment) -> tuple[float, float]:
+    """
+    Returns the start and end of a segment as distances along its line, measured in the same direction
+    for every segment with the same line_key. The start is larger than the end when the segment faces the other way.
+    """
+    direction = line_direction(segment)
+    return (
+        direction.x * segment.start.x + direction.y * segment.start.y,
+        direction.x * segment.end.x + direction.y * segment.end.y,
+    )
+
+def merged_ends(segments: List[Segment], forward: bool) -> tuple[Point, Point]:
+    """
+    Returns the start and end of one segment covering a set of overlapping collinear segments, facing the way
+    line_interval increases when forward is set. The end points are picked from the segments' own rather than
+    rebuilt from the line, so they stay exact.
+    """
+    direction = line_direction(segments[0])
+    points = [point for segment in segments for point in (segment.start, segment.end)]
+    first = min(points, key=lambda point: direction.x * point.x + direction.y * point.y)
+    last = max(points, key=lambda point: direction.x * point.x + direction.y * point.y)
+    return (first, last) if forward else (last, first)
+
+def line_direction(segment: Segment) -> Point:
+    # Pick one of the two directions along the line, so segments facing either way agree
+    direction = segment.normal()
+    if direction.y > 0.0 or (direction.y == 0.0 and direction.x < 0.0):
+        direction = direction * -1.0
+    return direction
+
+class LineIndex():
+    """
+    Groups walls by the line they lie on, for finding collinear walls with a single lookup.
+    """
+    def __init__(self, walls: List[Segment]) -> None:
+        self.__lines: Dict[tuple[int, int, int], Dict[int, Segment]] = {}
+        self.__wall_lines: Dict[int, tuple[int, int, int]] = {}
+
+        for wall in walls:
+            self.insert(wall)
+
+    def insert(self, wall: Segment) -> None:
+        if wall.start == wall.end:
+            return
+
+        key = line_key(wall)
+        self.__wall_lines[id(wall)] = key
+        self.__lines.setdefault(key, {})[id(wall)] = wall
+
+    def remove(self, wall: Segment) -> None:
+        key = self.__wall_lines.pop(id(wall), None)
+        if key is None:
+            return
+
+        walls = self.__lines[key]
+        del walls[id(wall)]
+        if len(walls) == 0:
+            del self.__lines[key]
+
+    def collinear(self, wall: Segment) -> List[Segment]:
+        """
+        Returns the walls on the same line as this one, facing either way.
+        """
+        if wall.start == wall.end:
+            return []
+        return [other for other in self.__lines.get(line_key(wall), {}).values() if other is not wall]
@@ -118,6 +118,13 @@ class Segment:
         else:
             return None
 
+    def set_points(self, start: Point, end: Point) -> None:
+        self.start, self.end = start, end
+
+        # Bounds are cached, so they need to be recalculated for the new points
+        for bound in ("min_x", "max_x", "min_y", "max_y"):
+            self.__dict__.pop(bound, None)
+
     @functools.cached_property
     def min_x(self):
         return min(self.start.x, self.end.x)
@@ -149,6 +156,15 @@ class Segment:
     def surface_normal(self):
         return self.normal().rotate(math.pi / 2)
 
+    def closest_point(self, p: Point) -> Point:
+        delta = self.delta()
+        length_squared = delta.x * delta.x + delta.y * delta.y
+        if length_squared == 0.0:
+            return self.start
+
+        t = ((p.x - self.start.x) * delta.x + (p.y - self.start.y) * delta.y) / length_squared
+        return self.start + delta * min(1.0, max(0.0, t))
+
     def in_bounds(self, p: Point):
         return in_range(self.min_x, self.max_x, p.x) and in_range(
             self.min_y, self.max_y, p.y
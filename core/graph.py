@@ -0,0 +1,44 @@
+from .geometry import Point, Segment
+from typing import Dict, List
+
+class VertexGraph():
+    """
+    Connects every wall end point to the walls that use it, so walls sharing a point can be found and
+    moved together without searching all of the walls.
+    """
+    def __init__(self, walls: List[Segment]) -> None:
+        self.__vertices: Dict[Point, Dict[int, Segment]] = {}
+
+        for wall in walls:
+            self.insert(wall)
+
+    def insert(self, wall: Segment) -> None:
+        for point in (wall.start, wall.end):
+            self.__vertices.setdefault(point, {})[id(wall)] = wall
+
+    def remove(self, wall: Segment) -> None:
+        for point in (wall.start, wall.end):
+            walls = self.__vertices.get(point)
+            if walls is not None and walls.pop(id(wall), None) is not None and len(walls) == 0:
+                del self.__vertices[point]
+
+    def walls_at(self, point: Point) -> List[Segment]:
+        return list(self.__vertices.get(point, {}).values())
+
+    def degree(self, point: Point) -> int:
+        return len(self.__vertices.get(point, {}))
+
+    def connected(self, wall: Segment) -> List[Segment]:
+        """
+        Returns the chain of walls joined to this one through shared end points, including itself.
+        """
+        found = {id(wall): wall}
+        pending = [wall]
+        while len(pending) > 0:
+            current = pending.pop()
+            for point in (current.start, current.end):
+                for key, neighbour in self.__vertices.get(point, {}).items():
+                    if key not in found:
+                        found[key] = neighbour
+                        pending.append(neighbour)
+        return list(found.values())
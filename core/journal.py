@@ -0,0 +1,206 @@
+from .geometry import Point, Segment
+from .mapfile import load_world
+from .world import World
+from typing import Dict, List
+import json
+import os
+import threading
+
+# Journals are kept next to their map, as the map's filename with this suffix
+JournalSuffix = ".journal"
+
+class WorldJournal():
+    """
+    Records every wall added to or removed from a world in an append-only file next to its map, so saving
+    only costs as much as the edits made, and unsaved edits can be recovered by replaying the journal.
+    Editing a wall is recorded as removing it and adding it again.
+
+    The journal is adopted by a World as an index, so it sees every change made through the World.
+    The first line names the size and modification time of the map it applies to, so a journal is never
+    replayed over a map that has been changed some other way. Before a map saved with the edits replaces
+    it, a checkpoint naming the new map is added, so if the journal is not compacted after, only the edits
+    made since the checkpoint are replayed over the new map.
+    """
+    def __init__(self, filepath: str, map_filepath: str) -> None:
+        self.__filepath: str = filepath
+        self.__map_filepath: str = map_filepath
+        self.__lock: threading.Lock = threading.Lock()
+        self.__operations: int = 0
+
+        # Operations that apply to the map are kept, under a header naming it
+        remaining = ""
+        start = journal_start(filepath, map_filepath) if os.path.exists(filepath) else None
+        if start is not None:
+            with open(filepath, 'r') as file:
+                file.seek(start)
+                remaining = _operation_lines(file.read())
+            self.__operations = remaining.count("\n")
+        _write_journal(filepath, self.__header__() + "\n" + remaining)
+        self.__file = open(filepath, 'a')
+
+    @property
+    def operations(self) -> int:
+        """
+        The number of operations recorded since the map was last compacted.
+        """
+        return self.__operations
+
+    def insert(self, wall: Segment) -> None:
+        self.__append__("+", wall)
+
+    def remove(self, wall: Segment) -> None:
+        self.__append__("-", wall)
+
+    def flush(self, sync: bool = False) -> None:
+        """
+        Writes buffered operations to the file, and when sync is set waits for them to reach the disk.
+        """
+        with self.__lock:
+            self.__file.flush()
+            if sync:
+                os.fsync(self.__file.fileno())
+
+    def position(self) -> int:
+        """
+        Marks the operations recorded so far, for compacting once they have been saved to the map.
+        """
+        with self.__lock:
+            self.__file.flush()
+            return self.__file.tell()
+
+    def checkpoint(self, position: int, map_filepath: str) -> None:
+        """
+        Records that the map file about to replace this journal's map holds the operations before position.
+        This may be called from another thread, and returns once the checkpoint has reached the disk.
+        """
+        with self.__lock:
+            self.__file.write(json.dumps(_map_stamp(map_filepath) | {"position": position}) + "\n")
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+
+    def compact(self, position: int) -> None:
+        """
+        Drops the operations before position, once the map has been saved with them. Operations recorded while
+        the map was saving are kept. This may be called from another thread.
+        """
+        with self.__lock:
+            self.__file.flush()
+            with open(self.__filepath, 'r') as file:
+                file.seek(position)
+                remaining = _operation_lines(file.read())
+
+            self.__file.close()
+            _write_journal(self.__filepath, self.__header__() + "\n" + remaining)
+            self.__file = open(self.__filepath, 'a')
+            self.__operations = remaining.count("\n")
+
+    def close(self) -> None:
+        """
+        Closes the journal, and deletes it if every operation has been compacted into the map.
+        """
+        with self.__lock:
+            self.__file.close()
+            if self.__operations == 0:
+                os.remove(self.__filepath)
+
+    def __append__(self, operation: str, wall: Segment) -> None:
+        with self.__lock:
+            self.__file.write(json.dumps([operation, wall.start.x, wall.start.y, wall.end.x, wall.end.y]) + "\n")
+            self.__operations += 1
+
+    def __header__(self) -> str:
+        return json.dumps(_map_stamp(self.__map_filepath))
+
+def journal_start(filepath: str, map_filepath: str) -> int | None:
+    """
+    Returns the position in a journal of the first operation that the map does not hold yet, which is just
+    after the header if it names the map, or at the latest checkpoint that does. Returns None if neither do.
+    """
+    stamp = _map_stamp(map_filepath)
+    start = None
+    with open(filepath, 'r') as file:
+        line = file.readline()
+        while line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            position = record.pop("position", file.tell())
+            if record == stamp:
+                start = position
+
+            # Operations are lists, so records are told apart by their first character
+            line = file.readline()
+            while line.startswith("["):
+                line = file.readline()
+    return start
+
+def replay_journal(world: World, filepath: str, map_filepath: str) -> int:
+    """
+    Applies the operations in a journal to a world loaded from its map, returning how many were applied.
+    A journal for a different version of the map is renamed with a .stale suffix rather than applied.
+    An operation cut off by a crash at the end of the journal is ignored.
+    """
+    if not os.path.exists(filepath):
+        return 0
+    start = journal_start(filepath, map_filepath)
+    if start is None:
+        os.replace(filepath, filepath + ".stale")
+        return 0
+
+    # Walls are removed by value, so find them through their end points
+    walls: Dict[tuple[Point, Point], List[Segment]] = {}
+    for wall in world.walls:
+        walls.setdefault((wall.start, wall.end), []).append(wall)
+
+    removed: Dict[int, Segment] = {}
+    added: Dict[int, Segment] = {}
+    operations = 0
+    with open(filepath, 'r') as file:
+        file.seek(start)
+        for line in file:
+            if line.startswith("{"):
+                continue
+            try:
+                operation, start_x, start_y, end_x, end_y = json.loads(line)
+            except json.JSONDecodeError:
+                break
+
+            key = (Point(start_x, start_y), Point(end_x, end_y))
+            if operation == "+":
+                wall = Segment(*key)
+                walls.setdefault(key, []).append(wall)
+                added[id(wall)] = wall
+            elif len(walls.get(key, [])) > 0:
+                wall = walls[key].pop()
+                if added.pop(id(wall), None) is None:
+                    removed[id(wall)] = wall
+            operations += 1
+
+    world.remove_walls(list(removed.values()))
+    world.add_walls(list(added.values()))
+    return operations
+
+def load_journaled_world(map_filepath: str) -> World:
+    """
+    Loads a map along with the edits in its journal that have not been saved to it yet.
+    """
+    world = load_world(map_filepath)
+    replay_journal(world, map_filepath + JournalSuffix, map_filepath)
+    return world
+
+def _operation_lines(lines: str) -> str:
+    # Drops the header and checkpoints, which are only read at the start of the journal
+    return "".join(line for line in lines.splitlines(keepends=True) if not line.startswith("{"))
+
+def _write_journal(filepath: str, contents: str) -> None:
+    temporary_filepath = filepath + ".tmp"
+    with open(temporary_filepath, 'w') as file:
+        file.write(contents)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_filepath, filepath)
+
+def _map_stamp(map_filepath: str) -> Dict[str, int]:
+    status = os.stat(map_filepath)
+    return {"size": status.st_size, "modified": status.st_mtime_ns}
@@ -0,0 +1,27 @@
+from .geometry import Segment
+from .mapfile import load_binary_world, save_binary_world
+from .world import World
+from typing import Callable, List
+import hashlib
+import os
+
+def cached_world(source: str, version: int, build: Callable[[str], List[Segment]], directory: str) -> World:
+    """
+    Builds the walls of a map from its source, or loads them from a previous build. Builds are saved as binary
+    maps with their spatial index, named by a hash of the source and version, so changing either the map or
+    how it is built misses the cache. Walls keep the order they were built in.
+    """
+    digest = hashlib.sha256(f"{version}\n{source}".encode("utf-8")).hexdigest()
+    filepath = os.path.join(directory, f"{digest}.map")
+
+    if os.path.exists(filepath):
+        try:
+            return load_binary_world(filepath)
+        except (OSError, RuntimeError) as error:
+            # A cache from an older binary format, or one that was cut short, is just rebuilt
+            print(f"Rebuilding map cache {filepath}: {error}")
+
+    world = World(build(source))
+    os.makedirs(directory, exist_ok=True)
+    save_binary_world(world, filepath)
+    return world
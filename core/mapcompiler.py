@@ -0,0 +1,139 @@
+from .allocation import gc_paused
+from .geometry import Point, Segment
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List
+import math
+import os
+
+# Increment whenever compile_map changes the walls it builds, so maps built before are not loaded from a cache
+MapCompilerVersion = 2
+
+# Edges are integer tuples of (start.x, start.y, end.x, end.y) until they are made into walls at the end
+Edge = tuple[int, int, int, int]
+
+#
+# Symbols, and the unit edges they add relative to the upper left corner of their cell:
+#
+#  /  ###   # or *  ### & ###  %    #  `  #
+#     ##            ###    ##      ##     ##
+#     #             ###     #     ###     ###
+#
+_Box = ((0, 0, 1, 0), (1, 0, 1, -1), (0, 0, 0, -1), (0, -1, 1, -1))
+CellEdges: Dict[str, tuple[Edge, ...]] = {
+    "#": _Box,
+    "*": _Box,
+    "/": ((0, 0, 1, 0), (1, 0, 0, -1), (0, 0, 0, -1)),
+    "&": ((0, 0, 1, 0), (1, 0, 1, -1), (0, 0, 1, -1)),
+    "%": ((0, -1, 1, -1), (1, 0, 1, -1), (0, -1, 1, 0)),
+    "`": ((0, 0, 1, -1), (0, -1, 1, -1), (0, 0, 0, -1)),
+}
+
+# Maps with fewer cells than this are compiled in this process, as starting workers would take longer
+ParallelCells = 1 << 16
+# Rows are split into this many bands for each worker, so workers finishing early can take another
+BandsPerProcess = 4
+
+def compile_map(map_string: str, processes: int = None) -> List[Segment]:
+    """
+    Compiles an ASCII map into walls. Each cell adds the edges of its shape, edges shared by two cells are
+    removed, and edges on the same line that touch are merged into one wall, whichever way they face.
+
+    The rows are compiled in bands across a pool of processes, defaulting to one per core. Horizontal edges
+    on the seams between bands are only removed and merged once every band is done, along with the walls
+    ending on a seam. Walls are sorted, so the result is the same however many processes compile it.
+    """
+    with gc_paused():
+        return _compile_map(map_string, processes)
+
+def _compile_map(map_string: str, processes: int) -> List[Segment]:
+    lines = map_string.split("\n")
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or sum(len(line) for line in lines) < ParallelCells:
+        starts = [0]
+        bands = [_compile_band(lines, len(lines))]
+    else:
+        size = math.ceil(len(lines) / (processes * BandsPerProcess))
+        starts = range(0, len(lines), size)
+        with ProcessPoolExecutor(processes) as executor:
+            bands = list(executor.map(
+                _compile_band, [lines[start:start + size] for start in starts], [len(lines) - start for start in starts]
+            ))
+
+    # Rows are numbered down from len(lines) at the top, and the map ends at zero
+    seam_ys = {len(lines) - start for start in starts} | {0}
+    seams = Counter(edge for _, band_seams in bands for edge in band_seams)
+    edges, unfinished = [], [edge for edge, count in seams.items() if count == 1]
+    for band_edges, _ in bands:
+        for edge in band_edges:
+            # Walls ending on a seam may continue in the next band
+            if edge[1] in seam_ys or edge[3] in seam_ys:
+                unfinished.append(edge)
+            else:
+                edges.append(edge)
+    edges += _merge_edges(unfinished)
+
+    edges.sort()
+    starts = map(tuple.__new__, repeat(Point), [edge[0:2] for edge in edges])
+    ends = map(tuple.__new__, repeat(Point), [edge[2:4] for edge in edges])
+    return list(map(Segment, starts, ends))
+
+def _compile_band(lines: List[str], top: int) -> tuple[List[Edge], List[Edge]]:
+    """
+    Returns the merged edges of a band of rows whose first row is at y = top, and separately the unmerged
+    horizontal edges along its top and bottom, which may be shared with the neighbouring bands.
+    """
+    counts: Counter = Counter()
+    for y, line in zip(range(top, top - len(lines), -1), lines):
+        for x, char in enumerate(line):
+            for start_x, start_y, end_x, end_y in CellEdges.get(char, ()):
+                counts[(x + start_x, y + start_y, x + end_x, y + end_y)] += 1
+
+    seam_ys = (top, top - len(lines))
+    edges, seams = [], []
+    for edge, count in counts.items():
+        if count != 1:
+            continue
+        if edge[1] == edge[3] and edge[1] in seam_ys:
+            seams.append(edge)
+        else:
+            edges.append(edge)
+    return _merge_edges(edges), seams
+
+def _merge_edges(edges: List[Edge]) -> List[Edge]:
+    """
+    Merges edges on the same line that touch or overlap, facing the way of the first along the line.
+    """
+    lines: Dict[tuple[int, int, int], List[tuple[int, int, tuple[int, int], tuple[int, int], bool]]] = {}
+    for edge in edges:
+        start_x, start_y, end_x, end_y = edge
+        dx, dy = end_x - start_x, end_y - start_y
+        divisor = math.gcd(dx, dy)
+        dx, dy = dx // divisor, dy // divisor
+        # Pick one direction along the line, so edges facing either way agree. Distances along the line
+        # then increase in the same order as the points themselves.
+        if dx < 0 or (dx == 0 and dy < 0):
+            dx, dy = -dx, -dy
+
+        start, end = dx * start_x + dy * start_y, dx * end_x + dy * end_y
+        if start < end:
+            interval = (start, end, (start_x, start_y), (end_x, end_y), True)
+        else:
+            interval = (end, start, (end_x, end_y), (start_x, start_y), False)
+        lines.setdefault((dx, dy, dx * start_y - dy * start_x), []).append(interval)
+
+    merged = []
+    for intervals in lines.values():
+        intervals.sort()
+        _, high, first, last, forward = intervals[0]
+        for interval in intervals[1:]:
+            if interval[0] <= high:
+                if interval[1] > high:
+                    high, last = interval[1], interval[3]
+                continue
+
+            merged.append(first + last if forward else last + first)
+            _, high, first, last, forward = interval
+        merged.append(first + last if forward else last + first)
+    return merged
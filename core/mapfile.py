@@ -0,0 +1,243 @@
+from .allocation import gc_paused
+from .buffer import WallBuffer
+from .geometry import Point, Segment
+from .serialization import Context, Serializer, TypeHint, TypeHandler
+from .spatial import SegmentGrid
+from .world import World, MakeWorld
+from itertools import repeat
+from typing import IO, Callable, Iterator, List
+import json
+import mmap
+import numpy as np
+import os
+import re
+import struct
+
+class PointHandler(TypeHandler):
+    """
+    Handles Serialization for the Point Type.
+    This is necessary as it's a Tuple and it's members cannot be directly set.
+    """
+    @classmethod
+    def typename(cls) -> str:
+        return "Point"
+
+    @classmethod
+    def serialize(cls, context: Context):
+        context.output.object = {"x": context.input.object.x, "y": context.input.object.y}
+
+    @classmethod
+    def deserialize(cls, context: Context):
+        context.output.object = Point(context.input.object["x"], context.input.object["y"])
+
+def make_map_serializer() -> Serializer:
+    """
+    Serializers keep state while they work, so each thread serializing maps needs its own.
+    """
+    return Serializer(
+        hints={
+            "Segment": TypeHint(["start", "end"])
+        },
+        handlers=Serializer.DefaultHandlers + [
+            PointHandler()
+        ]
+    )
+
+MapSerializer = make_map_serializer()
+
+# Binary maps start with a fixed size header of the magic, version, section count, wall count and bounds.
+# Walls follow as little endian float64 rows of (start.x, start.y, end.x, end.y), then any sections, each
+# with a tag and byte length. Everything is 8 byte aligned so arrays can be used straight from the file.
+BinaryMagic = b"RAYCMAP\0"
+BinaryVersion = 1
+BinaryHeader = struct.Struct("<8sIIQdddd")
+BinaryHeaderSize = 64
+BinarySection = struct.Struct("<4sIQ")
+GridSectionTag = b"GRID"
+
+def is_binary_map(filepath: str) -> bool:
+    with open(filepath, 'rb') as file:
+        return file.read(len(BinaryMagic)) == BinaryMagic
+
+def load_world(filepath: str) -> World:
+    """
+    Loads a world from either a JSON or binary map.
+    """
+    if is_binary_map(filepath):
+        return load_binary_world(filepath)
+
+    world = MakeWorld()
+    with open(filepath, 'r') as file:
+        MapSerializer.deserialize(world, json.load(file))
+    return world
+
+def iterate_walls(filepath: str, batch_size: int = 4096, chunk_size: int = 1 << 16) -> Iterator[tuple[List[Segment], float]]:
+    """
+    Reads the walls of a JSON map a chunk of the file at a time, yielding batches of walls along with the
+    fraction of the file read so far. Only the walls being parsed are held in memory, not the whole document.
+    """
+    decoder = json.JSONDecoder()
+    serializer = make_map_serializer()
+    walls_start = re.compile(r'"walls"\s*:\s*\[')
+    size = max(1, os.path.getsize(filepath))
+
+    with open(filepath, 'r') as file:
+        buffer, position, read = "", 0, 0
+
+        def more() -> bool:
+            nonlocal buffer, position, read
+            chunk = file.read(chunk_size)
+            read += len(chunk)
+            buffer, position = buffer[position:] + chunk, 0
+            return len(chunk) > 0
+
+        # Skip ahead to the start of the wall list
+        match = walls_start.search(buffer)
+        while match is None:
+            # Keep the end of the buffer, in case the key is split between chunks
+            buffer, position = buffer[-16:], 0
+            if not more():
+                return
+            match = walls_start.search(buffer)
+        position = match.end()
+
+        batch = []
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                if not more():
+                    raise ValueError(f"Unexpected end of map file {filepath}")
+                continue
+            if buffer[position] == "]":
+                break
+
+            try:
+                data, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The wall is split between chunks
+                if not more():
+                    raise
+                continue
+
+            position = end
+            batch.append(serializer.deserialize(Segment(), data))
+            if len(batch) == batch_size:
+                yield batch, min(1.0, read / size)
+                batch = []
+
+        yield batch, 1.0
+
+def save_world(world: World, filepath: str, binary: bool = False, replacing: Callable[[str], None] = None) -> None:
+    """
+    Saves a world as a JSON or binary map. The map is written to a temporary file which then replaces the
+    original, so a crash part way through never leaves a partial map behind. replacing is called with the
+    temporary file once it is complete, just before it replaces the original.
+    """
+    if binary:
+        save_binary_world(world, filepath, replacing=replacing)
+        return
+
+    # Serializers keep state while they work, and saves may be made from other threads
+    _replace_file(filepath, 'w', lambda file: make_map_serializer().serialize_to(world, file), replacing)
+
+def world_from_coordinates(coordinates: np.ndarray) -> World:
+    """
+    Makes a world from rows of (start.x, start.y, end.x, end.y), using the rows as its WallBuffer.
+    """
+    walls = _make_walls(coordinates)
+    world = World(walls)
+    world.adopt_index(WallBuffer.from_coordinates(walls, coordinates))
+    return world
+
+def load_binary_world(filepath: str) -> World:
+    """
+    Loads a binary map by mapping the file into memory. The world's WallBuffer uses the mapped rows directly,
+    and a saved spatial index is used instead of building one. Pages are copied on write, so the file
+    itself is never changed by edits.
+    """
+    with open(filepath, 'rb') as file:
+        # Empty files can't be mapped
+        _check_length(os.fstat(file.fileno()).st_size, BinaryHeaderSize, filepath)
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    _check_length(len(data), BinaryHeaderSize, filepath)
+    magic, version, section_count, wall_count, *_ = BinaryHeader.unpack_from(data, 0)
+    if magic != BinaryMagic or version != BinaryVersion:
+        raise RuntimeError(f"Unsupported map file {filepath}")
+
+    offset = BinaryHeaderSize + wall_count * 32
+    _check_length(len(data), offset, filepath)
+    coordinates = np.frombuffer(data, dtype="<f8", count=wall_count * 4, offset=BinaryHeaderSize).reshape(-1, 4)
+    world = world_from_coordinates(coordinates)
+    walls = world.walls
+
+    for _ in range(section_count):
+        _check_length(len(data), offset + BinarySection.size, filepath)
+        tag, _, length = BinarySection.unpack_from(data, offset)
+        offset += BinarySection.size
+        _check_length(len(data), offset + length, filepath)
+        if tag == GridSectionTag:
+            _check_length(length, 16, filepath)
+            cell_size, count = struct.unpack_from("<dQ", data, offset)
+            _check_length(length, 16 + count * 16, filepath)
+            keys = np.frombuffer(data, dtype="<i8", count=count, offset=offset + 16)
+            positions = np.frombuffer(data, dtype="<i8", count=count, offset=offset + 16 + count * 8)
+            world.adopt_index(SegmentGrid.from_cells(walls, cell_size, keys, positions))
+        offset += length
+
+    return world
+
+def _check_length(length: int, needed: int, filepath: str) -> None:
+    # Files cut short would otherwise fail part way through reading a header or array
+    if length < needed:
+        raise RuntimeError(f"Truncated map file {filepath}")
+
+def save_binary_world(world: World, filepath: str, spatial_index: bool = True, replacing: Callable[[str], None] = None) -> None:
+    """
+    Saves a binary map, along with the world's SegmentGrid when spatial_index is set.
+    The original is replaced rather than written over, as it may still be mapped by the world being saved.
+    """
+    # Rows are written in the order of the world's walls, which edits can change from the buffer's order
+    buffer: WallBuffer = world.index(WallBuffer)
+    walls = world.walls
+    coordinates = buffer.coordinates[buffer.rows(walls)]
+    if len(coordinates) > 0:
+        minimum, maximum = np.minimum(coordinates[:, 0:2], coordinates[:, 2:4]).min(axis=0), \
+            np.maximum(coordinates[:, 0:2], coordinates[:, 2:4]).max(axis=0)
+    else:
+        minimum, maximum = (0.0, 0.0), (0.0, 0.0)
+
+    sections = []
+    if spatial_index:
+        grid: SegmentGrid = world.index(SegmentGrid)
+        keys, positions = grid.export(walls)
+        sections.append((GridSectionTag, b"".join((
+            struct.pack("<dQ", grid.cell_size, len(keys)), keys.astype("<i8").tobytes(), positions.astype("<i8").tobytes()
+        ))))
+
+    def write(file: IO) -> None:
+        header = BinaryHeader.pack(BinaryMagic, BinaryVersion, len(sections), len(coordinates), *minimum, *maximum)
+        file.write(header.ljust(BinaryHeaderSize, b"\0"))
+        file.write(coordinates.astype("<f8").tobytes())
+        for tag, section in sections:
+            file.write(BinarySection.pack(tag, 0, len(section)))
+            file.write(section)
+
+    _replace_file(filepath, 'wb', write, replacing)
+
+def _replace_file(filepath: str, mode: str, write: Callable[[IO], None], replacing: Callable[[str], None] = None) -> None:
+    temporary_filepath = filepath + ".tmp"
+    with open(temporary_filepath, mode) as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    if replacing is not None:
+        replacing(temporary_filepath)
+    os.replace(temporary_filepath, filepath)
+
+def _make_walls(coordinates: np.ndarray) -> List[Segment]:
+    with gc_paused():
+        starts = map(tuple.__new__, repeat(Point), coordinates[:, 0:2].tolist())
+        ends = map(tuple.__new__, repeat(Point), coordinates[:, 2:4].tolist())
+        return list(map(Segment, starts, ends))
@@ -0,0 +1,106 @@
+from .mapcompiler import compile_map
+from .world import World
+from typing import Callable, Dict
+import numpy as np
+import random
+
+Wall, Empty = ord("#"), ord(" ")
+UpperLeft, UpperRight, LowerRight, LowerLeft = ord("/"), ord("&"), ord("%"), ord("`")
+
+def generate_map(style: str, width: int, height: int, seed: int = 0) -> str:
+    """
+    Generates an ASCII map for make_map of width by height cells, surrounded by walls. The same style, size and
+    seed always give the same map. Styles are:
+        maze: one cell wide corridors with a single path between any two places
+        cave: open caverns, with triangles rounding off their corners
+        arena: an open room of scattered pillars, with their corners cut off
+        triangles: a random field of boxes and triangles
+    """
+    if style not in MapStyles:
+        raise ValueError(f"Unknown map style {style}, expected one of {', '.join(MapStyles)}")
+    if width < 3 or height < 3:
+        raise ValueError(f"Maps must be at least 3 by 3 cells, not {width} by {height}")
+
+    grid = np.full((height, width), Empty, dtype=np.uint8)
+    MapStyles[style](grid, seed)
+    grid[[0, -1], :] = Wall
+    grid[:, [0, -1]] = Wall
+    return "\n".join(row.tobytes().decode("ascii") for row in grid)
+
+def generate_world(style: str, width: int, height: int, seed: int = 0) -> World:
+    return World(compile_map(generate_map(style, width, height, seed)))
+
+def _maze(grid: np.ndarray, seed: int) -> None:
+    # Carve corridors between the cells at odd coordinates with a depth first search, from the top left
+    generator = random.Random(seed)
+    height, width = grid.shape
+    grid[:] = Wall
+
+    stack = [(1, 1)]
+    grid[1, 1] = Empty
+    while len(stack) > 0:
+        y, x = stack[-1]
+        neighbours = [
+            (y + dy, x + dx) for dy, dx in ((-2, 0), (2, 0), (0, -2), (0, 2))
+            if 0 < y + dy < height - 1 and 0 < x + dx < width - 1 and grid[y + dy, x + dx] == Wall
+        ]
+        if len(neighbours) == 0:
+            stack.pop()
+            continue
+
+        next_y, next_x = generator.choice(neighbours)
+        grid[(y + next_y) // 2, (x + next_x) // 2] = Empty
+        grid[next_y, next_x] = Empty
+        stack.append((next_y, next_x))
+
+def _cave(grid: np.ndarray, seed: int) -> None:
+    # Smooth random noise into caverns with a cellular automaton, where cells with mostly walls around become walls
+    generator = np.random.default_rng(seed)
+    walls = generator.random(grid.shape) < 0.45
+    for _ in range(4):
+        padded = np.pad(walls, 1, constant_values=True).astype(np.uint8)
+        neighbours = sum(
+            padded[1 + dy:padded.shape[0] - 1 + dy, 1 + dx:padded.shape[1] - 1 + dx]
+            for dy in (-1, 0, 1) for dx in (-1, 0, 1) if (dy, dx) != (0, 0)
+        )
+        walls = neighbours >= np.where(walls, 4, 5)
+
+    grid[walls] = Wall
+    _round_corners(grid)
+
+def _arena(grid: np.ndarray, seed: int) -> None:
+    generator = random.Random(seed)
+    height, width = grid.shape
+    for _ in range(width * height // 150):
+        pillar_width, pillar_height = generator.randint(1, 4), generator.randint(1, 4)
+        x, y = generator.randint(2, max(2, width - pillar_width - 2)), generator.randint(2, max(2, height - pillar_height - 2))
+        pillar = grid[y:y + pillar_height, x:x + pillar_width]
+        pillar[:] = Wall
+
+        # Cut the corners off pillars big enough to keep a box in the middle
+        if pillar.shape[0] >= 2 and pillar.shape[1] >= 2:
+            pillar[0, 0], pillar[0, -1] = LowerRight, LowerLeft
+            pillar[-1, 0], pillar[-1, -1] = UpperRight, UpperLeft
+
+def _triangles(grid: np.ndarray, seed: int) -> None:
+    generator = np.random.default_rng(seed)
+    glyphs = np.array([Empty, Wall, UpperLeft, UpperRight, LowerRight, LowerLeft], dtype=np.uint8)
+    grid[:] = glyphs[generator.choice(len(glyphs), size=grid.shape, p=[0.7, 0.1, 0.05, 0.05, 0.05, 0.05])]
+
+def _round_corners(grid: np.ndarray) -> None:
+    # Fill the half of an empty cell in the corner between two walls with a triangle
+    walls = np.pad(grid == Wall, 1, constant_values=True)
+    above, below = walls[:-2, 1:-1], walls[2:, 1:-1]
+    left, right = walls[1:-1, :-2], walls[1:-1, 2:]
+    empty = grid == Empty
+    grid[empty & above & left & ~below & ~right] = UpperLeft
+    grid[empty & above & right & ~below & ~left] = UpperRight
+    grid[empty & below & right & ~above & ~left] = LowerRight
+    grid[empty & below & left & ~above & ~right] = LowerLeft
+
+MapStyles: Dict[str, Callable[[np.ndarray, int], None]] = {
+    "maze": _maze,
+    "cave": _cave,
+    "arena": _arena,
+    "triangles": _triangles,
+}
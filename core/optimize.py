@@ -0,0 +1,119 @@
+import dataclasses
+from .collinear import LINE_PRECISION, line_interval, line_key, merged_ends
+from .geometry import Point, Segment
+from .spatial import SegmentGrid
+from .world import World
+from typing import Dict, List
+
+@dataclasses.dataclass
+class OptimizeResult():
+    walls: List[Segment]
+    zero_length: int = 0
+    duplicates: int = 0
+    merged: int = 0
+    split: int = 0
+
+    @property
+    def removed(self) -> int:
+        """
+        The overall reduction in walls, after any that were added by splitting at junctions.
+        """
+        return self.zero_length + self.duplicates + self.merged - self.split
+
+def optimize_walls(walls: List[Segment], split_junctions: bool = False) -> OptimizeResult:
+    """
+    Reduces walls to the fewest that cover the same lines, facing the same ways. Zero length and duplicate walls
+    are dropped, and walls on the same line facing the same way are merged where they overlap or touch.
+
+    Walls are grouped by hashing their line and then sorted along it, so this takes O(n log n) rather than
+    comparing every pair. With split_junctions, walls are split wherever another wall ends part way along them,
+    so every junction is shared end point and the result can still be edited vertex by vertex.
+    Walls that are left unchanged are returned as they are, rather than as copies.
+    """
+    result = OptimizeResult([])
+
+    # Group the walls on each line and facing each way, keeping the order they first appear in
+    lines: Dict[tuple, List[tuple[float, float, int, Segment]]] = {}
+    for order, wall in enumerate(walls):
+        if wall.start == wall.end:
+            result.zero_length += 1
+            continue
+
+        start, end = line_interval(wall)
+        lines.setdefault((line_key(wall), start < end), []).append((min(start, end), max(start, end), order, wall))
+
+    merged: List[tuple[int, Segment]] = []
+    for (_, forward), intervals in lines.items():
+        intervals.sort(key=lambda interval: (interval[0], interval[1], interval[2]))
+
+        run: List[tuple[float, float, int, Segment]] = []
+        high = 0.0
+        for interval in intervals + [None]:
+            if interval is not None and len(run) > 0 and interval[0] <= high + LINE_PRECISION:
+                if interval[3] == run[-1][3]:
+                    result.duplicates += 1
+                else:
+                    result.merged += 1
+                    run.append(interval)
+                high = max(high, interval[1])
+                continue
+
+            if len(run) > 0:
+                merged.append((min(order for _, _, order, _ in run), _merge_run(run, forward)))
+            if interval is not None:
+                run, high = [interval], interval[1]
+
+    merged.sort(key=lambda item: item[0])
+    result.walls = [wall for _, wall in merged]
+
+    if split_junctions:
+        result.walls, result.split = _split_junctions(result.walls)
+    return result
+
+def optimize_world(world: World, split_junctions: bool = False) -> OptimizeResult:
+    """
+    Optimizes the walls of a world in place, through the World so that its indexes are kept up to date.
+    """
+    result = optimize_walls(world.walls, split_junctions)
+
+    kept = {id(wall) for wall in result.walls}
+    existing = {id(wall) for wall in world.walls}
+    world.remove_walls([wall for wall in world.walls if id(wall) not in kept])
+    for wall in result.walls:
+        if id(wall) not in existing:
+            world.add_wall(wall)
+    return result
+
+def _merge_run(run: List[tuple[float, float, int, Segment]], forward: bool) -> Segment:
+    if len(run) == 1:
+        return run[0][3]
+
+    return Segment(*merged_ends([wall for _, _, _, wall in run], forward))
+
+def _split_junctions(walls: List[Segment]) -> tuple[List[Segment], int]:
+    grid = SegmentGrid(walls)
+    points = {point for wall in walls for point in (wall.start, wall.end)}
+
+    # Only the walls passing through the cell of each end point need checking
+    splits: Dict[int, List[Point]] = {}
+    for point in points:
+        for wall in grid.query(point, point):
+            if point == wall.start or point == wall.end:
+                continue
+            if (wall.closest_point(point) - point).length() <= LINE_PRECISION:
+                splits.setdefault(id(wall), []).append(point)
+
+    result = []
+    for wall in walls:
+        if id(wall) not in splits:
+            result.append(wall)
+            continue
+
+        delta = wall.delta()
+        corners = sorted(
+            splits[id(wall)],
+            key=lambda point: (point.x - wall.start.x) * delta.x + (point.y - wall.start.y) * delta.y
+        )
+        corners = [wall.start] + corners + [wall.end]
+        result += [Segment(start, end) for start, end in zip(corners, corners[1:])]
+    return result, sum(len(corners) for corners in splits.values())
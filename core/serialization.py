@@ -1,6 +1,8 @@
 import abc
 import dataclasses
-from typing import Dict, List, Self
+import json
+import math
+from typing import Callable, Dict, List, Self, TextIO
 
 @dataclasses.dataclass
 class TypeHint():
@@ -110,86 +112,17 @@ class ListHandler(TypeHandler):
             context.serializer.deserialize(new, data)
             context.output.object.append(new)
 
-class Methods(abc.ABC):
-    @classmethod
-    @abc.abstractmethod
-    def determining_object(cls, context: Context) -> SerializeObject:
-        raise NotImplemented()
-    
-    @classmethod
-    @abc.abstractmethod
-    def auto(cls, context: Context):
-        raise NotImplemented()
-    
-    @classmethod
-    @abc.abstractmethod
-    def member(cls, context: Context):
-        raise NotImplemented()
-
-    @classmethod
-    @abc.abstractmethod
-    def handler(cls, context: Context, handler: TypeHandler):
-        raise NotImplemented()
-
-class SerializeMethods(Methods):
-    @classmethod
-    def determining_object(cls, context: Context) -> SerializeObject:
-        return context.input
-
-    @classmethod
-    def auto(cls, context: Context):
-        data = getattr(context.input.object, context.member)
-        if not callable(data):
-            context.output.object[context.member] = context.serializer.serialize(
-                data,
-                annotations = context.output.annotations
-            )
-
-    @classmethod
-    def member(cls, context: Context):
-        assert(hasattr(context.input.object, context.member))
-        context.output.object[context.member] = context.serializer.serialize(
-            getattr(context.input.object, context.member),
-            annotations = context.output.annotations
-        )
-
-    @classmethod
-    @abc.abstractmethod
-    def handler(cls, context: Context, handler: TypeHandler):
-        handler.serialize(context)
-
-class DeserializeMethods(Methods):
-    @classmethod
-    def determining_object(cls, context: Context) -> SerializeObject:
-        return context.output
-    
-    @classmethod
-    def auto(cls, context: Context):
-        data = getattr(context.output.object, context.member)
-        if not callable(data) and context.member in context.input.object:
-            context.serializer.deserialize(
-                data,
-                context.input.object[context.member],
-                annotations = context.input.annotations
-            )
-
-    @classmethod
-    def member(cls, context: Context):
-        assert(hasattr(context.output.object, context.member))
-        setattr(
-            context.output.object,
-            context.member,
-            context.serializer.deserialize(
-                getattr(context.output.object, context.member),
-                context.input.object[context.member],
-                annotations = context.output.annotations
-            )
-        )
-
-    @classmethod
-    @abc.abstractmethod
-    def handler(cls, context: Context, handler: TypeHandler):
-        handler.deserialize(context)
+@dataclasses.dataclass
+class SerializePlan():
+    """
+    How objects of one type are serialized, worked out the first time the type is seen.
+    Members are (name, annotations, hinted) tuples, and are read from each object's vars when from_vars is set.
+    """
+    handler: TypeHandler = None
+    primitive: bool = False
+    sequence: bool = False
+    members: List[tuple[str, object, bool]] = dataclasses.field(default_factory=list)
+    from_vars: bool = False
 
 class Serializer():
     DefaultHandlers = [
@@ -199,13 +132,14 @@ class Serializer():
         FloatHandler(),
         ListHandler()
     ]
-    SerializeMethods = SerializeMethods
-    DeserializeMethods = DeserializeMethods
 
     def __init__(self, hints: Dict[str, TypeHint] = {}, handlers: List[TypeHandler] = DefaultHandlers):
         self.__hints = hints
         self.__handlers = handlers
         self.__recursion = 0
+        self.__plans: Dict[type, SerializePlan] = {}
+        # Contexts for handlers are reused, one per level of recursion, rather than made for every object
+        self.__contexts: List[Context] = []
 
         for _, hint in hints.items():
             assert isinstance(hint, TypeHint)
@@ -213,56 +147,160 @@ class Serializer():
         for handler in handlers:
             assert issubclass(type(handler), TypeHandler)
 
+        # The first handler for a type name takes precedence
+        self.__handler_names: Dict[str, TypeHandler] = {}
+        for handler in reversed(handlers):
+            self.__handler_names[handler.typename()] = handler
+
     def serialize(self, data: object, annotations: Dict = None) -> object:
-        output = {}
-        return self.__process__(self.__get_context__(output, data, None, annotations, self), self.SerializeMethods)
+        assert self.__recursion >= 0
+        self.__recursion += 1
+
+        plan = self.__plans.get(type(data)) or self.__compile__(data)
+        if plan.primitive:
+            output = data
+        elif plan.handler is not None:
+            context = self.__get_context__({}, data, annotations)
+            plan.handler.serialize(context)
+            output = context.output.object
+        else:
+            output = {}
+            for member, member_annotations, hinted in (self.__vars_members__(data) if plan.from_vars else plan.members):
+                value = getattr(data, member)
+                if hinted or not callable(value):
+                    output[member] = self.serialize(value, annotations=member_annotations)
+
+        self.__recursion -= 1
+        return output
+
+    def serialize_to(self, data: object, file: TextIO, annotations: Dict = None) -> None:
+        """
+        Serializes data as JSON straight to a text file, as the same JSON that json.dump would write for the
+        result of serialize. Lists are written an item at a time, so the whole document is never held in memory.
+        """
+        self.__write__(data, file.write, annotations)
 
     def deserialize(self, object: object, data: object, annotations: Dict = None) -> object:
-        return self.__process__(self.__get_context__(object, data, None, annotations, self), self.DeserializeMethods)
-    
-    def __process__(self, context: Context, methods: Methods) -> object:
         assert self.__recursion >= 0
-        assert self.__recursion <= 10
         self.__recursion += 1
 
-        determining_object = methods.determining_object(context)
-        if determining_object.typename in self.__handlers:
-            methods.handler(context, self.__handlers[self.__handlers.index(determining_object.typename)])
-        elif determining_object.typename in self.__hints:
-            self.__member__(self.__hints[determining_object.typename], context, methods)
+        plan = self.__plans.get(type(object)) or self.__compile__(object)
+        if plan.primitive:
+            output = data
+        elif plan.handler is not None:
+            context = self.__get_context__(object, data, annotations)
+            plan.handler.deserialize(context)
+            output = context.output.object
         else:
-            self.__auto__(context, methods)
+            output = object
+            for member, member_annotations, hinted in (self.__vars_members__(object) if plan.from_vars else plan.members):
+                if hinted:
+                    setattr(object, member, self.deserialize(getattr(object, member), data[member]))
+                    continue
+
+                value = getattr(object, member)
+                if not callable(value) and member in data:
+                    self.deserialize(value, data[member], annotations=member_annotations)
 
         self.__recursion -= 1
-        return context.output.object
-
-    def __auto__(self, context: Context, methods: Methods):
-        determining_object = methods.determining_object(context)
-        has_annotations = hasattr(determining_object.object, "__annotations__")
-        attributes = determining_object.object.__annotations__ if has_annotations else vars(determining_object.object)
-        for member in attributes:
-            if (member[:2] == '__' and member[-2:] == '__') or member[:1] == '_':
-                continue
-
-            methods.auto(
-                self.__get_context__(
-                    context.output.object,
-                    context.input.object,
-                    member,
-                    attributes[member] if has_annotations else None,
-                    self
-                )
+        return output
+
+    def __compile__(self, object: object) -> SerializePlan:
+        object_type = type(object)
+        typename = object_type.__name__
+
+        if typename in self.__handler_names:
+            handler = self.__handler_names[typename]
+            plan = SerializePlan(
+                handler=handler,
+                primitive=isinstance(handler, PrimitiveTypeHandler) and
+                    type(handler).serialize.__func__ is PrimitiveTypeHandler.serialize.__func__ and
+                    type(handler).deserialize.__func__ is PrimitiveTypeHandler.deserialize.__func__,
+                sequence=isinstance(handler, ListHandler) and
+                    type(handler).serialize.__func__ is ListHandler.serialize.__func__
             )
-            
-    def __member__(self, hint: TypeHint, context: Context, methods: Methods):
-        for member in hint.members_to_serialize:
-            methods.member(self.__get_context__(context.output.object, context.input.object, member, None, self))
-    
+        elif typename in self.__hints:
+            plan = SerializePlan(members=[(member, None, True) for member in self.__hints[typename].members_to_serialize])
+        elif hasattr(object, "__annotations__"):
+            plan = SerializePlan(members=[
+                (member, annotations, False) for member, annotations in object.__annotations__.items()
+                if not self.__private__(member)
+            ])
+        else:
+            # Without annotations the members can differ between objects of the same type
+            plan = SerializePlan(from_vars=True)
+
+        self.__plans[object_type] = plan
+        return plan
+
+    def __write__(self, data: object, write: Callable[[str], object], annotations: Dict) -> None:
+        assert self.__recursion >= 0
+        self.__recursion += 1
+
+        plan = self.__plans.get(type(data)) or self.__compile__(data)
+        if plan.primitive:
+            write(self.__encode__(data))
+        elif plan.sequence:
+            write("[")
+            for position, item in enumerate(data):
+                if position > 0:
+                    write(", ")
+                self.__write__(item, write, None)
+            write("]")
+        elif plan.handler is not None:
+            context = self.__get_context__({}, data, annotations)
+            plan.handler.serialize(context)
+            write(self.__encode__(context.output.object))
+        else:
+            separator = "{"
+            for member, member_annotations, hinted in (self.__vars_members__(data) if plan.from_vars else plan.members):
+                value = getattr(data, member)
+                if hinted or not callable(value):
+                    write(separator + json.dumps(member) + ": ")
+                    self.__write__(value, write, member_annotations)
+                    separator = ", "
+            write("{}" if separator == "{" else "}")
+
+        self.__recursion -= 1
+
+    @classmethod
+    def __encode__(cls, value: object) -> str:
+        # Encode the common cases directly, as json.dumps would, and anything else with json.dumps
+        value_type = type(value)
+        if value_type is float and math.isfinite(value):
+            return float.__repr__(value)
+        if value_type is int:
+            return int.__repr__(value)
+        if value_type is dict and all(type(key) is str for key in value):
+            return "{" + ", ".join(json.dumps(key) + ": " + cls.__encode__(item) for key, item in value.items()) + "}"
+        if value_type is list:
+            return "[" + ", ".join(cls.__encode__(item) for item in value) + "]"
+        return json.dumps(value)
+
     @classmethod
-    def __get_context__(cls, output: object, input:object, member: str, annotations: Dict, serializer: object) -> Context:
-        return Context(
-            output=SerializeObject.from_object(output, annotations),
-            input=SerializeObject.from_object(input, annotations),
-            member=member,
-            serializer=serializer,
-        )
\ No newline at end of file
+    def __vars_members__(cls, object: object) -> List[tuple[str, object, bool]]:
+        return [(member, None, False) for member in vars(object) if not cls.__private__(member)]
+
+    @classmethod
+    def __private__(cls, member: str) -> bool:
+        return (member[:2] == '__' and member[-2:] == '__') or member[:1] == '_'
+
+    def __get_context__(self, output: object, input: object, annotations: Dict) -> Context:
+        while len(self.__contexts) <= self.__recursion:
+            self.__contexts.append(Context(
+                output=SerializeObject(None, type(None), "NoneType", None),
+                input=SerializeObject(None, type(None), "NoneType", None),
+                member=None,
+                serializer=self,
+            ))
+
+        context = self.__contexts[self.__recursion]
+        context.output.object = output
+        context.output.type = type(output)
+        context.output.typename = context.output.type.__name__
+        context.output.annotations = annotations
+        context.input.object = input
+        context.input.type = type(input)
+        context.input.typename = context.input.type.__name__
+        context.input.annotations = annotations
+        return context
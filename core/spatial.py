@@ -0,0 +1,264 @@
+import math
+import numpy as np
+from .geometry import IntersectResult, Point, Segment
+from typing import Collection, Dict, List
+
+class SegmentGrid():
+    """
+    Buckets walls by the square cells of a uniform grid that they pass through, so walls near a point or
+    inside an area can be found by only looking at the walls in the cells covering it.
+    """
+    def __init__(self, walls: List[Segment], cell_size: float = 1.0) -> None:
+        self.__cell_size: float = cell_size
+        self.__cells: Dict[tuple[int, int], Dict[int, Segment]] = {}
+        self.__wall_cells: Dict[int, List[tuple[int, int]]] = {}
+
+        # Grids loaded from a file keep the saved cells in sorted arrays, which edits are made on top of
+        self.__base_keys: np.ndarray = np.empty(0, dtype=np.int64)
+        self.__base_positions: np.ndarray = np.empty(0, dtype=np.int64)
+        self.__base_walls: List[Segment] = []
+        self.__base_removed: set[int] = set()
+
+        for wall in walls:
+            self.insert(wall)
+
+    @classmethod
+    def from_cells(cls, walls: List[Segment], cell_size: float, keys: np.ndarray, positions: np.ndarray) -> 'SegmentGrid':
+        """
+        Makes a grid from the sorted cell keys and wall positions returned by export, using the arrays as they
+        are rather than walking any walls or building any buckets.
+        """
+        grid = cls([], cell_size)
+        grid.__base_keys = keys
+        grid.__base_positions = positions
+        grid.__base_walls = list(walls)
+        return grid
+
+    @property
+    def cell_size(self) -> float:
+        return self.__cell_size
+
+    def export(self, walls: List[Segment]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the cells every wall passes through as an array of cell keys in sorted order, and an array of
+        the position of the wall in walls for each key.
+        """
+        positions = {id(wall): position for position, wall in enumerate(walls)}
+        cells = [(x, y, positions[key]) for key, cells in self.__wall_cells.items() for x, y in cells]
+        cells = np.array(cells, dtype=np.int64).reshape(-1, 3)
+        keys, wall_positions = self.__key__(cells[:, 0], cells[:, 1]), cells[:, 2]
+
+        if len(self.__base_keys) > 0:
+            remap = np.array([
+                positions.get(id(wall), -1) if id(wall) not in self.__base_removed else -1 for wall in self.__base_walls
+            ], dtype=np.int64)
+            base_positions = remap[self.__base_positions]
+            keep = base_positions >= 0
+            keys = np.concatenate((keys, self.__base_keys[keep]))
+            wall_positions = np.concatenate((wall_positions, base_positions[keep]))
+
+        order = np.argsort(keys, kind="stable")
+        return keys[order], wall_positions[order]
+
+    def insert(self, wall: Segment) -> None:
+        cells = self.__traverse__(wall)
+        self.__wall_cells[id(wall)] = cells
+        for cell in cells:
+            self.__cells.setdefault(cell, {})[id(wall)] = wall
+
+    def remove(self, wall: Segment) -> None:
+        if len(self.__base_keys) > 0:
+            # Walls from the saved cells are hidden rather than removed, and only found in the buckets after this
+            self.__base_removed.add(id(wall))
+            if id(wall) not in self.__wall_cells:
+                return
+
+        for cell in self.__wall_cells.pop(id(wall)):
+            walls = self.__cells[cell]
+            del walls[id(wall)]
+            if len(walls) == 0:
+                del self.__cells[cell]
+
+    def query(self, minimum: Point, maximum: Point) -> List[Segment]:
+        """
+        Returns the walls in the cells overlapping the given bounds. This may include walls just outside of them.
+        """
+        first = self.__cell__(minimum)
+        last = self.__cell__(maximum)
+
+        walls = {}
+        if len(self.__base_keys) > 0:
+            for position in np.unique(self.__query_base__(first, last)).tolist():
+                wall = self.__base_walls[position]
+                if id(wall) not in self.__base_removed:
+                    walls[id(wall)] = wall
+
+        if (last[0] - first[0] + 1) * (last[1] - first[1] + 1) <= len(self.__cells):
+            for x in range(first[0], last[0] + 1):
+                for y in range(first[1], last[1] + 1):
+                    walls.update(self.__cells.get((x, y), {}))
+        else:
+            # Large areas have more cells than are in use, so check the used cells instead
+            for (x, y), cell in self.__cells.items():
+                if first[0] <= x <= last[0] and first[1] <= y <= last[1]:
+                    walls.update(cell)
+        return list(walls.values())
+
+    def __query_base__(self, first: tuple[int, int], last: tuple[int, int]) -> np.ndarray:
+        keys = self.__base_keys
+        columns = np.arange(first[0], last[0] + 1, dtype=np.int64)
+        if len(columns) > 64:
+            # Too many columns to search one by one, so check every saved cell
+            x, y = keys >> 32, (keys & 0xFFFFFFFF) - 2 ** 31
+            return self.__base_positions[(x >= first[0]) & (x <= last[0]) & (y >= first[1]) & (y <= last[1])]
+
+        # Cells in a column are next to each other in key order, so each column is one slice
+        starts = np.searchsorted(keys, self.__key__(columns, first[1]), "left").tolist()
+        ends = np.searchsorted(keys, self.__key__(columns, last[1]), "right").tolist()
+        return np.concatenate([self.__base_positions[start:end] for start, end in zip(starts, ends)])
+
+    @classmethod
+    def __key__(cls, x: np.ndarray | int, y: np.ndarray | int) -> np.ndarray | int:
+        # Pack both cell coordinates into one integer which sorts by x and then y
+        return x * 2 ** 32 + (y + 2 ** 31)
+
+    def nearest(self, point: Point, radius: float) -> IntersectResult:
+        """
+        Finds the closest wall to a point, no further away than radius.
+        The result's point is the closest point on that wall.
+        """
+        result = IntersectResult()
+        for wall in self.query(point - Point(radius, radius), point + Point(radius, radius)):
+            closest = wall.closest_point(point)
+            distance = math.dist(point, closest)
+            if distance <= radius and (not result.hit or distance < result.distance):
+                result = IntersectResult(True, distance, wall, closest)
+        return result
+
+    def pick(self, point: Point, radius: float) -> IntersectResult:
+        """
+        Finds the closest wall to a point like nearest, for picking it to edit.
+        The result's point is whichever of the wall's start, end or middle is closest to the point.
+        """
+        result = self.nearest(point, radius)
+        if result.hit:
+            wall = result.segment
+            result.point = min((wall.start, wall.end, wall.mid()), key=lambda vertex: math.dist(vertex, point))
+        return result
+
+    def intersect(self, segment: Segment) -> IntersectResult:
+        """
+        Finds the closest wall the segment crosses to its start, like Segment.intersect_list over every wall.
+        Cells are checked in order along the segment, stopping once one holds the closest crossing found so far.
+        """
+        result = IntersectResult()
+        tested: set[int] = set()
+        visited: set[tuple[int, int]] = set()
+        for cell in self.__traverse__(segment):
+            visited.add(cell)
+            for wall in self.__cell_walls__(cell):
+                if id(wall) in tested:
+                    continue
+                tested.add(id(wall))
+
+                point = segment.intersection(wall)
+                if point is None:
+                    continue
+                distance = math.dist(segment.start, point)
+                if not result.hit or distance < result.distance:
+                    result = IntersectResult(True, distance, wall, point)
+
+            # Crossings in cells further along are further away
+            if result.hit and self.__cell__(result.point) in visited:
+                break
+        return result
+
+    def __cell_walls__(self, cell: tuple[int, int]) -> List[Segment]:
+        walls = list(self.__cells.get(cell, {}).values())
+        if len(self.__base_keys) > 0:
+            key = self.__key__(*cell)
+            start, end = np.searchsorted(self.__base_keys, [key, key + 1]).tolist()
+            walls += [
+                wall for wall in map(self.__base_walls.__getitem__, self.__base_positions[start:end].tolist())
+                if id(wall) not in self.__base_removed
+            ]
+        return walls
+
+    def __cell__(self, point: Point) -> tuple[int, int]:
+        return (math.floor(point.x / self.__cell_size), math.floor(point.y / self.__cell_size))
+
+    def __traverse__(self, wall: Segment) -> List[tuple[int, int]]:
+        # Walk the cells the wall passes through, stepping across whichever cell edge the wall reaches first
+        start_x, start_y = wall.start.x / self.__cell_size, wall.start.y / self.__cell_size
+        delta_x, delta_y = wall.end.x / self.__cell_size - start_x, wall.end.y / self.__cell_size - start_y
+        x, y = self.__cell__(wall.start)
+        end_x, end_y = self.__cell__(wall.end)
+
+        step_x = 1 if delta_x > 0.0 else -1
+        step_y = 1 if delta_y > 0.0 else -1
+        next_x = ((x + (step_x > 0)) - start_x) / delta_x if delta_x != 0.0 else math.inf
+        next_y = ((y + (step_y > 0)) - start_y) / delta_y if delta_y != 0.0 else math.inf
+        advance_x = abs(1.0 / delta_x) if delta_x != 0.0 else math.inf
+        advance_y = abs(1.0 / delta_y) if delta_y != 0.0 else math.inf
+
+        cells = [(x, y)]
+        while (x, y) != (end_x, end_y):
+            # Never step past the last cell on an axis, in case rounding picked the wrong edge
+            if y == end_y or (x != end_x and next_x < next_y):
+                x += step_x
+                next_x += advance_x
+            else:
+                y += step_y
+                next_y += advance_y
+            cells.append((x, y))
+        return cells
+
+class VertexGrid():
+    """
+    Buckets the end points of walls by the square cells of a uniform grid, for finding the closest end point
+    to a position. Points shared by several walls are stored once, with a count of the walls using them.
+    """
+    def __init__(self, walls: List[Segment], cell_size: float = 1.0) -> None:
+        self.__cell_size: float = cell_size
+        self.__cells: Dict[tuple[int, int], Dict[Point, int]] = {}
+
+        for wall in walls:
+            self.insert(wall)
+
+    def insert(self, wall: Segment) -> None:
+        for point in (wall.start, wall.end):
+            points = self.__cells.setdefault(self.__cell__(point), {})
+            points[point] = points.get(point, 0) + 1
+
+    def remove(self, wall: Segment) -> None:
+        for point in (wall.start, wall.end):
+            cell = self.__cell__(point)
+            points = self.__cells[cell]
+            points[point] -= 1
+            if points[point] == 0:
+                del points[point]
+                if len(points) == 0:
+                    del self.__cells[cell]
+
+    def nearest(self, point: Point, radius: float, exclude: Collection[Segment] = ()) -> Point | None:
+        """
+        Finds the closest end point to a position, no further away than radius.
+        End points only used by the excluded walls are ignored, so walls being edited do not snap to themselves.
+        """
+        first = self.__cell__(point - Point(radius, radius))
+        last = self.__cell__(point + Point(radius, radius))
+
+        nearest, nearest_distance = None, radius
+        for x in range(first[0], last[0] + 1):
+            for y in range(first[1], last[1] + 1):
+                for vertex, count in self.__cells.get((x, y), {}).items():
+                    if len(exclude) > 0 and count <= sum((vertex == wall.start) + (vertex == wall.end) for wall in exclude):
+                        continue
+
+                    distance = math.dist(point, vertex)
+                    if distance <= nearest_distance:
+                        nearest, nearest_distance = vertex, distance
+        return nearest
+
+    def __cell__(self, point: Point) -> tuple[int, int]:
+        return (math.floor(point.x / self.__cell_size), math.floor(point.y / self.__cell_size))
@@ -0,0 +1,151 @@
+import bisect
+import dataclasses
+import heapq
+import itertools
+import math
+from .collinear import LINE_PRECISION
+from .geometry import Point, Segment
+from .spatial import SegmentGrid
+from enum import IntEnum, auto
+from typing import Dict, List
+
+class ProblemKind(IntEnum):
+    Crossing = auto()
+    NearMiss = auto()
+
+@dataclasses.dataclass
+class WallProblem():
+    kind: ProblemKind
+    point: Point
+    walls: tuple[Segment, Segment]
+
+def validate_walls(walls: List[Segment], tolerance: float = 0.01) -> List[WallProblem]:
+    """
+    Finds walls that cross each other, or that end within tolerance of another wall without touching it.
+    Both let the player see or walk through the gap, and cause flickering where the walls meet.
+    """
+    return [
+        WallProblem(ProblemKind.Crossing, point, (first, second))
+        for first, second, point in find_crossings(walls)
+    ] + [
+        WallProblem(ProblemKind.NearMiss, point, (first, second))
+        for first, second, point in find_near_misses(walls, tolerance)
+    ]
+
+def find_crossings(walls: List[Segment]) -> List[tuple[Segment, Segment, Point]]:
+    """
+    Returns every pair of walls that cross, with the point they cross at, in O((n + k) log n) for n walls and
+    k crossings. Walls meeting at an end point, or ending on another wall, do not cross.
+
+    This is a Bentley-Ottmann sweep from left to right: walls under the sweep line are kept sorted by height,
+    and a pair can only cross after becoming neighbours in that order, so only neighbours are ever compared.
+    Vertical walls have no height to sort by, and are compared with the walls under the line where they are.
+    """
+    # Orient walls from left to right, ordering points by x and then y, so each is added at its start
+    oriented = [
+        (wall, *sorted((wall.start, wall.end))) for wall in walls if wall.start != wall.end
+    ]
+    starting: Dict[Point, List[tuple[Segment, Point, Point]]] = {}
+    for item in oriented:
+        starting.setdefault(item[1], []).append(item)
+
+    events = list({point for _, start, end in oriented for point in (start, end)})
+    heapq.heapify(events)
+    scheduled = set(events)
+
+    status: List[tuple[Segment, Point, Point]] = []
+    crossings: Dict[tuple[int, int], tuple[Segment, Segment, Point]] = {}
+
+    def check(first: tuple[Segment, Point, Point], second: tuple[Segment, Point, Point], point: Point) -> None:
+        key = (min(id(first[0]), id(second[0])), max(id(first[0]), id(second[0])))
+        if key in crossings or not _crosses(first, second):
+            return
+
+        crossing = first[0].intersection(second[0])
+        if crossing is None:
+            return
+        crossings[key] = (first[0], second[0], crossing)
+        if crossing > point and crossing not in scheduled:
+            scheduled.add(crossing)
+            heapq.heappush(events, crossing)
+
+    while len(events) > 0:
+        point = heapq.heappop(events)
+
+        def height(item: tuple[Segment, Point, Point]) -> float:
+            return _height(item, point.x)
+
+        # Walls passing through or ending at this point are next to each other under the sweep line
+        low = bisect.bisect_left(status, point.y - LINE_PRECISION, key=height)
+        high = bisect.bisect_right(status, point.y + LINE_PRECISION, key=height)
+        through = [item for item in status[low:high] if item[2] != point]
+
+        added = []
+        for item in starting.get(point, []):
+            _, start, end = item
+            if start.x == end.x:
+                # Vertical walls are only checked against the walls under the sweep line along their length
+                first = bisect.bisect_left(status, start.y - LINE_PRECISION, key=height)
+                last = bisect.bisect_right(status, end.y + LINE_PRECISION, key=height)
+                for other in status[first:last]:
+                    check(item, other, point)
+            else:
+                added.append(item)
+
+        # Several walls can cross at exactly the same point, without all becoming neighbours first
+        involved = status[low:high] + added
+        if len(involved) > 2:
+            for first, second in itertools.combinations(involved, 2):
+                check(first, second, point)
+
+        # Reinsert the walls continuing past this point in the order they are in just after it
+        replaced = sorted(through + added, key=_slope)
+        status[low:high] = replaced
+
+        if len(replaced) == 0:
+            if 0 < low < len(status):
+                check(status[low - 1], status[low], point)
+        else:
+            if low > 0:
+                check(status[low - 1], status[low], point)
+            if low + len(replaced) < len(status):
+                check(status[low + len(replaced) - 1], status[low + len(replaced)], point)
+
+    return list(crossings.values())
+
+def find_near_misses(walls: List[Segment], tolerance: float) -> List[tuple[Segment, Segment, Point]]:
+    """
+    Returns pairs of walls where the first ends within tolerance of the second without touching it,
+    along with that end point.
+    """
+    grid = SegmentGrid(walls, cell_size=max(1.0, tolerance))
+    near_misses = []
+    for wall in walls:
+        for point in (wall.start, wall.end) if wall.start != wall.end else (wall.start,):
+            offset = Point(tolerance, tolerance)
+            for other in grid.query(point - offset, point + offset):
+                if other is wall or point == other.start or point == other.end:
+                    continue
+                distance = (other.closest_point(point) - point).length()
+                if LINE_PRECISION < distance <= tolerance:
+                    near_misses.append((wall, other, point))
+    return near_misses
+
+def _crosses(first: tuple[Segment, Point, Point], second: tuple[Segment, Point, Point]) -> bool:
+    # Each wall's end points must be strictly either side of the other wall
+    def side(start: Point, end: Point, point: Point) -> float:
+        return (end.x - start.x) * (point.y - start.y) - (end.y - start.y) * (point.x - start.x)
+
+    _, a, b = first
+    _, c, d = second
+    return side(a, b, c) * side(a, b, d) < 0.0 and side(c, d, a) * side(c, d, b) < 0.0
+
+def _height(item: tuple[Segment, Point, Point], x: float) -> float:
+    _, start, end = item
+    if x >= end.x:
+        return end.y
+    return start.y + (x - start.x) * (end.y - start.y) / (end.x - start.x)
+
+def _slope(item: tuple[Segment, Point, Point]) -> float:
+    _, start, end = item
+    return math.atan2(end.y - start.y, end.x - start.x)
@@ -1,10 +1,159 @@
 import dataclasses
-from .geometry import Segment
-from typing import List
+from .collinear import LINE_PRECISION, LineIndex, line_interval, merged_ends
+from .geometry import Point, Segment
+from .graph import VertexGraph
+from typing import Any, Dict, Iterable, List
 
 @dataclasses.dataclass
 class World():
     walls: List[Segment]
+    _revision: int = dataclasses.field(default=0, compare=False, repr=False)
+    _indexes: Dict[type, Any] = dataclasses.field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def revision(self) -> int:
+        """
+        Incremented on every change made through the World, so observers can cheaply tell if they are stale.
+        """
+        return self._revision
+
+    def index(self, index_type: type) -> Any:
+        """
+        Returns an index of the walls, building it from the current walls the first time it is requested.
+        Index types are constructed from a list of walls and provide insert(wall) and remove(wall), which
+        the World calls to keep them up to date with every change made through it.
+        """
+        if index_type not in self._indexes:
+            self._indexes[index_type] = index_type(self.walls)
+        return self._indexes[index_type]
+
+    def adopt_index(self, index: Any) -> None:
+        """
+        Uses an index built elsewhere, such as one loaded with the walls, rather than building it when requested.
+        """
+        self._indexes[type(index)] = index
+
+    def add_wall(self, wall: Segment) -> None:
+        self.walls.append(wall)
+        for index in self._indexes.values():
+            index.insert(wall)
+        self._revision += 1
+
+    def add_walls(self, walls: List[Segment]) -> None:
+        """
+        Adds many walls at once, as a single change.
+        """
+        self.walls.extend(walls)
+        for index in self._indexes.values():
+            for wall in walls:
+                index.insert(wall)
+        self._revision += 1
+
+    def add_wall_merged(self, wall: Segment) -> Segment | None:
+        """
+        Adds a wall, merging it with the walls on the same line, facing the same way, that it overlaps.
+        Returns the wall now covering it, or None if it was rejected because existing walls already did.
+        Walls that only touch end to end are left separate, as other walls may be connected where they meet.
+        """
+        if wall.start == wall.end:
+            return None
+
+        start, end = line_interval(wall)
+        low, high = min(start, end), max(start, end)
+
+        overlapping = []
+        for other in self.index(LineIndex).collinear(wall):
+            other_start, other_end = line_interval(other)
+            other_low, other_high = min(other_start, other_end), max(other_start, other_end)
+            if (other_start < other_end) != (start < end):
+                continue
+            if min(high, other_high) - max(low, other_low) <= LINE_PRECISION:
+                continue
+            if other_low <= low + LINE_PRECISION and other_high >= high - LINE_PRECISION:
+                return None
+            overlapping.append(other)
+
+        if len(overlapping) == 0:
+            self.add_wall(wall)
+            return wall
+
+        ends = merged_ends([wall] + overlapping, start < end)
+        merged, removed = overlapping[0], overlapping[1:]
+
+        for other in removed:
+            self.remove_wall(other)
+        self.update_wall(merged, *ends)
+        return merged
+
+    def remove_wall(self, wall: Segment) -> None:
+        for index in self._indexes.values():
+            index.remove(wall)
+
+        # Walls are compared by value, so find this exact wall rather than an identical one
+        position = next(position for position, current in enumerate(self.walls) if current is wall)
+        del self.walls[position]
+        self._revision += 1
+
+    def remove_walls(self, walls: List[Segment]) -> None:
+        """
+        Removes many walls at once, with a single pass over the wall list rather than one per wall.
+        """
+        for index in self._indexes.values():
+            for wall in walls:
+                index.remove(wall)
+
+        removed = {id(wall) for wall in walls}
+        self.walls[:] = [wall for wall in self.walls if id(wall) not in removed]
+        self._revision += 1
+
+    def update_wall(self, wall: Segment, start: Point, end: Point) -> None:
+        if wall.start == start and wall.end == end:
+            return
+
+        for index in self._indexes.values():
+            index.remove(wall)
+        wall.set_points(start, end)
+        for index in self._indexes.values():
+            index.insert(wall)
+        self._revision += 1
+
+    def vertex_ends(self, points: Iterable[Point]) -> List[tuple[Segment, Point | None, Point | None]]:
+        """
+        Returns every wall using any of the points, with the point each of its ends is at, or None for ends at
+        other points. Taken before a drag, these fix which walls move_ends moves, wherever the points pass over.
+        """
+        graph = self.index(VertexGraph)
+        points = set(points)
+        walls = {id(wall): wall for point in points for wall in graph.walls_at(point)}
+        return [
+            (wall, wall.start if wall.start in points else None, wall.end if wall.end in points else None)
+            for wall in walls.values()
+        ]
+
+    def move_ends(self, ends: List[tuple[Segment, Point | None, Point | None]], moves: Dict[Point, Point]) -> bool:
+        """
+        Moves the wall ends returned by vertex_ends to the new positions of the points they were at. Nothing
+        is moved, and False is returned, if a wall would be collapsed to a single point.
+        """
+        updates = [(wall, moves.get(start, wall.start), moves.get(end, wall.end)) for wall, start, end in ends]
+
+        if any(start == end for _, start, end in updates):
+            return False
+
+        for wall, start, end in updates:
+            self.update_wall(wall, start, end)
+        return True
+
+    def move_vertices(self, moves: Dict[Point, Point]) -> bool:
+        """
+        Moves wall end points to new positions, along with every wall sharing them, so connected walls stay
+        connected. Moving an end point onto another welds them together. Nothing is moved, and False is
+        returned, if a wall would be collapsed to a single point.
+        """
+        return self.move_ends(self.vertex_ends(moves), moves)
+
+    def move_vertex(self, point: Point, new_point: Point) -> bool:
+        return self.move_vertices({point: new_point})
 
 def MakeWorld() -> World:
-    return World([])
\ No newline at end of file
+    return World([])
@@ -1,4 +1,6 @@
+from core.buffer import clip_segments
 from core.geometry import Point, Segment
+import numpy as np
 import pygame
 from enum import IntFlag, auto
 #from geometry import *
@@ -40,6 +42,10 @@ class EditorCamera():
     @property
     def zoom(self: Self) -> float:
         return self.__zoom
+
+    @property
+    def moving(self: Self) -> bool:
+        return self.__move != Point(0.0, 0.0)
     
     """
     Input Handlers
@@ -105,4 +111,16 @@ class EditorCamera():
         return self.project_point(segment.start), self.project_point(segment.end)
 
     def unproject_point(self: Self, point: Point) -> Point:
-        return Point(point.x - self.__center.x, self.__center.y - point.y) / self.__zoom + self.location
\ No newline at end of file
+        return Point(point.x - self.__center.x, self.__center.y - point.y) / self.__zoom + self.location
+
+    def project_walls(self: Self, coordinates: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Projects rows of (start.x, start.y, end.x, end.y) to the screen and clips them to the viewport.
+        Returns the clipped screen space rows, and the indices of the input rows that are visible.
+        """
+        size = np.array(self.__center) * 2.0
+        projected = np.empty_like(coordinates)
+        projected[:, 0::2] = (coordinates[:, 0::2] - self.location.x) * self.__zoom + self.__center.x
+        projected[:, 1::2] = (self.location.y - coordinates[:, 1::2]) * self.__zoom + self.__center.y
+
+        return clip_segments(projected, (0.0, 0.0), size)
@@ -1,72 +1,115 @@
 from core.geometry import Point
+from core.journal import JournalSuffix, WorldJournal, replay_journal
+from core.mapfile import MapSerializer, PointHandler, is_binary_map, load_world, save_world
+from core.optimize import optimize_world
 from core.world import World, MakeWorld
-from core.serialization import Context, Serializer, TypeHint, TypeHandler
 from .camera import EditorCamera
 from .renderer import EditorRenderer
 from .input import InputHandler
+from .loader import WorldLoader
+from .saver import WorldSaver
 from typing import Any, Self, List
 import pygame
-import json
 import time
 import sys
 import os
 
 from .tools.add_wall import AddWall
 from .tools.edit_wall import EditWall
+from .tools.select_walls import SelectWalls
+from .tools.show_problems import ShowProblems
 from .tools.draw_grid import DrawGrid
 from .tools.draw_walls import DrawWalls
 
-class PointHandler(TypeHandler):
-    """
-    Handles Serialization for the Point Type.
-    This is necessary as it's a Tuple and it's members cannot be directly set.
-    """
-    @classmethod
-    def typename(cls) -> str:
-        return "Point"
-    
-    @classmethod
-    def serialize(cls, context: Context):
-        context.output.object = {"x": context.input.object.x, "y": context.input.object.y}
-
-    @classmethod
-    def deserialize(cls, context: Context):
-        context.output.object = Point(context.input.object["x"], context.input.object["y"])
-
 class Editor():
-    Serializer = Serializer(
-        hints={
-            "Segment": TypeHint(["start", "end"])
-        },
-        handlers=Serializer.DefaultHandlers + [
-            PointHandler()
-        ]
-    )
+    Serializer = MapSerializer
     
+    BackgroundColor: tuple[int, int, int] = (21, 26, 31)
+    OverlayColorKey: tuple[int, int, int] = (255, 0, 255)
+    FrameRate: int = 60
+    IdleTimeout: int = 500
+    # Walls from a map still loading are added to the world at this interval in seconds, rather than every frame
+    LoadInterval: float = 0.25
+    # Edits are recorded in a journal next to the map, which is flushed to disk at this interval in seconds,
+    # and folded into the map once it holds this many operations
+    AutosaveInterval: float = 30.0
+    CompactOperations: int = 10000
+
     def __init__(self: Self) -> None:
         self.__camera: EditorCamera = EditorCamera(800, 400)
         self.__renderer: EditorRenderer = None
+        self.__overlay_renderer: EditorRenderer = None
+        self.__overlay_rects: List[pygame.Rect] = []
+        self.__view: tuple = None
         self.__running: bool = False
         self.__world: World = None
         self.__world_filepath: str = None
-        self.__tools: List[Any] = [
+        self.__world_binary: bool = False
+        self.__loader: WorldLoader = None
+        self.__load_time: float = 0.0
+        self.__saver: WorldSaver = None
+        self.__journal: WorldJournal = None
+        self.__autosave_time: float = 0.0
+        # Background tools are only redrawn when the camera or world changes, overlay tools every frame
+        self.__background_tools: List[Any] = [
             DrawGrid,
             DrawWalls,
+        ]
+        self.__overlay_tools: List[Any] = [
+            SelectWalls,
             EditWall,
             AddWall,
+            ShowProblems,
         ]
     
     def load_world(self: Self, filepath: str) -> None:
-        self.__world = MakeWorld()
+        """
+        Loads a map. Binary maps load at once, while JSON maps load in the background as the editor runs.
+        """
+        self.cancel_loading()
+        self.__close_journal__()
         self.__world_filepath = filepath
-        with open(filepath, 'r') as file:
-            self.Serializer.deserialize(self.__world, json.load(file))
+        self.__world_binary = is_binary_map(filepath)
+        if self.__world_binary:
+            self.__world = load_world(filepath)
+            self.__open_journal__()
+        else:
+            self.__world = MakeWorld()
+            self.__loader = WorldLoader(filepath)
+            self.__load_time = 0.0
+
+    def cancel_loading(self: Self) -> None:
+        if self.__loader is not None:
+            self.__loader.cancel()
+            self.__loader = None
     
     def save_world(self: Self) -> None:
-        with open(self.__world_filepath, 'w') as file:
-            json.dump(self.Serializer.serialize(self.__world), file)
+        """
+        Saves the edits made so far to the journal, which is folded into the map itself as the journal grows
+        and when the editor exits.
+        """
+        if self.__loader is not None:
+            print("Cannot save until the map has finished loading")
+            return
+
+        if self.__journal is not None:
+            self.__journal.flush(sync=True)
+        elif self.__saver is not None:
+            # Maps are saved in the same format they were loaded from, in the background while the editor runs
+            self.__saver.save(self.__world, self.__world_filepath, self.__world_binary)
+        else:
+            save_world(self.__world, self.__world_filepath, self.__world_binary)
+
+    def optimize_world(self: Self) -> None:
+        if self.__loader is not None:
+            print("Cannot optimize until the map has finished loading")
+            return
+
+        result = optimize_world(self.__world)
+        print(f"Optimized world: removed {result.removed} walls, {len(self.__world.walls)} remaining")
     
     def exit(self: Self, key:int = 0, down: bool = True) -> None:
+        self.cancel_loading()
         self.__running = False
 
     def run(self: Self) -> None:
@@ -76,15 +119,27 @@ class Editor():
         width = 800
         height = 480
         frame = 0
-        last_time = 0.0
+        last_time = time.perf_counter()
+        idle = False
+        clock = pygame.time.Clock()
 
         pygame.display.set_mode((width, height), pygame.RESIZABLE)
         pygame.display.set_caption("Raycast Editor")
-        self.__renderer = EditorRenderer(self.__camera, pygame.display.get_surface())
+        self.__renderer = EditorRenderer(self.__camera, None)
+        self.__saver = WorldSaver()
+        self.__autosave_time = last_time
+        self.__overlay_renderer = EditorRenderer(self.__camera, None, record_drawn=True)
 
         self.__running = True
         while self.__running:
-            pygame.display.get_surface().fill((21, 26, 31))
+            events = []
+            if idle:
+                # Block until something happens rather than redrawing an unchanged editor
+                event = pygame.event.wait(self.IdleTimeout)
+                if event.type != pygame.NOEVENT:
+                    events.append(event)
+                last_time = time.perf_counter()
+            events += pygame.event.get()
     
             frame += 1
 
@@ -93,9 +148,12 @@ class Editor():
             
             (width, height) = pygame.display.get_window_size()
             self.__camera.set_dimensions(width, height)
+            self.__resize_layers__(width, height)
 
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
+                    self.cancel_loading()
+                    self.__close_saver__()
                     pygame.quit()
                     sys.exit()
                 if event.type == pygame.MOUSEWHEEL:
@@ -107,10 +165,12 @@ class Editor():
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_s:
                         self.save_world()
+                    elif event.key == pygame.K_o:
+                        self.optimize_world()
                     else:
                         InputHandler.handle_key(event.key, True)
                 if event.type == pygame.KEYUP:
-                    if event.key == pygame.K_s:
+                    if event.key in (pygame.K_s, pygame.K_o):
                         pass
                     else:
                         InputHandler.handle_key(event.key, False)
@@ -119,15 +179,121 @@ class Editor():
             InputHandler.handle_mouse_relative(mouse_rel[0], mouse_rel[1])
 
             self.__camera.tick(elapsed)
+            self.__update_loading__(new_time)
+            self.__update_autosave__(new_time)
             
             cursor_pos = pygame.mouse.get_pos()
             kwargs = {
                 "world": self.__world,
                 "cursor": Point(cursor_pos[0], cursor_pos[1]),
                 "camera": self.__camera,
-                "renderer": self.__renderer,
+                "renderer": self.__overlay_renderer,
             }
-            for tool in self.__tools:
+
+            # Overlay tools may edit the world, so they run before the background is brought up to date
+            for rect in self.__overlay_rects:
+                self.__overlay_renderer.surface.fill(self.OverlayColorKey, rect)
+            for tool in self.__overlay_tools:
                 tool.update(**kwargs)
+            overlay_rects = self.__overlay_renderer.take_drawn_rects()
+
+            view = (self.__camera.location, self.__camera.zoom, width, height, self.__world.revision)
+            if view != self.__view:
+                self.__view = view
+                self.__renderer.surface.fill(self.BackgroundColor)
+                for tool in self.__background_tools:
+                    tool.update(**(kwargs | {"renderer": self.__renderer}))
+                dirty_rects = [pygame.Rect(0, 0, width, height)]
+            else:
+                dirty_rects = self.__overlay_rects + overlay_rects
+            self.__overlay_rects = overlay_rects
+
+            surface = pygame.display.get_surface()
+            for rect in dirty_rects:
+                surface.blit(self.__renderer.surface, rect, rect)
+                surface.blit(self.__overlay_renderer.surface, rect, rect)
+            pygame.display.update(dirty_rects)
+
+            idle = len(events) == 0 and mouse_rel == (0, 0) and not self.__camera.moving and self.__loader is None
+            if not idle:
+                clock.tick(self.FrameRate)
+
+        self.__close_saver__()
+
+    def __update_loading__(self: Self, now: float) -> None:
+        loader = self.__loader
+        if loader is None or (now - self.__load_time < self.LoadInterval and not loader.done):
+            return
+
+        self.__load_time = now
+        walls = loader.take_walls()
+        if len(walls) > 0:
+            self.__world.add_walls(walls)
+
+        if loader.done:
+            self.__loader = None
+            if loader.error is not None:
+                print(f"Failed to load {self.__world_filepath}: {loader.error}")
+            else:
+                self.__open_journal__()
+            pygame.display.set_caption("Raycast Editor")
+        else:
+            pygame.display.set_caption(f"Raycast Editor - Loading {loader.progress:.0%}")
+
+    def __update_autosave__(self: Self, now: float) -> None:
+        for error in self.__saver.take_errors():
+            print(error)
+
+        if self.__loader is not None or now - self.__autosave_time < self.AutosaveInterval:
+            return
+
+        self.__autosave_time = now
+        if self.__journal is not None:
+            self.__journal.flush(sync=True)
+            if self.__journal.operations >= self.CompactOperations and not self.__saver.busy:
+                self.__compact_journal__()
+
+    def __open_journal__(self: Self) -> None:
+        # Recover edits that were never folded into the map, then record any new ones
+        journal_filepath = self.__world_filepath + JournalSuffix
+        recovered = replay_journal(self.__world, journal_filepath, self.__world_filepath)
+        if recovered > 0:
+            print(f"Recovered {recovered} unsaved changes from {journal_filepath}")
+        self.__journal = WorldJournal(journal_filepath, self.__world_filepath)
+        self.__world.adopt_index(self.__journal)
+
+    def __compact_journal__(self: Self) -> None:
+        # Operations recorded while the map is saving stay in the journal
+        journal = self.__journal
+        position = journal.position()
+        self.__saver.save(
+            self.__world, self.__world_filepath, self.__world_binary, lambda: journal.compact(position),
+            lambda temporary_filepath: journal.checkpoint(position, temporary_filepath),
+        )
+
+    def __close_journal__(self: Self) -> None:
+        if self.__journal is not None:
+            self.__journal.close()
+            self.__journal = None
+
+    def __close_saver__(self: Self) -> None:
+        # Fold the journal into the map, and let saves that are under way finish
+        if self.__saver is not None:
+            if self.__journal is not None and self.__journal.operations > 0:
+                self.__compact_journal__()
+            self.__saver.close()
+            for error in self.__saver.take_errors():
+                print(error)
+            self.__saver = None
+        self.__close_journal__()
+
+    def __resize_layers__(self: Self, width: int, height: int) -> None:
+        if self.__renderer.surface is not None and self.__renderer.surface.get_size() == (width, height):
+            return
 
-            pygame.display.flip()
\ No newline at end of file
+        self.__renderer.set_surface(pygame.Surface((width, height)))
+        self.__overlay_renderer.set_surface(pygame.Surface((width, height)))
+        self.__overlay_renderer.surface.set_colorkey(self.OverlayColorKey)
+        self.__overlay_renderer.surface.fill(self.OverlayColorKey)
+        self.__overlay_rects = []
+        self.__view = None
@@ -0,0 +1,258 @@
+from core.geometry import Point, Segment
+import dataclasses
+import math
+import numpy as np
+import pygame
+from collections import OrderedDict
+from typing import Dict, List
+
+from .camera import EditorCamera
+
+@dataclasses.dataclass
+class _Band():
+    # Samples of the walls the band was built from, sorted by tile, with the row of the wall each came from
+    keys: np.ndarray
+    offsets: np.ndarray
+    rows: np.ndarray
+    # Samples of the walls inserted since, sorted by tile, with the serial of the insert each came from
+    added_keys: np.ndarray
+    added_offsets: np.ndarray
+    added_serials: np.ndarray
+    # How many of the inserts and removed rows have been applied to the band
+    inserts_applied: int = 0
+    removed_applied: int = 0
+
+class WallLevelOfDetail():
+    """
+    Rasterized copies of a set of walls, for drawing them when zoomed out.
+
+    Zoom levels are split into bands of powers of two. The first time a band is used every wall is sampled
+    once per pixel at that band's zoom, and the samples are sorted by the square tile they fall in. Tiles are
+    only turned into surfaces when they come into view, and are kept in a bounded cache, so drawing costs the
+    same however many walls are on screen and memory does not grow with the size of the world.
+
+    Edits are followed like any other World index. Removed walls are hidden from the samples, inserted ones are
+    sampled on their own, and only the tiles either passes through are redrawn. Once the changes grow too many
+    compared to the walls the bands were built from, they are all rebuilt.
+    """
+    TileSize: int = 256
+    TileCacheSize: int = 256
+    TransparentColor: tuple[int, int, int] = (255, 0, 255)
+
+    # Walls are sampled in batches to bound the size of the temporary arrays
+    SampleBatchSize: int = 65536
+
+    # Bands are rebuilt when more walls than this, or this fraction of the walls, have changed since they were built
+    RebuildChangeCount: int = 4096
+    RebuildChangeFraction: float = 0.25
+    # Bands not drawn while this many inserts are made are dropped, and built again when next drawn
+    MaxPendingInserts: int = 65536
+
+    def __init__(self, walls: List[Segment], coordinates: np.ndarray, color: tuple[int, int, int]) -> None:
+        """
+        Coordinates are rows of (start.x, start.y, end.x, end.y) for the walls, in the same order, as kept by
+        a WallBuffer.
+        """
+        self.__color: tuple[int, int, int] = color
+        self.__rebase__(coordinates.copy(), [id(wall) for wall in walls])
+
+    def __rebase__(self, coordinates: np.ndarray, ids: List[int]) -> None:
+        self.__coordinates: np.ndarray = coordinates
+        self.__rows: Dict[int, int] = {key: row for row, key in enumerate(ids)}
+        self.__removed: np.ndarray = np.zeros(len(coordinates), dtype=bool)
+        self.__removed_count: int = 0
+
+        # Walls inserted since, by id, with the serial of their latest insert. Serials are never reused, so
+        # samples of a wall that has since moved can be told apart from its current ones
+        self.__added: Dict[int, tuple[int, Segment]] = {}
+        self.__serial: int = 0
+
+        # Changes not yet applied to every band
+        self.__inserts: List[tuple[int, Segment]] = []
+        self.__removed_rows: List[int] = []
+
+        self.__bands: Dict[float, _Band] = {}
+        self.__tiles: OrderedDict = OrderedDict()
+
+    def insert(self, wall: Segment) -> None:
+        self.__added[id(wall)] = (self.__serial, wall)
+        self.__inserts.append((self.__serial, wall))
+        self.__serial += 1
+        if len(self.__inserts) > self.MaxPendingInserts:
+            self.__drop_bands__()
+
+    def remove(self, wall: Segment) -> None:
+        if self.__added.pop(id(wall), None) is not None:
+            return
+
+        row = self.__rows.pop(id(wall))
+        self.__removed[row] = True
+        self.__removed_count += 1
+        self.__removed_rows.append(row)
+
+    def __drop_bands__(self) -> None:
+        self.__bands.clear()
+        self.__tiles.clear()
+        self.__inserts.clear()
+        self.__removed_rows.clear()
+
+    def __rebuild__(self) -> None:
+        # Takes the walls as they are now as the ones the bands are built from
+        live = np.flatnonzero(~self.__removed)
+        added = [wall for _, wall in self.__added.values()]
+        added_coordinates = np.array(
+            [(wall.start.x, wall.start.y, wall.end.x, wall.end.y) for wall in added], dtype=np.float64
+        ).reshape(-1, 4)
+        ids = {row: key for key, row in self.__rows.items()}
+        self.__rebase__(
+            np.concatenate((self.__coordinates[live], added_coordinates)),
+            [ids[row] for row in live.tolist()] + [id(wall) for wall in added],
+        )
+
+    @classmethod
+    def band(cls, zoom: float) -> float:
+        return 2.0 ** math.floor(math.log2(zoom))
+
+    def draw(self, camera: EditorCamera, surface: pygame.Surface) -> None:
+        changes = len(self.__added) + self.__removed_count
+        if changes > max(self.RebuildChangeCount, self.RebuildChangeFraction * len(self.__coordinates)):
+            self.__rebuild__()
+
+        band = self.band(camera.zoom)
+        data = self.__get_band__(band)
+        scale = camera.zoom / band
+
+        # Visible area in band pixels, which have y pointing down the screen like screen pixels
+        top_left = camera.unproject_point(Point(0.0, 0.0))
+        bottom_right = camera.unproject_point(camera.center * 2.0)
+        first = (math.floor(top_left.x * band / self.TileSize), math.floor(-top_left.y * band / self.TileSize))
+        last = (math.floor(bottom_right.x * band / self.TileSize), math.floor(-bottom_right.y * band / self.TileSize))
+
+        def screen(tile_x: int, tile_y: int) -> tuple[int, int]:
+            x, y = camera.project_point(Point(tile_x * self.TileSize / band, -tile_y * self.TileSize / band))
+            return math.floor(x), math.floor(y)
+
+        for tile_x in range(first[0], last[0] + 1):
+            for tile_y in range(first[1], last[1] + 1):
+                key = self.__tile_key__(tile_x, tile_y)
+                if np.searchsorted(data.keys, key, "left") == np.searchsorted(data.keys, key, "right") and \
+                    np.searchsorted(data.added_keys, key, "left") == np.searchsorted(data.added_keys, key, "right"):
+                    continue
+
+                start, end = screen(tile_x, tile_y), screen(tile_x + 1, tile_y + 1)
+                size = (end[0] - start[0], end[1] - start[1])
+                surface.blit(self.__get_tile__(band, key, size if scale != 1.0 else None), start)
+
+    @classmethod
+    def __tile_key__(cls, tile_x: np.ndarray | int, tile_y: np.ndarray | int) -> np.ndarray | int:
+        # Pack both tile coordinates into one integer so tiles can be sorted and searched
+        return tile_x * 2 ** 32 + tile_y
+
+    def __sample__(self, coordinates: np.ndarray, band: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Returns the tile key and offset in the tile of every sample, and the row of the wall it was taken from
+        keys, offsets, rows = [], [], []
+        for batch in range(0, len(coordinates), self.SampleBatchSize):
+            pixels = coordinates[batch:batch + self.SampleBatchSize] * (band, -band, band, -band)
+            start, delta = pixels[:, 0:2], pixels[:, 2:4] - pixels[:, 0:2]
+
+            # One sample per pixel along the longest axis of each wall, including both end points
+            steps = np.ceil(np.abs(delta).max(axis=1)).astype(np.int64) + 1
+            wall = np.repeat(np.arange(len(pixels)), steps)
+            step = np.arange(len(wall)) - np.repeat(np.cumsum(steps) - steps, steps)
+            fraction = step / np.repeat(np.maximum(steps - 1, 1), steps)
+            samples = np.floor(start[wall] + delta[wall] * fraction[:, np.newaxis]).astype(np.int64)
+
+            tiles, local = np.divmod(samples, self.TileSize)
+            keys.append(self.__tile_key__(tiles[:, 0], tiles[:, 1]))
+            offsets.append(local[:, 0] * self.TileSize + local[:, 1])
+            rows.append(wall + batch)
+
+        if len(keys) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(keys), np.concatenate(offsets), np.concatenate(rows)
+
+    def __get_band__(self, band: float) -> _Band:
+        data = self.__bands.get(band)
+        if data is None:
+            keys, offsets, rows = self.__sample__(self.__coordinates, band)
+            order = np.argsort(keys, kind="stable")
+            empty = np.empty(0, dtype=np.int64)
+            data = self.__bands[band] = _Band(keys[order], offsets[order], rows[order], empty, empty, empty)
+            # Walls changed before the band was built are sampled as they are now, as none of its tiles exist yet
+            self.__add_samples__(data, band, list(self.__added.values()))
+            data.inserts_applied, data.removed_applied = len(self.__inserts), len(self.__removed_rows)
+            return data
+
+        if data.inserts_applied == len(self.__inserts) and data.removed_applied == len(self.__removed_rows):
+            return data
+
+        # Tiles which removed walls passed through are redrawn without them
+        removed = np.array(self.__removed_rows[data.removed_applied:], dtype=np.int64)
+        dirty = [self.__sample__(self.__coordinates[removed], band)[0]]
+
+        # As are the tiles of inserted walls that have since been removed or moved again
+        alive = {serial for serial, _ in self.__added.values()}
+        dead = ~np.isin(data.added_serials, list(alive))
+        dirty.append(data.added_keys[dead])
+        data.added_keys, data.added_offsets, data.added_serials = \
+            data.added_keys[~dead], data.added_offsets[~dead], data.added_serials[~dead]
+
+        inserts = [(serial, wall) for serial, wall in self.__inserts[data.inserts_applied:] if serial in alive]
+        dirty.append(self.__add_samples__(data, band, inserts))
+        data.inserts_applied, data.removed_applied = len(self.__inserts), len(self.__removed_rows)
+
+        dirty = set(np.concatenate(dirty).tolist())
+        for cache_key in [cache_key for cache_key in self.__tiles if cache_key[0] == band and cache_key[1] in dirty]:
+            del self.__tiles[cache_key]
+
+        if all(
+            other.inserts_applied == len(self.__inserts) and other.removed_applied == len(self.__removed_rows)
+            for other in self.__bands.values()
+        ):
+            self.__inserts.clear()
+            self.__removed_rows.clear()
+            for other in self.__bands.values():
+                other.inserts_applied, other.removed_applied = 0, 0
+        return data
+
+    def __add_samples__(self, data: _Band, band: float, inserts: List[tuple[int, Segment]]) -> np.ndarray:
+        # Samples inserted walls into a band, returning the keys of the tiles they pass through
+        coordinates = np.array(
+            [(wall.start.x, wall.start.y, wall.end.x, wall.end.y) for _, wall in inserts], dtype=np.float64
+        ).reshape(-1, 4)
+        keys, offsets, rows = self.__sample__(coordinates, band)
+        serials = np.array([serial for serial, _ in inserts], dtype=np.int64)[rows]
+
+        all_keys = np.concatenate((data.added_keys, keys))
+        order = np.argsort(all_keys, kind="stable")
+        data.added_keys = all_keys[order]
+        data.added_offsets = np.concatenate((data.added_offsets, offsets))[order]
+        data.added_serials = np.concatenate((data.added_serials, serials))[order]
+        return keys
+
+    def __get_tile__(self, band: float, key: int, size: tuple[int, int] | None) -> pygame.Surface:
+        cache_key = (band, key, size)
+        if cache_key in self.__tiles:
+            self.__tiles.move_to_end(cache_key)
+            return self.__tiles[cache_key]
+
+        if size is None:
+            data = self.__bands[band]
+            start, end = np.searchsorted(data.keys, [key, key + 1]).tolist()
+            tile_offsets = data.offsets[start:end][~self.__removed[data.rows[start:end]]]
+            start, end = np.searchsorted(data.added_keys, [key, key + 1]).tolist()
+            tile_offsets = np.concatenate((tile_offsets, data.added_offsets[start:end]))
+
+            tile = pygame.Surface((self.TileSize, self.TileSize))
+            tile.fill(self.TransparentColor)
+            tile.set_colorkey(self.TransparentColor)
+            pixels = pygame.surfarray.pixels2d(tile)
+            pixels[tile_offsets // self.TileSize, tile_offsets % self.TileSize] = tile.map_rgb(self.__color)
+            del pixels
+        else:
+            tile = pygame.transform.scale(self.__get_tile__(band, key, None), size)
+
+        self.__tiles[cache_key] = tile
+        if len(self.__tiles) > self.TileCacheSize:
+            self.__tiles.popitem(last=False)
+        return tile
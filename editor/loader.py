@@ -0,0 +1,61 @@
+from core.geometry import Segment
+from core.mapfile import iterate_walls
+from typing import List, Self
+import queue
+import threading
+
+class WorldLoader():
+    """
+    Reads the walls of a JSON map on a background thread, so the editor can show and navigate the map while
+    the rest of it loads. Walls are handed over in batches through take_walls.
+    """
+    BatchSize: int = 4096
+
+    def __init__(self: Self, filepath: str) -> None:
+        self.__filepath: str = filepath
+        self.__batches: queue.SimpleQueue = queue.SimpleQueue()
+        self.__cancelled: threading.Event = threading.Event()
+        self.__progress: float = 0.0
+        self.__error: Exception = None
+        self.__thread: threading.Thread = threading.Thread(target=self.__run__, daemon=True)
+        self.__thread.start()
+
+    @property
+    def progress(self: Self) -> float:
+        """
+        The fraction of the file read so far.
+        """
+        return self.__progress
+
+    @property
+    def done(self: Self) -> bool:
+        """
+        Whether the loader has stopped, and every wall it read has been taken.
+        """
+        return not self.__thread.is_alive() and self.__batches.empty()
+
+    @property
+    def error(self: Self) -> Exception:
+        return self.__error
+
+    def cancel(self: Self) -> None:
+        self.__cancelled.set()
+
+    def take_walls(self: Self) -> List[Segment]:
+        """
+        Returns the walls read since the last call.
+        """
+        walls = []
+        while not self.__batches.empty():
+            walls += self.__batches.get()
+        return walls
+
+    def __run__(self: Self) -> None:
+        try:
+            for batch, progress in iterate_walls(self.__filepath, self.BatchSize):
+                if self.__cancelled.is_set():
+                    return
+                self.__batches.put(batch)
+                self.__progress = progress
+        except Exception as error:
+            self.__error = error
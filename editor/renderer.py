@@ -1,8 +1,9 @@
 from core.geometry import Point, Segment
 import math
+import numpy as np
 import pygame
 from enum import IntFlag, auto
-from typing import Self
+from typing import List, Self
 
 from .camera import EditorCamera
 
@@ -15,40 +16,85 @@ class WallDrawFlags(IntFlag):
 class EditorRenderer():
     DefaultFontName = "helvetica"
     
-    def __init__(self: Self, camera: EditorCamera, surface: pygame.Surface) -> None:
+    def __init__(self: Self, camera: EditorCamera, surface: pygame.Surface, record_drawn: bool = False) -> None:
         self.__camera = camera
         self.__surface = surface
+        self.__record_drawn = record_drawn
+        self.__drawn_rects: List[pygame.Rect] = []
         self.__font = pygame.font.SysFont(
             self.DefaultFontName if self.DefaultFontName in pygame.font.get_fonts() else pygame.font.get_default_font(),
             14
         )
 
+    @property
+    def surface(self: Self) -> pygame.Surface:
+        return self.__surface
+
+    def set_surface(self: Self, surface: pygame.Surface) -> None:
+        self.__surface = surface
+        self.__drawn_rects = []
+
+    def take_drawn_rects(self: Self) -> List[pygame.Rect]:
+        """
+        Returns the areas drawn to since the last call, when constructed with record_drawn.
+        """
+        drawn_rects, self.__drawn_rects = self.__drawn_rects, []
+        return drawn_rects
+
+    def __record__(self: Self, rect: pygame.Rect) -> None:
+        if self.__record_drawn:
+            self.__drawn_rects.append(rect)
+
     def draw_string(self: Self, point: Point, string: str, color: tuple[int, int, int], background: tuple[int, int, int] = None) -> None:
-        self.__surface.blit(
+        self.__record__(self.__surface.blit(
             self.__font.render(string, True, color, background),
             (point.x, point.y)
-        )
+        ))
+
+    def draw_surface(self: Self, point: Point, surface: pygame.Surface, area: tuple[int, int, int, int] = None) -> None:
+        self.__record__(self.__surface.blit(surface, (point.x, point.y), area))
 
     def draw_line(self: Self, start: Point, end: Point, color: tuple[int, int, int], width: int = 1) -> None:
-        pygame.draw.line(
+        self.__record__(pygame.draw.line(
             self.__surface,
             color,
             (start.x, start.y),
             (end.x, end.y),
             width
-        )
+        ))
+
+    def draw_circle(self: Self, point: Point, radius: float, color: tuple[int, int, int], width: int = 0) -> None:
+        self.__record__(pygame.draw.circle(
+            self.__surface,
+            color,
+            (point.x, point.y),
+            radius,
+            width
+        ))
+
+    def draw_lines(self: Self, lines: np.ndarray, color: tuple[int, int, int], width: int = 1) -> None:
+        """
+        Draws rows of screen space (start.x, start.y, end.x, end.y), as returned by EditorCamera.project_walls.
+        """
+        surface = self.__surface
+        drawn_rects = [
+            pygame.draw.line(surface, color, (start_x, start_y), (end_x, end_y), width)
+            for start_x, start_y, end_x, end_y in lines.tolist()
+        ]
+        if len(drawn_rects) > 0:
+            self.__record__(drawn_rects[0].unionall(drawn_rects[1:]))
 
     def draw_wall(self: Self, wall: Segment, color: tuple[int, int, int], flags: WallDrawFlags = 0, width: int = 1) -> None:
         wall_mid = wall.mid() if flags & (WallDrawFlags.SurfaceNormal | WallDrawFlags.Center) else None
         start, end = self.__camera.project_segment(wall)
         mid = self.__camera.project_point(wall_mid) if wall_mid else None
-        pygame.draw.line(
+        self.__record__(pygame.draw.line(
             self.__surface,
             color,
             start,
             end,
             width
-        )
+        ))
         
         if flags & WallDrawFlags.SurfaceNormal:
             surface_normal_end = self.__camera.project_point(wall_mid + wall.surface_normal())
@@ -66,34 +112,34 @@ class EditorRenderer():
             self.__draw_screen_point__(mid, (255, 255, 255), half_size=4)
 
     def __draw_screen_point__(self: Self, point: tuple[float, float], color: tuple[int, int, int], half_size: int = 1) -> None:
-            pygame.draw.rect(
+            self.__record__(pygame.draw.rect(
                 self.__surface,
                 (255, 255, 255),
                 (point[0] - half_size, point[1] - half_size,
                  half_size * 2.0, half_size * 2.0)
-            )
+            ))
 
     def __draw_arrow__(self: Self, color: tuple[int, int, int], start: tuple[float, float], end: tuple[float, float], width: int = 1) -> None:
         leg1 = Point(start[0] - end[0], start[1] - end[1]).normal().rotate(math.pi / 4) * 10.0
         leg2 = Point(start[0] - end[0], start[1] - end[1]).normal().rotate(-math.pi / 4) * 10.0
-        pygame.draw.line(
+        self.__record__(pygame.draw.line(
             self.__surface,
             color,
             start,
             end,
             width
-        )
-        pygame.draw.line(
-            pygame.display.get_surface(),
+        ))
+        self.__record__(pygame.draw.line(
+            self.__surface,
             color,
             end,
             (end[0] + leg1.x, end[1] + leg1.y),
             width
-        )
-        pygame.draw.line(
-            pygame.display.get_surface(),
+        ))
+        self.__record__(pygame.draw.line(
+            self.__surface,
             color,
             end,
             (end[0] + leg2.x, end[1] + leg2.y),
             width
-        )
+        ))
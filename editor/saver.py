@@ -0,0 +1,77 @@
+from core.buffer import WallBuffer
+from core.mapfile import save_world, world_from_coordinates
+from core.world import World
+from typing import Callable, Dict, List, Self
+import numpy as np
+import threading
+
+class WorldSaver():
+    """
+    Saves worlds on a background thread, so the editor never waits on serializing or writing a map.
+
+    Saving takes a snapshot of the world's wall coordinates, which is a single array copy, and the walls are
+    rebuilt from the snapshot on the saving thread. Edits made after the snapshot don't affect the save.
+    Walls are saved in the WallBuffer's row order, which only differs from the world's after walls are removed.
+    Only the latest snapshot waiting for each file is written, and calls back once it has been.
+    """
+    def __init__(self: Self) -> None:
+        self.__condition: threading.Condition = threading.Condition()
+        self.__pending: Dict[str, tuple[np.ndarray, bool, Callable[[str], None], Callable[[], None]]] = {}
+        self.__saving: bool = False
+        self.__closing: bool = False
+        self.__errors: List[str] = []
+        self.__thread: threading.Thread = threading.Thread(target=self.__run__)
+        self.__thread.start()
+
+    @property
+    def busy(self: Self) -> bool:
+        with self.__condition:
+            return self.__saving or len(self.__pending) > 0
+
+    def save(self: Self, world: World, filepath: str, binary: bool = False, saved: Callable[[], None] = None,
+             replacing: Callable[[str], None] = None) -> None:
+        """
+        Takes a snapshot of the world to save to filepath. saved is called from the saving thread once it has been,
+        and replacing as it is about to replace the file, as for save_world.
+        """
+        snapshot = world.index(WallBuffer).coordinates.copy()
+        with self.__condition:
+            self.__pending[filepath] = (snapshot, binary, replacing, saved)
+            self.__condition.notify_all()
+
+    def take_errors(self: Self) -> List[str]:
+        with self.__condition:
+            errors, self.__errors = self.__errors, []
+        return errors
+
+    def close(self: Self) -> None:
+        """
+        Finishes writing every snapshot taken so far, then stops the saving thread.
+        """
+        with self.__condition:
+            self.__closing = True
+            self.__condition.notify_all()
+        self.__thread.join()
+
+    def __run__(self: Self) -> None:
+        while True:
+            with self.__condition:
+                while len(self.__pending) == 0 and not self.__closing:
+                    self.__condition.wait()
+                if len(self.__pending) == 0:
+                    return
+
+                filepath = next(iter(self.__pending))
+                snapshot, binary, replacing, saved = self.__pending.pop(filepath)
+                self.__saving = True
+
+            try:
+                save_world(world_from_coordinates(snapshot), filepath, binary, replacing)
+                if saved is not None:
+                    saved()
+            except Exception as error:
+                with self.__condition:
+                    self.__errors.append(f"Failed to save {filepath}: {error}")
+            finally:
+                with self.__condition:
+                    self.__saving = False
@@ -1,10 +1,24 @@
 from core.geometry import Point
 from ..camera import EditorCamera
 from ..renderer import EditorRenderer
+from collections import OrderedDict
+
+import math
+import pygame
 
 class DrawGrid():
     GridColor: tuple[int, int, int] = (41, 46, 51)
     HalfGridColor: tuple[int, int, int] = (29, 34, 39)
+    TransparentColor: tuple[int, int, int] = (255, 0, 255)
+
+    # The finest subdivision is 1/8th of a grid cell, and the zoom is always a whole number of pixels,
+    # so which pixel a line lands on only depends on which 1/8th of a pixel the grid origin falls in.
+    Subdivisions: int = 8
+    TileCacheSize: int = 32
+
+    tiles: OrderedDict = OrderedDict()
+    pattern: pygame.Surface = None
+    pattern_key: tuple = None
 
     @classmethod
     def update(cls, **kwargs) -> None:
@@ -12,24 +26,70 @@ class DrawGrid():
         renderer: EditorRenderer = kwargs["renderer"]
 
         grid_size = camera.zoom
-        grid_count = (int(camera.center.x / grid_size) + 2, int(camera.center.y / grid_size) + 2)
+        tile_size = int(grid_size)
+        width, height = int(camera.center.x * 2.0), int(camera.center.y * 2.0)
         center = camera.project_point(Point(int(camera.location.x), int(camera.location.y)))
-        vertical_offset = Point(center[0], 0.0)
-        horizontal_offset = Point(0.0, center[1])
-        width = Point(camera.center.x * 2.0, 0.0)
-        height = Point(0.0, camera.center.y * 2.0)
+        origin = (math.floor(center[0]), math.floor(center[1]))
+        phase = (
+            int((center[0] - origin[0]) * cls.Subdivisions),
+            int((center[1] - origin[1]) * cls.Subdivisions)
+        )
+
+        pattern_key = (grid_size, phase, width, height)
+        if pattern_key != cls.pattern_key:
+            cls.__build_pattern(cls.__get_tile(grid_size, phase), width + tile_size, height + tile_size)
+            cls.pattern_key = pattern_key
+
+        area = (-origin[0] % tile_size, -origin[1] % tile_size)
+        renderer.draw_surface(Point(0.0, 0.0), cls.pattern, (*area, width, height))
+
+        # Lines are drawn on the pixel their position truncates to, so a line less than a pixel left of or above
+        # the screen still lands in its first column or row. Those are drawn from the pattern a pixel earlier.
+        edge = (
+            (area[0] - 1) % tile_size if cls.__in_edge_pixel(center[0], grid_size) else area[0],
+            (area[1] - 1) % tile_size if cls.__in_edge_pixel(center[1], grid_size) else area[1]
+        )
+        if edge != area:
+            renderer.draw_surface(Point(0.0, 0.0), cls.pattern, (area[0], edge[1], width, 1))
+            renderer.draw_surface(Point(0.0, 0.0), cls.pattern, (edge[0], area[1], 1, height))
+            renderer.draw_surface(Point(0.0, 0.0), cls.pattern, (edge[0], edge[1], 1, 1))
+
+    @classmethod
+    def __in_edge_pixel(cls, center: float, grid_size: float) -> bool:
+        # Whether any line falls between -1 and 0, where a floored position would put it off the screen
+        for multiplier in (8, 4, 2, 1):
+            if multiplier > 1 and grid_size <= 32.0 * multiplier:
+                continue
+
+            spacing = grid_size / multiplier
+            current = math.ceil((-1.0 - center) / spacing)
+            for position in (center + spacing * current, center + spacing * (current + 1)):
+                if -1.0 < position < 0.0:
+                    return True
+        return False
+
+    @classmethod
+    def __get_tile(cls, grid_size: float, phase: tuple[int, int]) -> pygame.Surface:
+        key = (grid_size, phase)
+        if key in cls.tiles:
+            cls.tiles.move_to_end(key)
+            return cls.tiles[key]
+
+        tile_size = int(grid_size)
+        tile = pygame.Surface((tile_size, tile_size))
+        tile.fill(cls.TransparentColor)
+
+        offset = (phase[0] / cls.Subdivisions, phase[1] / cls.Subdivisions)
 
         def draw(multiplier: int, color: tuple[int, int, int]) -> None:
-            for current in range(-grid_count[0] * multiplier, grid_count[0] * multiplier):
-                grid_current = grid_size / multiplier * current
-                vertical = vertical_offset + Point(grid_current, 0.0)
-                renderer.draw_line(vertical, vertical + height, color)
-
-            for current in range(-grid_count[1] * multiplier, grid_count[1] * multiplier):
-                grid_current = grid_size / multiplier * current
-                horizontal = horizontal_offset + Point(0.0, grid_current)
-                renderer.draw_line(horizontal, horizontal + width, color)
-        
+            for current in range(multiplier):
+                vertical = math.floor(offset[0] + grid_size / multiplier * current) % tile_size
+                pygame.draw.line(tile, color, (vertical, 0), (vertical, tile_size - 1))
+
+            for current in range(multiplier):
+                horizontal = math.floor(offset[1] + grid_size / multiplier * current) % tile_size
+                pygame.draw.line(tile, color, (0, horizontal), (tile_size - 1, horizontal))
+
         if grid_size > 256.0:
             draw(8, cls.HalfGridColor)
 
@@ -39,4 +99,33 @@ class DrawGrid():
         if grid_size > 64.0:
             draw(2, cls.HalfGridColor)
 
-        draw(1, cls.GridColor)
\ No newline at end of file
+        draw(1, cls.GridColor)
+
+        cls.tiles[key] = tile
+        if len(cls.tiles) > cls.TileCacheSize:
+            cls.tiles.popitem(last=False)
+        return tile
+
+    @classmethod
+    def __build_pattern(cls, tile: pygame.Surface, width: int, height: int) -> None:
+        if cls.pattern is None or cls.pattern.get_size() != (width, height):
+            cls.pattern = pygame.Surface((width, height))
+
+        # The pattern must be opaque while it is copied onto itself
+        pattern = cls.pattern
+        pattern.set_colorkey(None)
+        tile_width, tile_height = tile.get_size()
+        pattern.blit(tile, (0, 0))
+
+        # Repeat the tile by doubling the filled area, rather than blitting it once per cell
+        filled = tile_width
+        while filled < width:
+            pattern.blit(pattern, (filled, 0), (0, 0, filled, tile_height))
+            filled *= 2
+
+        filled = tile_height
+        while filled < height:
+            pattern.blit(pattern, (0, filled), (0, 0, width, filled))
+            filled *= 2
+
+        pattern.set_colorkey(cls.TransparentColor)
@@ -1,13 +1,35 @@
+from core.buffer import WallBuffer
 from core.world import World
+from ..camera import EditorCamera
+from ..level_of_detail import WallLevelOfDetail
 from ..renderer import EditorRenderer
 
 class DrawWalls():
     WallColor: tuple[int, int, int] = (191, 196, 201)
 
+    # Below this zoom, worlds with at least this many walls are drawn from rasterized copies of the walls
+    DetailZoom: float = 32.0
+    DetailWallCount: int = 4096
+
+    level_of_detail: WallLevelOfDetail = None
+    level_of_detail_world: World = None
+
     @classmethod
     def update(cls, **kwargs) -> None:
         world: World = kwargs["world"]
+        camera: EditorCamera = kwargs["camera"]
         renderer: EditorRenderer = kwargs["renderer"]
 
-        for wall in world.walls:
-            renderer.draw_wall(wall, cls.WallColor)
\ No newline at end of file
+        buffer = world.index(WallBuffer)
+        coordinates = buffer.coordinates
+        if camera.zoom < cls.DetailZoom and len(coordinates) >= cls.DetailWallCount:
+            if cls.level_of_detail_world is not world:
+                # Built once per world, then kept up to date with its edits like any of its other indexes
+                cls.level_of_detail = WallLevelOfDetail(buffer.walls, coordinates, cls.WallColor)
+                cls.level_of_detail_world = world
+                world.adopt_index(cls.level_of_detail)
+            cls.level_of_detail.draw(camera, renderer.surface)
+            return
+
+        lines, _ = camera.project_walls(coordinates)
+        renderer.draw_lines(lines, cls.WallColor)
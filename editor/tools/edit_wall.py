@@ -1,9 +1,11 @@
 from core.geometry import Point, Segment
+from core.spatial import SegmentGrid
 from core.world import World
 from .add_wall import AddWall
 from ..camera import EditorCamera
 from ..renderer import EditorRenderer, WallDrawFlags
 from ..input import InputCallable, InputHandler
+from .snap import snap_point
 from enum import IntEnum, auto
 
 import pygame
@@ -16,12 +18,19 @@ class EditPoint(IntEnum):
 
 class EditWall():
     EditWallColor: tuple[int, int, int] = (221, 176, 31)
+    # Screen space distance from the cursor within which walls are picked
+    PickRadius: float = 10.0
 
     edit_wall: Segment = None
     edit_flags: WallDrawFlags = WallDrawFlags.SurfaceNormal
     edit_point: EditPoint = EditPoint.NoPoint
     editing: bool = False
     remove: bool = False
+    flip: bool = False
+    # The wall ends moved by a drag, and where the edited wall's ends were when it began
+    drag_ends: list[tuple[Segment, Point | None, Point | None]] = None
+    drag_start: Point = None
+    drag_end: Point = None
 
     @classmethod
     def begin_edit(cls, button: int, down: bool) -> bool:
@@ -31,6 +40,7 @@ class EditWall():
         
         cls.editing = cls.edit_wall and down
         cls.edit_point = EditPoint.NoPoint if not cls.editing else cls.edit_point
+        cls.drag_ends = None
         return cls.editing
 
     @classmethod
@@ -52,8 +62,7 @@ class EditWall():
                 cls.edit_flags &= ~WallDrawFlags.EndVertex
                 cls.edit_flags |= WallDrawFlags.StartVertex
 
-            start = cls.edit_wall.start
-            cls.edit_wall.start, cls.edit_wall.end = cls.edit_wall.end, start
+            cls.flip = not cls.flip
             return True
 
     @classmethod
@@ -69,40 +78,26 @@ class EditWall():
             cls.edit_wall = None
         
         if cls.remove and cls.edit_wall:
-            world.walls.remove(cls.edit_wall)
+            world.remove_wall(cls.edit_wall)
             cls.edit_wall = None
 
+        if cls.flip and cls.edit_wall:
+            world.update_wall(cls.edit_wall, cls.edit_wall.end, cls.edit_wall.start)
+            cls.drag_ends = None
+
         cls.remove = False
+        cls.flip = False
 
         if not cls.editing and not AddWall.adding:
-            cursor_scale = (10.0 / camera.zoom, 7.07 / camera.zoom)
-            cursor_segments = [
-                Segment(cursor_world, Point(-cursor_scale[0],  0.00)            + cursor_world),
-                Segment(cursor_world, Point(-cursor_scale[1], -cursor_scale[1]) + cursor_world),
-                Segment(cursor_world, Point( 0.00,            -cursor_scale[0]) + cursor_world),
-                Segment(cursor_world, Point( cursor_scale[1], -cursor_scale[1]) + cursor_world),
-                Segment(cursor_world, Point( cursor_scale[0],  0.00)            + cursor_world),
-                Segment(cursor_world, Point( cursor_scale[1],  cursor_scale[1]) + cursor_world),
-                Segment(cursor_world, Point( 0.00,             cursor_scale[0]) + cursor_world),
-                Segment(cursor_world, Point(-cursor_scale[1],  cursor_scale[1]) + cursor_world),
-            ]
-
-            cursor_intersection = min(
-                [cursor_segment.intersect_list(world.walls) for cursor_segment in cursor_segments],
-                key=lambda result: (result.point - cursor_world).length()
-            )
-
-            if not cursor_intersection.hit:
+            cursor_pick = world.index(SegmentGrid).pick(cursor_world, cls.PickRadius / camera.zoom)
+
+            if not cursor_pick.hit:
                 cls.edit_wall = None
                 return
             
-            wall: Segment = next(wall for wall in world.walls if wall == cursor_intersection.segment)
+            wall: Segment = cursor_pick.segment
             wall_mid: Point = wall.mid()
-
-            closest_vertex = min(
-                [vertex for vertex in [wall.start, wall.end, wall_mid]],
-                key=lambda vertex: (vertex - cursor_world).length()
-            )
+            closest_vertex: Point = cursor_pick.point
             
             cls.edit_wall = wall
             cls.edit_flags: WallDrawFlags = WallDrawFlags.SurfaceNormal
@@ -117,24 +112,42 @@ class EditWall():
                 cls.edit_point = EditPoint.Mid
 
         if cls.editing:
-            cursor_snapped = cls.__snap_point(cursor_world)
+            # Connected walls follow the edited end points, unless control is held to pull this wall away from them
+            unweld = pygame.key.get_mods() & pygame.KMOD_CTRL
+            if cls.drag_ends is None:
+                # The walls that follow are found once as the drag begins, so end points it passes over are left
+                # where they are, and only welded to if the drag is released on them
+                start, end = cls.edit_wall.start, cls.edit_wall.end
+                moving = {EditPoint.Start: [start], EditPoint.End: [end], EditPoint.Mid: [start, end]}.get(cls.edit_point, [])
+                cls.drag_ends, cls.drag_start, cls.drag_end = world.vertex_ends(moving), start, end
+
+            start, end = cls.drag_start, cls.drag_end
+            exclude = [cls.edit_wall] if unweld else [wall for wall, _, _ in cls.drag_ends]
+
+            cursor_snapped = snap_point(world, camera, cursor_world, exclude)
             renderer.draw_string(cursor - Point(0.0, 20.0), f"({cursor_snapped.x:.3f}, {cursor_snapped.y:.3f})", (191, 196, 201))
 
             if cls.edit_point == EditPoint.Start and cls.edit_wall.end != cursor_snapped:
-                cls.edit_wall.start = cursor_snapped
+                if unweld:
+                    world.update_wall(cls.edit_wall, cursor_snapped, cls.edit_wall.end)
+                else:
+                    world.move_ends(cls.drag_ends, {start: cursor_snapped})
             if cls.edit_point == EditPoint.End and cls.edit_wall.start != cursor_snapped:
-                cls.edit_wall.end = cursor_snapped
+                if unweld:
+                    world.update_wall(cls.edit_wall, cls.edit_wall.start, cursor_snapped)
+                else:
+                    world.move_ends(cls.drag_ends, {end: cursor_snapped})
             if cls.edit_point == EditPoint.Mid:
                 delta, invdelta = cls.edit_wall.delta(), cls.edit_wall.invdelta()
-                cls.edit_wall.start = cls.__snap_point(cursor_world + invdelta * 0.5)
-                cls.edit_wall.end = cls.edit_wall.start + delta
+                new_start = snap_point(world, camera, cursor_world + invdelta * 0.5, exclude)
+                if unweld:
+                    world.update_wall(cls.edit_wall, new_start, new_start + delta)
+                else:
+                    world.move_ends(cls.drag_ends, {start: new_start, end: new_start + delta})
 
         if cls.edit_wall is not None:
             renderer.draw_wall(cls.edit_wall, cls.EditWallColor, cls.edit_flags, 2)
-    
-    @classmethod
-    def __snap_point(cls, point: Point) -> Point:
-        return Point(round(point.x * 8.0) / 8.0, round(point.y * 8.0) / 8.0)
+
 
 InputHandler.add_mouse_button_handler(1, InputCallable(50, EditWall.begin_edit))
 InputHandler.add_mouse_button_handler(2, InputCallable(50, EditWall.remove_wall))
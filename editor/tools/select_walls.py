@@ -0,0 +1,199 @@
+from core.buffer import WallBuffer, clip_segments, points_in_polygon
+from core.geometry import Point, Segment
+from core.spatial import SegmentGrid
+from core.world import World
+from ..camera import EditorCamera
+from ..renderer import EditorRenderer
+from ..input import InputCallable, InputHandler
+from enum import IntEnum, auto
+from typing import Dict, List
+
+import numpy as np
+import pygame
+
+class SelectMode(IntEnum):
+    NoSelect = auto()
+    Box = auto()
+    Lasso = auto()
+
+class SelectWalls():
+    """
+    Selects many walls at once by dragging a box (Alt) or a lasso (Alt + Shift) around them, then moves (G),
+    flips (F) or deletes (Delete) them all together. Escape cancels a move, or clears the selection.
+    """
+    SelectionColor: tuple[int, int, int] = (92, 204, 128)
+    RegionColor: tuple[int, int, int] = (191, 196, 201)
+    # Screen space distance the cursor moves before another point is added to the lasso
+    LassoSpacing: float = 6.0
+
+    selection: Dict[int, Segment] = {}
+    selection_key: tuple[int, int] = None
+    selection_coordinates: np.ndarray = np.empty((0, 4))
+    select_mode: SelectMode = SelectMode.NoSelect
+    region: List[Point] = []
+    selecting: bool = False
+    finish: bool = False
+    grab: bool = False
+    grab_origin: Point = None
+    grab_confirm: bool = False
+    grab_cancel: bool = False
+    remove: bool = False
+    flip: bool = False
+
+    @classmethod
+    def begin_select(cls, button: int, down: bool) -> bool:
+        if cls.grab:
+            cls.grab_confirm = cls.grab_confirm or down
+            return True
+
+        if down and pygame.key.get_mods() & pygame.KMOD_ALT:
+            cls.select_mode = SelectMode.Lasso if pygame.key.get_mods() & pygame.KMOD_SHIFT else SelectMode.Box
+            cls.region = []
+            cls.selecting = True
+            return True
+
+        if not down and cls.selecting:
+            cls.selecting = False
+            cls.finish = True
+            return True
+        return False
+
+    @classmethod
+    def remove_selection(cls, key: int, down: bool) -> bool:
+        if len(cls.selection) == 0 or cls.grab:
+            return False
+        cls.remove = cls.remove or down
+        return True
+
+    @classmethod
+    def flip_selection(cls, key: int, down: bool) -> bool:
+        if len(cls.selection) == 0 or cls.grab:
+            return False
+        cls.flip = cls.flip or down
+        return True
+
+    @classmethod
+    def grab_selection(cls, key: int, down: bool) -> bool:
+        if len(cls.selection) == 0:
+            return False
+        if down and not cls.grab:
+            cls.grab = True
+            cls.grab_origin = None
+        return True
+
+    @classmethod
+    def cancel(cls, key: int, down: bool) -> bool:
+        if not down:
+            return False
+        if cls.grab:
+            cls.grab_cancel = True
+            return True
+        if len(cls.selection) > 0:
+            cls.__select__({})
+            return True
+        return False
+
+    @classmethod
+    def update(cls, **kwargs) -> None:
+        world: World = kwargs["world"]
+        cursor: Point = kwargs["cursor"]
+        camera: EditorCamera = kwargs["camera"]
+        renderer: EditorRenderer = kwargs["renderer"]
+
+        cursor_world: Point = camera.unproject_point(cursor)
+        buffer: WallBuffer = world.index(WallBuffer)
+
+        if cls.remove:
+            world.remove_walls(list(cls.selection.values()))
+            cls.__select__({})
+
+        if cls.flip:
+            for wall in cls.selection.values():
+                world.update_wall(wall, wall.end, wall.start)
+
+        cls.remove = False
+        cls.flip = False
+
+        # Walls can be removed by other tools, so the selection is refreshed whenever the world changes
+        if cls.selection_key != (id(world), world.revision):
+            cls.selection = {key: wall for key, wall in cls.selection.items() if wall in buffer}
+            cls.selection_coordinates = buffer.coordinates[buffer.rows(list(cls.selection.values()))]
+            cls.selection_key = (id(world), world.revision)
+
+        if cls.selecting or cls.finish:
+            if cls.select_mode == SelectMode.Box:
+                cls.region = [cls.region[0] if len(cls.region) > 0 else cursor_world, cursor_world]
+            elif len(cls.region) == 0 or (cursor_world - cls.region[-1]).length() * camera.zoom >= cls.LassoSpacing:
+                cls.region.append(cursor_world)
+
+        if cls.finish:
+            cls.__select__(cls.__query__(world, cls.select_mode, cls.region))
+            cls.select_mode = SelectMode.NoSelect
+            cls.region = []
+            cls.finish = False
+
+        offset = Point(0.0, 0.0)
+        if cls.grab:
+            if cls.grab_origin is None:
+                cls.grab_origin = cursor_world
+            offset = cursor_world - cls.grab_origin
+            offset = Point(round(offset.x * 8.0) / 8.0, round(offset.y * 8.0) / 8.0)
+
+            if cls.grab_confirm and offset != Point(0.0, 0.0):
+                # Every end point moves at once, so walls connected to the selection stay connected
+                points = {point for wall in cls.selection.values() for point in (wall.start, wall.end)}
+                world.move_vertices({point: point + offset for point in points})
+            if cls.grab_confirm or cls.grab_cancel:
+                cls.grab = False
+                offset = Point(0.0, 0.0)
+            cls.grab_confirm = False
+            cls.grab_cancel = False
+
+        if len(cls.selection) > 0:
+            lines, _ = camera.project_walls(cls.selection_coordinates + (offset.x, offset.y, offset.x, offset.y))
+            renderer.draw_lines(lines, cls.SelectionColor, 2)
+
+        if len(cls.region) > 1:
+            corners = cls.region
+            if cls.select_mode == SelectMode.Box:
+                first, last = cls.region
+                corners = [first, Point(last.x, first.y), last, Point(first.x, last.y)]
+
+            for start, end in zip(corners, corners[1:] + corners[:1]):
+                renderer.draw_line(Point(*camera.project_point(start)), Point(*camera.project_point(end)), cls.RegionColor)
+
+    @classmethod
+    def __select__(cls, selection: Dict[int, Segment]) -> None:
+        cls.selection = selection
+        cls.selection_key = None
+
+    @classmethod
+    def __query__(cls, world: World, select_mode: SelectMode, region: List[Point]) -> Dict[int, Segment]:
+        if len(region) < 2:
+            return {}
+
+        corners = np.array(region)
+        minimum, maximum = corners.min(axis=0), corners.max(axis=0)
+
+        # Only walls in the grid cells under the region need an exact test
+        candidates = world.index(SegmentGrid).query(Point(*minimum), Point(*maximum))
+        buffer: WallBuffer = world.index(WallBuffer)
+        coordinates = buffer.coordinates[buffer.rows(candidates)]
+
+        if select_mode == SelectMode.Box:
+            # Boxes select every wall they touch
+            _, selected = clip_segments(coordinates, minimum, maximum)
+        else:
+            # Lassos select walls that are entirely inside of them
+            selected = np.flatnonzero(
+                points_in_polygon(coordinates[:, 0:2], corners) & points_in_polygon(coordinates[:, 2:4], corners)
+            )
+
+        return {id(candidates[index]): candidates[index] for index in selected.tolist()}
+
+InputHandler.add_mouse_button_handler(1, InputCallable(25, SelectWalls.begin_select))
+InputHandler.add_key_handler(pygame.K_BACKSPACE, InputCallable(25, SelectWalls.remove_selection))
+InputHandler.add_key_handler(pygame.K_DELETE, InputCallable(25, SelectWalls.remove_selection))
+InputHandler.add_key_handler(pygame.K_f, InputCallable(25, SelectWalls.flip_selection))
+InputHandler.add_key_handler(pygame.K_g, InputCallable(25, SelectWalls.grab_selection))
+InputHandler.add_key_handler(pygame.K_ESCAPE, InputCallable(25, SelectWalls.cancel))
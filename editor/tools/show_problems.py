@@ -0,0 +1,60 @@
+from core.geometry import Point
+from core.validation import ProblemKind, WallProblem, validate_walls
+from core.world import World
+from ..camera import EditorCamera
+from ..renderer import EditorRenderer
+from ..input import InputCallable, InputHandler
+from typing import List
+
+import pygame
+
+class ShowProblems():
+    """
+    Highlights walls that cross each other, or nearly touch, when toggled on with V.
+    """
+    CrossingColor: tuple[int, int, int] = (204, 92, 92)
+    NearMissColor: tuple[int, int, int] = (221, 136, 31)
+    MarkerRadius: float = 6.0
+    # Distance in world units within which walls ending near another wall are reported
+    Tolerance: float = 0.01
+
+    enabled: bool = False
+    problems: List[WallProblem] = []
+    problems_key: tuple[int, int] = None
+    last_key: tuple[int, int] = None
+
+    @classmethod
+    def toggle(cls, key: int, down: bool) -> bool:
+        if down:
+            cls.enabled = not cls.enabled
+            cls.problems_key = None
+        return True
+
+    @classmethod
+    def update(cls, **kwargs) -> None:
+        world: World = kwargs["world"]
+        camera: EditorCamera = kwargs["camera"]
+        renderer: EditorRenderer = kwargs["renderer"]
+
+        # Wait for edits to settle rather than checking the whole world on every frame of a drag
+        key = (id(world), world.revision)
+        settled, cls.last_key = key == cls.last_key, key
+        if not cls.enabled or (key != cls.problems_key and cls.problems_key is not None and not settled):
+            return
+        if key != cls.problems_key:
+            cls.problems = validate_walls(world.walls, cls.Tolerance)
+            cls.problems_key = key
+
+        width, height = camera.center.x * 2.0, camera.center.y * 2.0
+        for problem in cls.problems:
+            point = Point(*camera.project_point(problem.point))
+            if not (-cls.MarkerRadius <= point.x <= width + cls.MarkerRadius and
+                    -cls.MarkerRadius <= point.y <= height + cls.MarkerRadius):
+                continue
+
+            color = cls.CrossingColor if problem.kind == ProblemKind.Crossing else cls.NearMissColor
+            for wall in problem.walls:
+                renderer.draw_wall(wall, color, width=2)
+            renderer.draw_circle(point, cls.MarkerRadius, color, 2)
+
+InputHandler.add_key_handler(pygame.K_v, InputCallable(25, ShowProblems.toggle))
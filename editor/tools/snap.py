@@ -0,0 +1,17 @@
+from core.geometry import Point, Segment
+from typing import Collection
+from core.spatial import VertexGrid
+from core.world import World
+from ..camera import EditorCamera
+
+# Screen space distance from the cursor within which existing wall end points are snapped to
+SnapRadius: float = 8.0
+
+def snap_point(world: World, camera: EditorCamera, point: Point, exclude: Collection[Segment] = ()) -> Point:
+    """
+    Snaps a point to the closest existing wall end point in range, or to the 1/8 grid otherwise.
+    """
+    vertex = world.index(VertexGrid).nearest(point, SnapRadius / camera.zoom, exclude)
+    if vertex is not None:
+        return vertex
+    return Point(round(point.x * 8.0) / 8.0, round(point.y * 8.0) / 8.0)
@@ -0,0 +1,23 @@
+import argparse
+from core.mapfile import save_world
+from core.mapgen import MapStyles, generate_map, generate_world
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a map, as a .map file or as ASCII for make_map.")
+    parser.add_argument("style", choices=list(MapStyles), help="the kind of map to generate")
+    parser.add_argument("width", type=int, help="the width of the map in cells")
+    parser.add_argument("height", type=int, help="the height of the map in cells")
+    parser.add_argument("output", help="where to write the map")
+    parser.add_argument("--seed", type=int, default=0, help="generates the same map each time for the same seed")
+    parser.add_argument("--ascii", action="store_true", help="write the ASCII map, instead of compiling it to walls")
+    parser.add_argument("--binary", action="store_true", help="write a binary .map file, instead of JSON")
+    arguments = parser.parse_args()
+
+    if arguments.ascii:
+        with open(arguments.output, 'w') as file:
+            file.write(generate_map(arguments.style, arguments.width, arguments.height, arguments.seed))
+        print(f"Wrote a {arguments.width} by {arguments.height} {arguments.style} to {arguments.output}")
+    else:
+        world = generate_world(arguments.style, arguments.width, arguments.height, arguments.seed)
+        save_world(world, arguments.output, arguments.binary)
+        print(f"Wrote {len(world.walls)} walls to {arguments.output}")
@@ -1,6 +1,9 @@
+import core.casting as casting
 import core.geometry as geometry
 import math
 import pytest
+from core.mapcompiler import compile_map
+from core.mapgen import MapStyles, generate_map
 
 import raycasting
 
@@ -198,3 +201,27 @@ def test_camera_ray_intersections():
     for ray, point in camera.rays(10):
         intersections = geometry.intersect_ray(ray, [segment, segment2])
         assert len(intersections) == 2
+
+
+@pytest.mark.parametrize("style", list(MapStyles))
+def test_grid_caster_matches_reference(style):
+    map_string = generate_map(style, 30, 30, seed=7)
+    walls = compile_map(map_string)
+    reference, candidate = casting.reference_caster(walls), casting.grid_caster(walls)
+
+    for pose in casting.random_poses(map_string, 40, seed=7):
+        rays = [ray for ray, _ in raycasting.Camera(pose.location, pose.direction, math.pi / 2).rays(64)]
+        assert casting.compare_casts(pose, rays, reference, candidate) == []
+
+
+def test_compare_casts_reports_missed_walls():
+    map_string = generate_map("cave", 30, 30, seed=7)
+    walls = compile_map(map_string)
+    missing = casting.reference_caster(walls[::2])
+
+    pose = casting.random_poses(map_string, 1, seed=7)[0]
+    rays = [geometry.Ray(pose.location, angle / 100.0 * 2.0 * math.pi) for angle in range(100)]
+    divergences = casting.compare_casts(pose, rays, casting.reference_caster(walls), missing)
+    assert len(divergences) > 0
+    removed = {id(wall) for wall in walls[1::2]}
+    assert all(divergence.pose is pose and id(divergence.reference.segment) in removed for divergence in divergences)
@@ -0,0 +1,23 @@
+import argparse
+from core.journal import load_journaled_world
+from core.mapfile import is_binary_map, save_world
+from core.optimize import optimize_world
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merges and removes redundant walls in a .map file.")
+    parser.add_argument("map", help="the .map file to optimize")
+    parser.add_argument("-o", "--output", help="where to write the optimized map, instead of overwriting the input")
+    parser.add_argument("--split-junctions", action="store_true", help="split walls where other walls end along them")
+    arguments = parser.parse_args()
+
+    # Edits still in the map's journal are included, as the editor would show them
+    world = load_journaled_world(arguments.map)
+    count = len(world.walls)
+    result = optimize_world(world, arguments.split_junctions)
+    # Maps are written in the format they were read in
+    save_world(world, arguments.output or arguments.map, is_binary_map(arguments.map))
+
+    print(f"Walls: {count} -> {len(world.walls)}")
+    print(f"Removed {result.zero_length} zero length, {result.duplicates} duplicate and {result.merged} merged walls")
+    if arguments.split_junctions:
+        print(f"Added {result.split} walls splitting at junctions")
@@ -1,8 +1,21 @@
+import numpy as np
+import os
 import pygame
+import sys
 import time
+from core.casting import Casters
+from core.chunks import ChunkedWorld
 from core.geometry import *
+from core.mapcache import cached_world
+from core.mapcompiler import MapCompilerVersion, compile_map
+from collections import OrderedDict
 from typing import List
 
+MapCacheDirectory = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".map_cache")
+# Chunked maps only hold the walls within this distance of the camera. Rays are cast DISTANT_POINT away, so
+# any less would leave out walls that the whole map would show
+ChunkRadius = float(DISTANT_POINT)
+
 class Camera:
     def __init__(self, location: Point, direction, viewing_angle):
         self.location = location
@@ -69,138 +82,156 @@ class Camera:
                 ), self.location
 
 
-def box(ul: Point):
-    return [
-        Segment(ul + Point(0, 0), ul + Point(1, 0)),
-        Segment(ul + Point(1, 0), ul + Point(1, -1)),
-        Segment(ul + Point(0, 0), ul + Point(0, -1)),
-        Segment(ul + Point(0, -1), ul + Point(1, -1)),
-    ]
-
-
-def lr_triangle(ul: Point):
-    return [
-        Segment(ul + Point(0, -1), ul + Point(1, -1)),
-        Segment(ul + Point(1, 0), ul + Point(1, -1)),
-        Segment(ul + Point(0, -1), ul + Point(1, 0)),
-    ]
-
-
-def ur_triangle(ul: Point):
-    return [
-        Segment(ul + Point(0, 0), ul + Point(1, 0)),
-        Segment(ul + Point(1, 0), ul + Point(1, -1)),
-        Segment(ul + Point(0, 0), ul + Point(1, -1)),
-    ]
-
-
-def ll_triangle(ul: Point):
-    return [
-        Segment(ul + Point(0, 0), ul + Point(1, -1)),
-        Segment(ul + Point(0, -1), ul + Point(1, -1)),
-        Segment(ul + Point(0, 0), ul + Point(0, -1)),
-    ]
-
-
-def ul_triangle(ul: Point):
-    return [
-        Segment(ul + Point(0, 0), ul + Point(1, 0)),
-        Segment(ul + Point(1, 0), ul + Point(0, -1)),
-        Segment(ul + Point(0, 0), ul + Point(0, -1)),
-    ]
-
-
-def make_map(map_string):
-    result = []
-    lines = map_string.split("\n")
-
-    # start from top of map and work down
-    y = len(lines)
-
-    for line in lines:
-        x = 0
-        for char in line:
-            if char == "#" or char == "*":
-                result += box(Point(x, y))
-            if char == "/":
-                result += ul_triangle(Point(x, y))
-            if char == "&":
-                result += ur_triangle(Point(x, y))
-            if char == "%":
-                result += lr_triangle(Point(x, y))
-            if char == "`":
-                result += ll_triangle(Point(x, y))
-
-            x += 1
-        y -= 1
-
-    print(f"Segments: {len(result)}")
-
-    # return result
-
-    # if any segment exists twice, then it was between two map items
-    # and both can be removed!
-    result = [item for item in result if result.count(item) == 1]
-
-    print(f"Filtered duplicated wall segments: {len(result)}")
-
-    cont = True
-    while cont:
-        remove_list = []
-        for s in result:
-            for n in result:
-                if s.end.x == n.start.x and s.end.y == n.start.y and n.parallel(s):
-                    remove_list += [n, s]
-                    result.append(
-                        Segment(Point(s.start.x, s.start.y), Point(n.end.x, n.end.y))
-                    )
-                    break
-                elif (
-                    s is not n
-                    and s.end.x == n.end.x
-                    and s.end.y == n.end.y
-                    and s.parallel(n)
-                ):
-                    remove_list += [n, s]
-                    result.append(
-                        Segment(
-                            Point(s.start.x, s.start.y), Point(n.start.x, n.start.y)
-                        )
-                    )
-                    break
-                elif (
-                    s is not n
-                    and s.start.x == n.start.x
-                    and s.start.y == n.start.y
-                    and s.parallel(n)
-                ):
-                    remove_list += [n, s]
-                    result.append(
-                        Segment(Point(s.end.x, s.end.y), Point(n.end.x, n.end.y))
-                    )
-                    break
-
-            if len(remove_list) > 0:
-                break
-
-        if len(remove_list) == 0:
-            cont = False
-
-        for i in remove_list:
-            result.remove(i)
-
+def make_map(map_string, processes=None):
+    result = compile_map(map_string, processes)
     print(f"Merged segments: {len(result)}")
-
     return result
 
 
-#
-# Symbols:
-#
-#  /  ###   # or *  ### & ###  %    #  `  #
-#     ##            ###    ##      ##     ##
-#     #             ###     #     ###     ###
-#
+def make_brick_texture(size: int = 64, seed: int = 0) -> pygame.Surface:
+    # Rows of bricks, each offset by half a brick from the last, with a little noise so they aren't flat
+    generator = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size]
+    brick_height, brick_width = size // 4, size // 2
+    offset = (y // brick_height % 2) * (brick_width // 2)
+    mortar = (y % brick_height < 2) | ((x + offset) % brick_width < 2)
+
+    pixels = np.empty((size, size, 3), dtype=np.float64)
+    pixels[:] = (150, 62, 44)
+    pixels *= generator.uniform(0.8, 1.1, (size, size, 1))
+    pixels[mortar] = (120, 120, 112)
+    # surfarray indexes pixels by x and then y
+    return pygame.surfarray.make_surface(np.clip(pixels, 0, 255).astype(np.uint8).transpose(1, 0, 2))
+
+
+class WallTexture:
+    """
+    Draws walls a column at a time from a texture. Each texture column is scaled to the height of the wall once,
+    and kept for reuse, as scaling every column every frame would be too slow. Heights are rounded into buckets so
+    columns of similar heights share a scaled copy, and only the most recently used copies are kept.
+    """
+    # Scaled heights are rounded to multiples of this many pixels
+    HeightBucket = 4
+    MaxColumns = 4096
+    # Walls taller than this many screen heights are drawn from a copy this tall, as they are mostly off screen
+    MaxScreenHeights = 4
+
+    def __init__(self, texture: pygame.Surface):
+        self.width = texture.get_width()
+        self.columns = [
+            texture.subsurface((x, 0, 1, texture.get_height())) for x in range(self.width)
+        ]
+        self.scaled: OrderedDict[tuple[int, int], pygame.Surface] = OrderedDict()
+
+    def column(self, u: float, height: int) -> pygame.Surface:
+        """
+        Returns the column at u, from 0 to 1 across the texture, scaled to about height pixels.
+        """
+        key = (int(u * self.width) % self.width, max(1, round(height / self.HeightBucket)) * self.HeightBucket)
+        column = self.scaled.get(key)
+        if column is None:
+            column = pygame.transform.scale(self.columns[key[0]], (1, key[1]))
+            self.scaled[key] = column
+            if len(self.scaled) > self.MaxColumns:
+                self.scaled.popitem(last=False)
+        else:
+            self.scaled.move_to_end(key)
+        return column
+
+    def add_column(self, blits: list, column: int, u: float, wall_height: float, screen_height: int) -> int:
+        """
+        Adds the wall's texture column to blits, centered on the screen, for drawing with Surface.blits.
+        Returns the height it is drawn at.
+        """
+        surface = self.column(u, min(wall_height, screen_height * self.MaxScreenHeights))
+        blits.append((surface, (column, (screen_height - surface.get_height()) // 2)))
+        return surface.get_height()
+
+
+def make_tile_texture(colour, size: int = 64, seed: int = 0) -> pygame.Surface:
+    # Square tiles with dark grout between them, and a little noise so they aren't flat
+    generator = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size]
+    tile_size = size // 2
+    grout = (y % tile_size < 2) | (x % tile_size < 2)
+
+    pixels = np.empty((size, size, 3), dtype=np.float64)
+    pixels[:] = colour
+    pixels *= generator.uniform(0.85, 1.1, (size, size, 1))
+    pixels[grout] *= 0.5
+    return pygame.surfarray.make_surface(np.clip(pixels, 0, 255).astype(np.uint8).transpose(1, 0, 2))
+
+
+class FloorCaster:
+    """
+    Draws the floor and ceiling above and below the walls. Every pixel on a row of the floor is the same distance
+    away, so the distances are worked out once for each screen height, and each frame only finds where along its
+    row every pixel lands in the world. The ceiling mirrors the floor, so it samples from the same positions.
+    """
+    def __init__(self, surface: pygame.Surface, floor: pygame.Surface, ceiling: pygame.Surface, wall_scale: float = 0.75):
+        # Textures must be square, with a power of two size, so positions wrap with a mask
+        self.size = floor.get_width()
+        self.wall_scale = wall_scale
+        # Texels in the surface's pixel format, indexed by y * size + x
+        self.floor = pygame.surfarray.array2d(floor.convert(surface)).T.ravel().astype(np.uint32)
+        self.ceiling = pygame.surfarray.array2d(ceiling.convert(surface)).T.ravel().astype(np.uint32)
+        self.rows: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+    def row_distances(self, height: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns how many pixels each floor row is below the horizon, and its distance from the camera, in the
+        same units as the wall heights: a wall at that distance ends on that row.
+        """
+        if height not in self.rows:
+            offsets = np.arange(height - height // 2) + 0.5
+            self.rows[height] = (offsets, (self.wall_scale * height / 2) / offsets)
+        return self.rows[height]
+
+    def draw(self, surface: pygame.Surface, location: Point, direction: float, angles: np.ndarray,
+             wall_halves: np.ndarray, corrected: bool = True) -> None:
+        """
+        Shades the floor and ceiling of every column, outside the wall drawn there. angles are the ray angle of
+        each column, and wall_halves the number of pixels the column's wall reaches above and below the horizon.
+        Distances are along the view direction when corrected, as the walls' are, or along each ray otherwise.
+        """
+        height = surface.get_height()
+        horizon = height // 2
+        offsets, distances = self.row_distances(height)
+
+        # Rows nearer the horizon than the shortest wall are behind a wall in every column
+        first = int(np.searchsorted(offsets, wall_halves.min(), "right"))
+        if first >= len(offsets):
+            return
+        offsets, distances = offsets[first:], distances[first:].astype(np.float32)
+
+        step_x, step_y = np.sin(angles), np.cos(angles)
+        if corrected:
+            scale = 1.0 / np.cos(angles - direction)
+            step_x, step_y = step_x * scale, step_y * scale
+
+        # Work in texels, wrapping the camera's position into the texture first to keep float32 precise
+        size, mask = self.size, self.size - 1
+        u = np.multiply.outer(distances, (step_x * size).astype(np.float32))
+        u += location.x % 1.0 * size
+        v = np.multiply.outer(distances, (step_y * size).astype(np.float32))
+        v += location.y % 1.0 * size
+        texels = u.astype(np.int32)
+        texels &= mask
+        rows = v.astype(np.int32)
+        rows &= mask
+        rows *= size
+        texels += rows
+
+        visible = offsets[:, None] > wall_halves[None, :]
+        pixels = pygame.surfarray.pixels2d(surface).T
+        np.copyto(pixels[horizon + first:], self.floor[texels], where=visible)
+        ceiling = horizon - first
+        if ceiling > 0:
+            np.copyto(
+                pixels[ceiling - 1::-1], self.ceiling[texels[:ceiling]], where=visible[:ceiling]
+            )
+        # The surface stays locked until its pixel array is released
+        del pixels
 
 
 class Map2D:
@@ -243,7 +274,7 @@ class Map2D:
             pygame.draw.line(surface, (255, 255, 255), start, end)
 
 
-def main():
+def main(chunk_directory: str = None):
     game_map = """
     ###########`&#######
     #           ` / /  #
@@ -259,7 +290,9 @@ def main():
     ####################
     """
 
-    map_wall_segments = make_map(game_map)
+    chunked_world = ChunkedWorld(chunk_directory, ChunkRadius) if chunk_directory else None
+    if chunked_world is None:
+        map_wall_segments = cached_world(game_map, MapCompilerVersion, make_map, MapCacheDirectory).walls
 
     pygame.init()
 
@@ -272,6 +305,8 @@ def main():
     FOV = 2 * math.atan((width / 800) * math.tan((math.pi / 2) / 2))
 
     camera = Camera(Point(-0.5, -0.5), math.pi / 2, FOV)
+    if chunked_world is not None:
+        chunked_world.update(camera.location, wait=True)
 
     frame = 0
     last_time = time.perf_counter()
@@ -279,6 +314,13 @@ def main():
 
     fisheye_distance_correction = True
     minimap_on = True
+    textured_walls = True
+    wall_texture = WallTexture(make_brick_texture())
+    floors_on = True
+    floor_caster = FloorCaster(screen, make_tile_texture((110, 110, 118)), make_tile_texture((80, 66, 52), seed=1))
+    # Faster casters are checked against the reference caster by compare_casters.py
+    caster_mode = "reference"
+    caster, caster_walls = None, None
 
     while True:
         pygame.display.get_surface().fill((0, 0, 0))
@@ -287,6 +329,10 @@ def main():
         new_time = time.perf_counter()
         elapsed, last_time = new_time - last_time, new_time
 
+        if chunked_world is not None:
+            chunked_world.update(camera.location)
+            map_wall_segments = chunked_world.walls
+
         if frame % 10 == 0:
             report_elapsed, report_time = new_time - report_time, new_time
             print(
@@ -295,12 +341,24 @@ def main():
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if chunked_world is not None:
+                    chunked_world.close()
                 pygame.quit()
+                return
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_1:
                     camera.planar_projection = not camera.planar_projection
                 if event.key == pygame.K_2:
                     fisheye_distance_correction = not fisheye_distance_correction
+                if event.key == pygame.K_3:
+                    modes = list(Casters)
+                    caster_mode = modes[(modes.index(caster_mode) + 1) % len(modes)]
+                    caster = None
+                    print(f"Casting with the {caster_mode} caster")
+                if event.key == pygame.K_4:
+                    textured_walls = not textured_walls
+                if event.key == pygame.K_5:
+                    floors_on = not floors_on
                 if event.key == pygame.K_m:
                     minimap_on = not minimap_on
 
@@ -320,8 +378,21 @@ def main():
         last_match = None
         last_wall = None
 
+        if caster is None or caster_walls is not map_wall_segments:
+            caster, caster_walls = Casters[caster_mode](map_wall_segments), map_wall_segments
+
+        # Textured wall columns are drawn together once every column has been cast
+        wall_blits = []
+        # As are the lines and points of outlined walls, so the floor and ceiling never cover them
+        outline_lines, outline_points = [], []
+        # The floor and ceiling are drawn around each column's wall, once every column has been cast
+        ray_angles = []
+        wall_halves = np.zeros(width)
+
         for r, segment_point in camera.rays(width):
-            matches = intersect_ray(r, map_wall_segments)
+            ray_angles.append(r.angle)
+            hit = caster(r)
+            matches = [(hit.distance, hit.point, hit.segment)] if hit.hit else []
 
             def sort_criteria(line):
                 return line[0]
@@ -341,8 +412,16 @@ def main():
                 )
 
                 wall_height = (height * 0.75) / corrected_distance
+                if textured_walls:
+                    # The texture repeats every unit along the wall
+                    u = math.dist(matches[0][2].start, matches[0][1]) % 1.0
+                    wall_halves[col] = wall_texture.add_column(wall_blits, col, u, wall_height, height) / 2
+                    col += 1
+                    continue
+
                 if wall_height > height:
                     wall_height = height + 2
+                wall_halves[col] = wall_height / 2
 
                 wall_start = (height - wall_height) / 2
                 wall_end = wall_start + wall_height
@@ -350,45 +429,43 @@ def main():
                 # Draw edge if detected
                 if last_match is not matches[0][2] and col != 0:
                     if last_match is None:
-                        pygame.draw.line(
-                            pygame.display.get_surface(),
-                            (255, 255, 255),
-                            (col, wall_start),
-                            (col, wall_end),
-                        )
+                        outline_lines.append(((col, wall_start), (col, wall_end)))
                     else:
-                        pygame.draw.line(
-                            pygame.display.get_surface(),
-                            (255, 255, 255),
+                        outline_lines.append((
                             (col, min(wall_start, last_wall[0])),
                             (col, max(wall_end, last_wall[1])),
-                        )
+                        ))
                 else:
                     # draw just top and bottom points otherwise
-                    screen.set_at((col, int(wall_start)), (255, 255, 255))
-                    screen.set_at((col, int(wall_end)), (255, 255, 255))
+                    outline_points.append((col, int(wall_start)))
+                    outline_points.append((col, int(wall_end)))
 
                     # and some texture...
                     texture_size = int(height / 50)
                     if col % texture_size == 0:
                         for y in range(int(wall_start), int(wall_end), texture_size):
-                            screen.set_at((col, y), (255, 255, 255))
+                            outline_points.append((col, y))
 
                 last_wall = (wall_start, wall_end)
                 last_match = matches[0][2]
             else:
                 # Look for transition from wall to empty space, draw edge
                 if last_match is not None:
-                    pygame.draw.line(
-                        pygame.display.get_surface(),
-                        (255, 255, 255),
-                        (col, last_wall[0]),
-                        (col, last_wall[1]),
-                    )
+                    outline_lines.append(((col, last_wall[0]), (col, last_wall[1])))
                 last_match = None
 
             col += 1
 
+        if floors_on:
+            floor_caster.draw(
+                screen, camera.location, camera.direction, np.array(ray_angles), wall_halves, fisheye_distance_correction
+            )
+        screen.blits(wall_blits, doreturn=False)
+        for start, end in outline_lines:
+            pygame.draw.line(screen, (255, 255, 255), start, end)
+        for point in outline_points:
+            screen.set_at(point, (255, 255, 255))
+
         if minimap_on:
             map_surface = pygame.Surface((map2d.width, map2d.height))
             map2d.center = camera.location
@@ -402,4 +479,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # Optionally play a map written as chunks by convert_map.py --chunks
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
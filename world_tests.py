@@ -0,0 +1,781 @@
+import io
+import itertools
+import json
+import math
+import os
+import pytest
+import random
+
+import numpy as np
+import pygame
+
+from core.buffer import WallBuffer, clip_segments, points_in_polygon
+from core.chunks import ChunkedWorld, write_chunks
+from core.collinear import LineIndex
+from core.geometry import Point, Segment
+from core.graph import VertexGraph
+from core.journal import WorldJournal, load_journaled_world, replay_journal
+from core.mapcache import cached_world
+from core import mapcompiler
+from core.mapcompiler import compile_map
+from core.mapgen import MapStyles, generate_map
+from core.mapfile import BinaryHeaderSize, BinarySection, MapSerializer, is_binary_map, iterate_walls, load_binary_world, load_world, save_world, world_from_coordinates
+from core.optimize import optimize_walls, optimize_world
+from core.spatial import SegmentGrid, VertexGrid
+from core.validation import ProblemKind, find_crossings, validate_walls
+from core.world import MakeWorld, World
+from editor.camera import EditorCamera
+from editor.level_of_detail import WallLevelOfDetail
+from editor.renderer import EditorRenderer
+from editor.tools.draw_grid import DrawGrid
+
+
+def make_walls():
+    return [
+        Segment(Point(0, 0), Point(1, 0)),
+        Segment(Point(1, 0), Point(1, 1)),
+        Segment(Point(1, 1), Point(0, 0)),
+    ]
+
+
+def buffer_rows(buffer: WallBuffer):
+    return [tuple(row) for row in buffer.coordinates.tolist()]
+
+
+def expected_rows(walls):
+    return [(wall.start.x, wall.start.y, wall.end.x, wall.end.y) for wall in walls]
+
+
+def test_wall_buffer_follows_world_edits():
+    world = World(make_walls())
+    buffer = world.index(WallBuffer)
+    assert world.index(WallBuffer) is buffer
+    assert buffer_rows(buffer) == expected_rows(world.walls)
+
+    added = Segment(Point(2, 2), Point(3, 3))
+    world.add_wall(added)
+    world.update_wall(world.walls[1], Point(5, 5), Point(6, 6))
+    world.remove_wall(world.walls[0])
+
+    assert len(buffer) == len(world.walls) == 3
+    assert buffer_rows(buffer) == expected_rows(buffer.walls)
+    assert sorted(buffer_rows(buffer)) == sorted(expected_rows(world.walls))
+
+
+def test_remove_identical_walls():
+    first = Segment(Point(0, 0), Point(1, 0))
+    second = Segment(Point(0, 0), Point(1, 0))
+    world = World([first, second])
+    revision = world.revision
+
+    world.remove_wall(second)
+
+    assert world.walls[0] is first
+    assert world.revision == revision + 1
+
+
+def test_update_wall_refreshes_bounds():
+    wall = Segment(Point(0, 0), Point(1, 0))
+    world = World([wall])
+    assert wall.max_x == 1
+
+    world.update_wall(wall, Point(0, 0), Point(4, 0))
+
+    assert wall.max_x == 4
+
+
+def random_walls(count, seed=0):
+    generator = random.Random(seed)
+    walls = []
+    for _ in range(count):
+        start = Point(generator.uniform(-20, 20), generator.uniform(-20, 20))
+        walls.append(Segment(start, start + Point(generator.uniform(-4, 4), generator.uniform(-4, 4))))
+    return walls
+
+
+def test_segment_grid_nearest_matches_brute_force():
+    world = World(random_walls(300))
+    grid = world.index(SegmentGrid)
+
+    # Edits made after the grid is built have to be reflected in it
+    world.update_wall(world.walls[0], Point(-3, -3), Point(3, 3))
+    world.remove_wall(world.walls[1])
+    world.add_wall(Segment(Point(0.5, 10), Point(0.5, -10)))
+
+    generator = random.Random(1)
+    for _ in range(200):
+        point = Point(generator.uniform(-22, 22), generator.uniform(-22, 22))
+        radius = generator.uniform(0.1, 2.0)
+
+        distances = [math.dist(point, wall.closest_point(point)) for wall in world.walls]
+        expected = min(distances)
+        result = grid.nearest(point, radius)
+
+        if expected > radius:
+            assert not result.hit
+        else:
+            assert result.hit
+            assert result.distance == pytest.approx(expected)
+
+        # Picking finds the same wall, and whichever of its ends or middle is closest
+        pick = grid.pick(point, radius)
+        assert (pick.hit, pick.segment) == (result.hit, result.segment)
+        if pick.hit:
+            wall = pick.segment
+            assert pick.point in (wall.start, wall.end, wall.mid())
+            assert math.dist(pick.point, point) == min(math.dist(vertex, point) for vertex in (wall.start, wall.end, wall.mid()))
+
+
+def test_segment_grid_query_finds_crossing_walls():
+    # A long diagonal wall passes through many cells, and has to be found in any of them
+    wall = Segment(Point(-10.5, -7.25), Point(9.75, 8.5))
+    grid = SegmentGrid([wall], cell_size=1.0)
+
+    for t in [0.0, 0.1, 0.33, 0.5, 0.9, 1.0]:
+        point = wall.start + wall.delta() * t
+        assert grid.query(point, point) == [wall]
+
+    assert grid.query(Point(5, -5), Point(6, -4)) == []
+
+
+def test_segment_grid_query_large_area_matches_brute_force():
+    walls = random_walls(200)
+    grid = SegmentGrid(walls, cell_size=1.0)
+
+    # Both the per cell and the occupied cell search have to find the same walls
+    for minimum, maximum in [(Point(-3, -3), Point(2, 4)), (Point(-1000, -1000), Point(1000, 1000))]:
+        expected = {id(wall) for wall in walls if
+                    len(clip_segments(np.array([[*wall.start, *wall.end]]), minimum, maximum)[1]) > 0}
+        assert expected <= {id(wall) for wall in grid.query(minimum, maximum)}
+
+
+def test_clip_segments_and_points_in_polygon():
+    coordinates = np.array([[-2.0, 0.5, 2.0, 0.5], [2.0, 2.0, 3.0, 3.0], [0.25, 0.25, 0.75, 0.75]])
+    clipped, indices = clip_segments(coordinates, (0.0, 0.0), (1.0, 1.0))
+    assert indices.tolist() == [0, 2]
+    assert clipped.tolist() == [[0.0, 0.5, 1.0, 0.5], [0.25, 0.25, 0.75, 0.75]]
+
+    # An L shaped polygon, with the point in its notch outside of it
+    polygon = np.array([[0.0, 0.0], [2.0, 0.0], [2.0, 1.0], [1.0, 1.0], [1.0, 2.0], [0.0, 2.0]])
+    points = np.array([[0.5, 0.5], [1.5, 0.5], [0.5, 1.5], [1.5, 1.5], [3.0, 0.5]])
+    assert points_in_polygon(points, polygon).tolist() == [True, True, True, False, False]
+
+
+def test_remove_walls():
+    walls = make_walls()
+    world = World(list(walls))
+    buffer = world.index(WallBuffer)
+
+    world.remove_walls([walls[0], walls[2]])
+    assert world.walls == [walls[1]]
+    assert walls[1] in buffer and walls[0] not in buffer
+    assert buffer_rows(buffer) == expected_rows([walls[1]])
+
+
+def test_vertex_grid_nearest_end_point():
+    first = Segment(Point(0, 0), Point(2, 0))
+    second = Segment(Point(2, 0), Point(2, 3))
+    world = World([first, second])
+    vertices = world.index(VertexGrid)
+
+    assert vertices.nearest(Point(1.9, 0.2), 0.5) == Point(2, 0)
+    assert vertices.nearest(Point(1.0, 1.0), 0.5) is None
+
+    # A shared end point is still found when one of the walls using it is excluded
+    assert vertices.nearest(Point(1.9, 0.2), 0.5, exclude=[first]) == Point(2, 0)
+    assert vertices.nearest(Point(0.1, 0.1), 0.5, exclude=[first]) is None
+
+    world.update_wall(second, Point(5, 5), Point(2, 3))
+    assert vertices.nearest(Point(1.9, 0.2), 0.5, exclude=[first]) is None
+    assert vertices.nearest(Point(4.8, 5.1), 0.5) == Point(5, 5)
+
+    world.remove_wall(second)
+    assert vertices.nearest(Point(4.8, 5.1), 0.5) is None
+
+
+def lit_pixels(surface: pygame.Surface) -> np.ndarray:
+    return pygame.surfarray.array2d(surface) != surface.map_rgb((0, 0, 0))
+
+
+def draw_level_of_detail(level_of_detail: WallLevelOfDetail, camera: EditorCamera) -> np.ndarray:
+    surface = pygame.Surface((400, 400))
+    level_of_detail.draw(camera, surface)
+    return lit_pixels(surface)
+
+
+def test_level_of_detail_follows_world_edits():
+    world = World(random_walls(300))
+    buffer = world.index(WallBuffer)
+    camera = EditorCamera(400, 400)
+    level_of_detail = WallLevelOfDetail(buffer.walls, buffer.coordinates, (255, 255, 255))
+    world.adopt_index(level_of_detail)
+    draw_level_of_detail(level_of_detail, camera)
+
+    moved, added = world.walls[0], Segment(Point(0.5, 10), Point(0.5, -10))
+    world.update_wall(moved, Point(-3, -3), Point(3, 3))
+    world.remove_wall(world.walls[1])
+    world.add_wall(added)
+    world.move_vertex(world.walls[2].start, Point(-15, 15))
+    drawn = draw_level_of_detail(level_of_detail, camera)
+
+    # Only the changed tiles are redrawn, but they have to match tiles drawn from scratch
+    rebuilt = WallLevelOfDetail(buffer.walls, buffer.coordinates, (255, 255, 255))
+    assert np.array_equal(drawn, draw_level_of_detail(rebuilt, camera))
+
+    # Walls changed before are changed again, as they are every frame of a drag
+    world.update_wall(moved, Point(10, -3), Point(12, 3))
+    world.remove_wall(added)
+    drawn = draw_level_of_detail(level_of_detail, camera)
+    rebuilt = WallLevelOfDetail(buffer.walls, buffer.coordinates, (255, 255, 255))
+    assert np.array_equal(drawn, draw_level_of_detail(rebuilt, camera))
+
+    # And lines drawn exactly, give or take the pixel each wall is rounded to
+    surface = pygame.Surface((400, 400))
+    for start_x, start_y, end_x, end_y in camera.project_walls(buffer.coordinates)[0].tolist():
+        pygame.draw.line(surface, (255, 255, 255), (start_x, start_y), (end_x, end_y))
+    exact = lit_pixels(surface)
+
+    def near(pixels):
+        padded = np.pad(pixels, 1)
+        return np.logical_or.reduce([padded[1 + x:401 + x, 1 + y:401 + y] for x in (-1, 0, 1) for y in (-1, 0, 1)])
+    assert drawn.sum() > 0
+    assert not (drawn & ~near(exact)).any()
+    assert not (exact & ~near(drawn)).any()
+
+
+def draw_grid_lines(camera: EditorCamera, surface: pygame.Surface) -> None:
+    # Draws the grid a line at a time, as DrawGrid did before it drew from tiles
+    grid_size = camera.zoom
+    grid_count = (int(camera.center.x / grid_size) + 2, int(camera.center.y / grid_size) + 2)
+    center = camera.project_point(Point(int(camera.location.x), int(camera.location.y)))
+    width, height = camera.center.x * 2.0, camera.center.y * 2.0
+
+    for multiplier, color in ((8, DrawGrid.HalfGridColor), (4, DrawGrid.HalfGridColor), (2, DrawGrid.HalfGridColor), (1, DrawGrid.GridColor)):
+        if multiplier > 1 and grid_size <= 32.0 * multiplier:
+            continue
+        for current in range(-grid_count[0] * multiplier, grid_count[0] * multiplier):
+            vertical = center[0] + grid_size / multiplier * current
+            pygame.draw.line(surface, color, (vertical, 0.0), (vertical, height))
+        for current in range(-grid_count[1] * multiplier, grid_count[1] * multiplier):
+            horizontal = center[1] + grid_size / multiplier * current
+            pygame.draw.line(surface, color, (0.0, horizontal), (width, horizontal))
+
+
+def test_draw_grid_matches_lines():
+    pygame.font.init()
+    generator = random.Random(7)
+    for _ in range(300):
+        width, height = generator.choice([(800, 480), (641, 401)])
+        camera = EditorCamera(width, height)
+        camera.mouse_scroll(0, generator.randrange(0, 197))
+        # Moved by whole 1/64ths of a grid cell, so no line position picks up rounding errors, which would put
+        # lines the same distance apart on pixels a different distance apart
+        camera.toggle_move_mode(3, True)
+        camera.mouse_relative(
+            camera.zoom * generator.randrange(-6400, 6400) / 64, camera.zoom * generator.randrange(-6400, 6400) / 64
+        )
+        camera.tick(0.0)
+
+        expected, drawn = pygame.Surface((width, height)), pygame.Surface((width, height))
+        draw_grid_lines(camera, expected)
+        DrawGrid.update(camera=camera, renderer=EditorRenderer(camera, drawn))
+        assert np.array_equal(pygame.surfarray.array2d(expected), pygame.surfarray.array2d(drawn)), \
+            (camera.zoom, camera.location)
+
+
+def test_move_shared_vertex():
+    left = Segment(Point(0, 0), Point(1, 1))
+    right = Segment(Point(1, 1), Point(2, 0))
+    other = Segment(Point(5, 5), Point(6, 6))
+    world = World([left, right, other])
+    graph = world.index(VertexGraph)
+
+    assert world.move_vertex(Point(1, 1), Point(1, 2))
+    assert left.end == Point(1, 2) and right.start == Point(1, 2)
+    assert graph.degree(Point(1, 2)) == 2
+    assert graph.degree(Point(1, 1)) == 0
+
+    # Welding onto another wall's end point joins the chains
+    assert world.move_vertex(Point(2, 0), Point(5, 5))
+    assert graph.degree(Point(5, 5)) == 2
+    assert sorted(map(id, graph.connected(left))) == sorted(map(id, [left, right, other]))
+
+    # Collapsing a wall to a point is refused, and nothing moves
+    assert not world.move_vertex(Point(1, 2), Point(0, 0))
+    assert left.end == Point(1, 2) and right.start == Point(1, 2)
+
+
+def test_move_wall_with_shared_vertices():
+    wall = Segment(Point(0, 0), Point(1, 0))
+    before = Segment(Point(-1, 0), Point(0, 0))
+    after = Segment(Point(1, 0), Point(2, 0))
+    world = World([before, wall, after])
+
+    assert world.move_vertices({Point(0, 0): Point(1, 0), Point(1, 0): Point(2, 1)})
+    assert before.end == Point(1, 0)
+    assert wall.start == Point(1, 0) and wall.end == Point(2, 1)
+    assert after.start == Point(2, 1)
+
+
+def test_drag_vertex_across_another_vertex():
+    a = Segment(Point(0, 0), Point(1, 0))
+    b = Segment(Point(3, 0), Point(3, 1))
+    world = World([a, b])
+    graph = world.index(VertexGraph)
+
+    # The ends to move are found once as the drag begins, like EditWall does
+    ends = world.vertex_ends([Point(1, 0)])
+    assert world.move_ends(ends, {Point(1, 0): Point(3, 0)})
+    assert graph.degree(Point(3, 0)) == 2
+
+    # Passing over b's end point leaves it behind
+    assert world.move_ends(ends, {Point(1, 0): Point(5, 5)})
+    assert a.end == Point(5, 5)
+    assert b == Segment(Point(3, 0), Point(3, 1))
+    assert graph.degree(Point(3, 0)) == 1
+
+    # Released on it, the two are welded
+    assert world.move_ends(ends, {Point(1, 0): Point(3, 1)})
+    assert sorted(map(id, graph.connected(a))) == sorted(map(id, [a, b]))
+
+
+def test_add_wall_merged():
+    wall = Segment(Point(0, 0), Point(4, 0))
+    world = World([wall, Segment(Point(4, 0), Point(0, 0))])
+
+    # Duplicates and walls inside existing ones are rejected
+    assert world.add_wall_merged(Segment(Point(0, 0), Point(4, 0))) is None
+    assert world.add_wall_merged(Segment(Point(1, 0), Point(3, 0))) is None
+    assert len(world.walls) == 2
+
+    # Overlapping walls facing the same way are merged
+    assert world.add_wall_merged(Segment(Point(3, 0), Point(6, 0))) is wall
+    assert wall == Segment(Point(0, 0), Point(6, 0))
+    assert len(world.walls) == 2
+
+    # Walls that only touch, or are on a parallel line, are added
+    touching = Segment(Point(6, 0), Point(8, 0))
+    parallel = Segment(Point(0, 1), Point(8, 1))
+    assert world.add_wall_merged(touching) is touching
+    assert world.add_wall_merged(parallel) is parallel
+    assert len(world.walls) == 4
+    assert len(world.index(LineIndex).collinear(wall)) == 2
+
+
+def test_add_wall_merged_joins_several_walls():
+    world = World([Segment(Point(0, 0), Point(0, 2)), Segment(Point(0, 3), Point(0, 5))])
+
+    merged = world.add_wall_merged(Segment(Point(0, 1), Point(0, 4)))
+
+    assert world.walls == [merged]
+    assert merged == Segment(Point(0, 0), Point(0, 5))
+
+
+def test_optimize_walls():
+    kept = Segment(Point(0, 0), Point(0, 5))
+    walls = [
+        Segment(Point(0, 0), Point(1, 0)),
+        Segment(Point(1, 0), Point(2, 0)),
+        Segment(Point(1.5, 0), Point(3, 0)),
+        Segment(Point(1, 0), Point(2, 0)),
+        Segment(Point(2, 0), Point(1, 0)),
+        Segment(Point(4, 4), Point(4, 4)),
+        kept,
+    ]
+    result = optimize_walls(walls)
+
+    # Walls facing the other way are kept separate, and untouched walls are not copied
+    assert result.walls == [Segment(Point(0, 0), Point(3, 0)), Segment(Point(2, 0), Point(1, 0)), kept]
+    assert result.walls[2] is kept
+    assert (result.zero_length, result.duplicates, result.merged) == (1, 1, 2)
+    assert result.removed == 4
+
+
+def test_optimize_world_splits_junctions():
+    walls = [
+        Segment(Point(0, 0), Point(1, 0)),
+        Segment(Point(1, 0), Point(2, 0)),
+        Segment(Point(1, 0), Point(1, 1)),
+    ]
+    world = World(list(walls))
+    graph = world.index(VertexGraph)
+
+    result = optimize_world(world, split_junctions=True)
+    assert (result.merged, result.split, result.removed) == (1, 1, 0)
+    assert sorted(world.walls, key=str) == sorted(walls, key=str)
+    assert graph.degree(Point(1, 0)) == 3
+
+
+def brute_force_crossings(walls):
+    crossings = set()
+    for first, second in itertools.combinations(walls, 2):
+        point = first.intersection(second)
+        if point is None or point in (first.start, first.end, second.start, second.end):
+            continue
+        # Walls ending part way along another only touch it
+        if (first.closest_point(point) - point).length() > 1e-9 or (second.closest_point(point) - point).length() > 1e-9:
+            continue
+        if any((wall.closest_point(end) - end).length() < 1e-9
+               for wall, other in ((first, second), (second, first)) for end in (other.start, other.end)):
+            continue
+        crossings.add(frozenset((id(first), id(second))))
+    return crossings
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_find_crossings_matches_brute_force(seed):
+    generator = random.Random(seed)
+    if seed % 2 == 0:
+        # Integer end points share vertices, overlap and meet in many walls at once
+        walls = [
+            Segment(Point(generator.randint(0, 8), generator.randint(0, 8)),
+                    Point(generator.randint(0, 8), generator.randint(0, 8)))
+            for _ in range(60)
+        ]
+    else:
+        walls = random_walls(100, seed)
+
+    found = {frozenset((id(first), id(second))) for first, second, _ in find_crossings(walls)}
+    assert found == brute_force_crossings(walls)
+
+
+def test_validate_walls():
+    walls = [
+        Segment(Point(-1, -1), Point(1, 1)),
+        Segment(Point(-1, 1), Point(1, -1)),
+        Segment(Point(2, 0), Point(2, 2)),
+        Segment(Point(2.005, 1), Point(3, 1)),
+        Segment(Point(2, 2), Point(3, 2)),
+    ]
+    problems = validate_walls(walls, tolerance=0.01)
+
+    assert [(problem.kind, problem.point) for problem in problems] == [
+        (ProblemKind.Crossing, Point(0, 0)),
+        (ProblemKind.NearMiss, Point(2.005, 1)),
+    ]
+    assert problems[1].walls == (walls[3], walls[2])
+
+
+def test_serializer_round_trip():
+    walls = random_walls(50)
+    world = World(walls)
+    world.index(WallBuffer)
+
+    data = MapSerializer.serialize(world)
+    assert list(data.keys()) == ["walls"]
+    assert data["walls"][0] == {
+        "start": {"x": walls[0].start.x, "y": walls[0].start.y},
+        "end": {"x": walls[0].end.x, "y": walls[0].end.y},
+    }
+
+    loaded = MakeWorld()
+    MapSerializer.deserialize(loaded, data)
+    assert loaded == world
+
+
+def test_binary_map_round_trip(tmp_path):
+    walls = random_walls(300)
+    world = World(list(walls))
+    filepath = str(tmp_path / "world.map")
+
+    save_world(world, filepath, binary=True)
+    assert is_binary_map(filepath)
+    loaded = load_world(filepath)
+    assert loaded == world
+
+    # The loaded indexes are used as they were saved, and have to follow edits like any other
+    buffer = loaded.index(WallBuffer)
+    loaded.remove_wall(loaded.walls[0])
+    loaded.update_wall(loaded.walls[1], Point(-30, -30), Point(-29, -30))
+    loaded.add_wall(Segment(Point(3, 3), Point(5, 4)))
+    assert buffer_rows(buffer) == expected_rows(buffer.walls)
+    assert {id(wall) for wall in buffer.walls} == {id(wall) for wall in loaded.walls}
+
+    grid, expected = loaded.index(SegmentGrid), SegmentGrid(loaded.walls)
+    for minimum, maximum in [(Point(-31, -31), Point(-28, -29)), (Point(2, 2), Point(6, 6)), (Point(-50, -50), Point(50, 50))]:
+        assert {id(wall) for wall in grid.query(minimum, maximum)} == {id(wall) for wall in expected.query(minimum, maximum)}
+
+    save_world(loaded, filepath, binary=True)
+    assert load_world(filepath) == loaded
+
+
+def test_empty_binary_map_round_trip(tmp_path):
+    filepath = str(tmp_path / "empty.map")
+    save_world(World([]), filepath, binary=True)
+    loaded = load_world(filepath)
+    assert loaded.walls == []
+
+    wall = Segment(Point(0, 0), Point(1, 0))
+    loaded.add_wall(wall)
+    buffer = loaded.index(WallBuffer)
+    assert buffer.walls == [wall]
+    assert buffer_rows(buffer) == expected_rows([wall])
+
+
+def test_iterate_walls_matches_load_world(tmp_path):
+    filepath = str(tmp_path / "world.map")
+    save_world(World(random_walls(100)), filepath)
+
+    # Tiny chunks split the key and the walls at every possible place
+    batches = list(iterate_walls(filepath, batch_size=16, chunk_size=7))
+    assert [len(batch) for batch, _ in batches] == [16] * 6 + [4]
+    assert [wall for batch, _ in batches for wall in batch] == load_world(filepath).walls
+    assert batches[-1][1] == 1.0
+
+
+def test_serialize_to_matches_json_dump():
+    world = World(random_walls(50) + [Segment(Point(1, 2), Point(float("inf"), 3))])
+    expected, streamed = io.StringIO(), io.StringIO()
+    json.dump(MapSerializer.serialize(world), expected)
+    MapSerializer.serialize_to(world, streamed)
+    assert streamed.getvalue() == expected.getvalue()
+
+    # Nesting is no longer limited to ten levels
+    nested = [1]
+    for _ in range(20):
+        nested = [nested, "text", True]
+    streamed = io.StringIO()
+    MapSerializer.serialize_to(nested, streamed)
+    assert json.loads(streamed.getvalue()) == nested
+    assert MapSerializer.serialize(nested) == nested
+
+
+def test_world_saver_writes_snapshot(tmp_path):
+    from editor.saver import WorldSaver
+
+    walls = random_walls(100)
+    world = World(list(walls))
+    filepath = str(tmp_path / "world.map")
+
+    saver = WorldSaver()
+    saver.save(world, filepath)
+    # Edits after saving are not part of the snapshot
+    world.remove_wall(world.walls[0])
+    saver.close()
+
+    assert saver.take_errors() == []
+    assert load_world(filepath).walls == walls
+
+
+def test_journal_replays_edits(tmp_path):
+    walls = random_walls(100)
+    filepath = str(tmp_path / "world.map")
+    journal_filepath = filepath + ".journal"
+    save_world(World(list(walls)), filepath)
+
+    world = load_world(filepath)
+    journal = WorldJournal(journal_filepath, filepath)
+    world.adopt_index(journal)
+    world.add_wall(Segment(Point(0.5, 0.5), Point(1.5, 2.5)))
+    world.update_wall(world.walls[3], Point(-1.0, -1.0), Point(-2.0, 3.0))
+    world.remove_walls(world.walls[10:20])
+    added = Segment(Point(7.0, 7.0), Point(8.0, 8.0))
+    world.add_wall(added)
+    world.remove_wall(added)
+    journal.flush()
+
+    # The map itself is unchanged, so replaying the journal recovers the edits
+    recovered = load_world(filepath)
+    assert replay_journal(recovered, journal_filepath, filepath) == journal.operations
+    key = lambda wall: (wall.start, wall.end)
+    assert sorted(recovered.walls, key=key) == sorted(world.walls, key=key)
+
+    # Once the map is saved with the edits, they are dropped from the journal
+    position = journal.position()
+    save_world(world, filepath)
+    journal.compact(position)
+    assert journal.operations == 0
+    journal.close()
+    assert load_world(filepath).walls == world.walls
+    with pytest.raises(FileNotFoundError):
+        open(journal_filepath)
+
+
+def test_journal_replays_edits_after_checkpoint(tmp_path):
+    filepath = str(tmp_path / "world.map")
+    journal_filepath = filepath + ".journal"
+    save_world(World(random_walls(50)), filepath)
+
+    world = load_world(filepath)
+    journal = WorldJournal(journal_filepath, filepath)
+    world.adopt_index(journal)
+    world.remove_walls(world.walls[:5])
+
+    # Saved from a snapshot as WorldSaver does, while more edits are made, then never compacted
+    position = journal.position()
+    snapshot = world_from_coordinates(world.index(WallBuffer).coordinates.copy())
+    world.add_wall(Segment(Point(0.5, 0.5), Point(1.5, 2.5)))
+    world.update_wall(world.walls[0], Point(-1.0, -1.0), Point(-2.0, 3.0))
+    save_world(snapshot, filepath, replacing=lambda temporary_filepath: journal.checkpoint(position, temporary_filepath))
+    journal.close()
+
+    # Only the edits made since the snapshot are replayed over the saved map, by the editor or by scripts
+    key = lambda wall: (wall.start, wall.end)
+    recovered = load_world(filepath)
+    assert replay_journal(recovered, journal_filepath, filepath) == 3
+    assert sorted(recovered.walls, key=key) == sorted(world.walls, key=key)
+    assert sorted(load_journaled_world(filepath).walls, key=key) == sorted(world.walls, key=key)
+
+    # Reopening the journal keeps only those edits, under a header naming the saved map
+    journal = WorldJournal(journal_filepath, filepath)
+    assert journal.operations == 3
+    journal.close()
+    assert replay_journal(load_world(filepath), journal_filepath, filepath) == 3
+
+
+def test_journal_ignores_changed_map(tmp_path):
+    filepath = str(tmp_path / "world.map")
+    journal_filepath = filepath + ".journal"
+    save_world(World(random_walls(10)), filepath)
+
+    world = load_world(filepath)
+    journal = WorldJournal(journal_filepath, filepath)
+    world.adopt_index(journal)
+    world.remove_wall(world.walls[0])
+    journal.close()
+
+    save_world(World(random_walls(20)), filepath)
+    recovered = load_world(filepath)
+    assert replay_journal(recovered, journal_filepath, filepath) == 0
+    assert len(recovered.walls) == 20
+    assert open(journal_filepath + ".stale").readline() != ""
+
+
+def test_cached_world_builds_once(tmp_path):
+    walls = random_walls(50)
+    builds = []
+
+    def build(source):
+        builds.append(source)
+        return list(walls)
+
+    directory = str(tmp_path / "cache")
+    assert cached_world("map", 1, build, directory).walls == walls
+    cached = cached_world("map", 1, build, directory)
+    assert builds == ["map"]
+    assert cached.walls == walls
+    assert set(cached.index(SegmentGrid).query(Point(-10.0, -10.0), Point(10.0, 10.0))) <= set(walls)
+
+    # A different source or version is built again
+    cached_world("other map", 1, build, directory)
+    cached_world("map", 2, build, directory)
+    assert builds == ["map", "other map", "map"]
+
+
+def test_cached_world_rebuilds_truncated_cache(tmp_path):
+    walls = random_walls(50)
+    builds = []
+
+    def build(source):
+        builds.append(source)
+        return list(walls)
+
+    directory = str(tmp_path / "cache")
+    cached_world("map", 1, build, directory)
+    (filepath,) = [str(path) for path in (tmp_path / "cache").iterdir()]
+    size = os.path.getsize(filepath)
+
+    # Cut off inside the header, the walls, the grid section's header, the grid's header and its cells
+    sections = BinaryHeaderSize + 32 * len(walls)
+    for length in (0, 10, 100, sections + 8, sections + BinarySection.size + 8, size - 1):
+        with open(filepath, 'r+b') as file:
+            file.truncate(length)
+        assert cached_world("map", 1, build, directory).walls == walls
+        assert os.path.getsize(filepath) == size
+    assert len(builds) == 7
+
+
+def test_load_binary_world_rejects_truncated_maps(tmp_path):
+    walls = random_walls(50)
+    filepath = str(tmp_path / "map.bin")
+    save_world(World(walls), filepath, binary=True)
+    with open(filepath, 'rb') as file:
+        data = file.read()
+
+    # Every length short of the whole file is cut off inside some header or array
+    for length in range(len(data)):
+        with open(filepath, 'wb') as file:
+            file.write(data[:length])
+        with pytest.raises(RuntimeError, match="Truncated"):
+            load_binary_world(filepath)
+
+
+def test_chunked_world_loads_nearby_chunks(tmp_path):
+    walls = random_walls(500)
+    directory = str(tmp_path / "chunks")
+    write_chunks(walls, directory, chunk_size=2.0)
+
+    world = ChunkedWorld(directory, radius=3.0)
+    world.update(Point(0.0, 0.0), wait=True)
+    nearby = {(wall.start, wall.end) for wall in world.query(Point(-1.0, -1.0), Point(1.0, 1.0))}
+    assert nearby <= {(wall.start, wall.end) for wall in walls}
+    assert all(
+        (wall.start, wall.end) in nearby for wall in walls
+        if min(wall.start.x, wall.end.x) <= 1.0 and max(wall.start.x, wall.end.x) >= -1.0
+        and min(wall.start.y, wall.end.y) <= 1.0 and max(wall.start.y, wall.end.y) >= -1.0
+    )
+    # Walls crossing chunks are only listed once
+    assert len(world.walls) == len({id(wall) for wall in world.walls})
+    assert len(world.walls) < len(walls)
+
+    # Distant chunks are dropped once over budget, while the nearby ones stay
+    near = set(world.resident_chunks)
+    world = ChunkedWorld(directory, radius=3.0, budget=0)
+    world.update(Point(0.0, 0.0), wait=True)
+    world.update(Point(20.0, 20.0), wait=True)
+    assert near.isdisjoint(world.resident_chunks)
+    world.close()
+
+
+def test_compile_map():
+    walls = compile_map("##\n# ")
+    # The outline of the three cells, with shared edges removed and edges along each side merged
+    assert {(wall.start, wall.end) for wall in walls} == {
+        (Point(0, 2), Point(2, 2)),
+        (Point(2, 2), Point(2, 1)),
+        (Point(1, 1), Point(2, 1)),
+        (Point(1, 1), Point(1, 0)),
+        (Point(0, 0), Point(1, 0)),
+        (Point(0, 2), Point(0, 0)),
+    }
+
+
+@pytest.mark.parametrize("style", list(MapStyles))
+@pytest.mark.parametrize("processes", [2, 3])
+def test_compile_map_in_bands_matches_one_process(style, processes, monkeypatch):
+    map_string = generate_map(style, 40, 37, seed=processes)
+    expected = compile_map(map_string, processes=1)
+
+    monkeypatch.setattr(mapcompiler, "ParallelCells", 0)
+    assert compile_map(map_string, processes) == expected
+
+
+@pytest.mark.parametrize("style", list(MapStyles))
+def test_generate_map(style):
+    map_string = generate_map(style, 31, 17, seed=1)
+    lines = map_string.split("\n")
+    assert len(lines) == 17 and all(len(line) == 31 for line in lines)
+    assert set(map_string) <= set(" #/&%`\n")
+    # Maps are closed, and the same for the same seed
+    assert lines[0] == lines[-1] == "#" * 31 and all(line[0] == line[-1] == "#" for line in lines)
+    assert generate_map(style, 31, 17, seed=1) == map_string
+    assert generate_map(style, 31, 17, seed=2) != map_string
+
+
+def test_segment_grid_intersect_on_loaded_grid(tmp_path):
+    walls = random_walls(300)
+    filepath = str(tmp_path / "world.map")
+    save_world(World(list(walls)), filepath, binary=True)
+    world = load_world(filepath)
+    world.update_wall(world.walls[0], Point(-20.0, 0.5), Point(20.0, 0.5))
+    grid = world.index(SegmentGrid)
+
+    generator = random.Random(0)
+    for _ in range(200):
+        start = Point(generator.uniform(-20, 20), generator.uniform(-20, 20))
+        angle = generator.uniform(0.0, 2.0 * math.pi)
+        segment = Segment(start, start + Point(math.cos(angle), math.sin(angle)) * 30.0)
+        expected, actual = segment.intersect_list(world.walls), grid.intersect(segment)
+        assert actual.hit == expected.hit
+        if expected.hit:
+            assert actual.distance == expected.distance